@@ -0,0 +1,209 @@
+# src/db/cache.py
+"""
+Read-through TTL + LRU cache for rows that almost never change
+(universes, rulesets, characters).
+
+Each cache is process-local. Write functions invalidate their entries
+explicitly; if ``CACHE_NOTIFY_CHANNEL`` is set in config/db_config.json the
+invalidation is also published with NOTIFY so other server workers drop
+their copies (see ``start_invalidation_listener``).
+
+Invalidations may also name state that has no cache here (e.g.
+``game_roster``); objects holding derived state subscribe to them with
+``add_invalidation_listener``.
+"""
+
+import copy
+import json
+import logging
+import select
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import psycopg2
+
+_MISSING = object()
+
+
+def _load_cache_config() -> dict:
+    project_root = Path(__file__).resolve().parents[2]
+    config_path = project_root / "config" / "db_config.json"
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+_config = _load_cache_config()
+DEFAULT_TTL = float(_config.get("CACHE_TTL_SECONDS", 300))
+DEFAULT_MAXSIZE = int(_config.get("CACHE_MAX_ENTRIES", 512))
+NOTIFY_CHANNEL: Optional[str] = _config.get("CACHE_NOTIFY_CHANNEL")
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after ``ttl`` seconds.
+    Callers get deep copies, so mutating a returned row (e.g. a nested
+    ``character_data`` dict) never changes the cached value.
+    """
+
+    def __init__(self, name: str, maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for *key*, calling *loader* on a miss.
+
+        ``None`` results are not cached so newly created rows show up
+        immediately.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+            return copy.deepcopy(value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+_caches: Dict[str, TTLCache] = {}
+
+
+def get_cache(name: str, maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL) -> TTLCache:
+    """Return the named process-wide cache, creating it on first use."""
+    if name not in _caches:
+        _caches[name] = TTLCache(name, maxsize=maxsize, ttl=ttl)
+    return _caches[name]
+
+
+def cache_stats() -> list[dict]:
+    """Hit/miss counters for every cache in this process."""
+    return [c.stats() for c in _caches.values()]
+
+
+_listeners: List[Callable[[Optional[str], Optional[str]], None]] = []
+
+
+def add_invalidation_listener(callback: Callable[[Optional[str], Optional[str]], None]) -> None:
+    """Call ``callback(name, key)`` on every invalidation, local or from NOTIFY.
+
+    ``(None, None)`` means everything may have changed (the listener lost
+    its connection). Callbacks run on the invalidating thread and must be quick.
+    """
+    _listeners.append(callback)
+
+
+def _notify_listeners(name: Optional[str], key: Optional[str]) -> None:
+    for callback in list(_listeners):
+        try:
+            callback(name, key)
+        except Exception as e:
+            logging.warning(f"[cache] invalidation listener failed for {name}:{key}: {e}")
+
+
+def invalidate(name: str, key: Hashable, cur=None) -> None:
+    """Drop *key* from the named cache.
+
+    When *cur* is given and a notify channel is configured, the invalidation
+    is also queued with ``pg_notify`` on that cursor's transaction, so other
+    workers see it only once the write commits.
+    """
+    if name in _caches:
+        _caches[name].invalidate(str(key))
+    _notify_listeners(name, str(key))
+    if cur is not None and NOTIFY_CHANNEL:
+        cur.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, f"{name}:{key}"))
+
+
+def _apply_notification(payload: str) -> None:
+    name, _, key = payload.partition(":")
+    if name in _caches and key:
+        _caches[name].invalidate(key)
+    if key:
+        _notify_listeners(name, key)
+
+
+def _listen_loop(connect: Callable[[], Any]) -> None:
+    backoff = 1.0
+    while True:
+        try:
+            conn = connect()
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f'LISTEN "{NOTIFY_CHANNEL}"')
+            backoff = 1.0
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    _apply_notification(conn.notifies.pop(0).payload)
+        except Exception as e:
+            logging.warning(f"[cache] invalidation listener error: {e}; retrying in {backoff:.0f}s")
+            # Anything may have changed while we were disconnected.
+            for c in _caches.values():
+                c.clear()
+            _notify_listeners(None, None)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+
+def start_invalidation_listener() -> Optional[threading.Thread]:
+    """Start a daemon thread applying cross-worker invalidations, if configured."""
+    if not NOTIFY_CHANNEL:
+        return None
+    from src.db.character_db import get_db_connection
+
+    thread = threading.Thread(
+        target=_listen_loop, args=(get_db_connection,), name="cache-invalidation", daemon=True
+    )
+    thread.start()
+    return thread
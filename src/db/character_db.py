@@ -7,6 +7,10 @@ from psycopg2.extras import RealDictCursor
 from uuid import uuid4
 from pathlib import Path
 
+from src.db.cache import get_cache
+
+_character_cache = get_cache("character")
+
 def get_db_config() -> dict:
     """Load database configuration from project_root/config/db_config.json."""
     project_root = Path(__file__).resolve().parents[2]
@@ -89,6 +93,10 @@ def get_characters_by_owner(owner: str) -> list[dict]:
         conn.close()
 
 def get_character_by_id(char_id: str) -> dict | None:
+    """Fetch a character by ID (cached; rows are effectively immutable)."""
+    return _character_cache.get_or_load(str(char_id), lambda: _fetch_character_by_id(char_id))
+
+def _fetch_character_by_id(char_id: str) -> dict | None:
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
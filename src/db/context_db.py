@@ -0,0 +1,169 @@
+# src/db/context_db.py
+"""
+Materialized per-game context snapshot (``game_context`` table).
+
+Holds everything the compressed GM prompt needs that is not the recent
+transcript: universe header, ruleset summaries, player roster, the id of
+the opening GM message (inherited from the root game for branches) and
+the latest stored summary. Writers keep it up
+to date incrementally (join, summary, branch/merge, ruleset edits), so
+assembling a compressed context is a single indexed read.
+
+Helpers taking a ``cur`` run inside the caller's transaction.
+"""
+
+from typing import Optional
+from psycopg2.extras import RealDictCursor
+from src.db.character_db import get_db_connection
+
+_ROSTER_SQL = """
+    SELECT coalesce(jsonb_agg(jsonb_build_object('id', c.id, 'name', c.name, 'owner', c.owner)
+                              ORDER BY gp.joined_at), '[]'::jsonb)
+      FROM game_players gp
+      JOIN characters c ON c.id = gp.character_id
+     WHERE gp.game_id = {game_ref}
+"""
+
+_REFRESH_SQL = f"""
+    INSERT INTO game_context
+      (game_id, universe_id, universe_name, universe_description,
+       ruleset_id, ruleset_name, ruleset_description, ruleset_summary,
+       ruleset_long_summary, roster, opening_message_id, latest_summary, updated_at)
+    SELECT g.id, u.id, u.name, u.description,
+           r.id, r.name, r.description, r.summary, r.long_summary,
+           ({_ROSTER_SQL.format(game_ref="g.id")}),
+           (SELECT min(m.id)
+              FROM game_lineage(g.id) l
+              JOIN chat_messages m
+                ON m.game_id = l.lineage_game_id
+               AND (l.upto_message_id IS NULL OR m.id <= l.upto_message_id)
+             WHERE m.sender = 'GM'),
+           (SELECT summary FROM game_history WHERE game_id = g.id
+             ORDER BY summary_date DESC LIMIT 1),
+           NOW()
+      FROM games g
+      LEFT JOIN LATERAL (
+            SELECT universe_id FROM universe_games
+             WHERE game_id = g.id ORDER BY joined_at LIMIT 1
+           ) ug ON TRUE
+      LEFT JOIN universes u ON u.id = ug.universe_id
+      LEFT JOIN rulesets r ON r.id = u.ruleset_id
+     WHERE g.id = %s
+    ON CONFLICT (game_id) DO UPDATE SET
+       universe_id = EXCLUDED.universe_id,
+       universe_name = EXCLUDED.universe_name,
+       universe_description = EXCLUDED.universe_description,
+       ruleset_id = EXCLUDED.ruleset_id,
+       ruleset_name = EXCLUDED.ruleset_name,
+       ruleset_description = EXCLUDED.ruleset_description,
+       ruleset_summary = EXCLUDED.ruleset_summary,
+       ruleset_long_summary = EXCLUDED.ruleset_long_summary,
+       roster = EXCLUDED.roster,
+       opening_message_id = EXCLUDED.opening_message_id,
+       latest_summary = EXCLUDED.latest_summary,
+       updated_at = NOW()
+"""
+
+_READ_SQL = """
+    SELECT gc.*,
+           om.message AS opening_scene,
+           (SELECT coalesce(json_agg(json_build_object('sender', m.sender, 'message', m.message)
+                                     ORDER BY m.timestamp), '[]'::json)
+              FROM (SELECT cm.sender, cm.message, cm.timestamp
+                      FROM game_lineage(gc.game_id) l
+                      JOIN chat_messages cm
+                        ON cm.game_id = l.lineage_game_id
+                       AND (l.upto_message_id IS NULL OR cm.id <= l.upto_message_id)
+                     ORDER BY cm.timestamp DESC
+                     LIMIT %s) m
+           ) AS recent_messages
+      FROM game_context gc
+      LEFT JOIN chat_messages om ON om.id = gc.opening_message_id
+     WHERE gc.game_id = %s
+"""
+
+
+def refresh_game_context(cur, game_id: str):
+    """Rebuild the whole snapshot row for *game_id*."""
+    cur.execute(_REFRESH_SQL, (game_id,))
+
+
+def refresh_roster(cur, game_id: str):
+    """Recompute the roster after a player joins."""
+    cur.execute(
+        f"UPDATE game_context gc SET roster = ({_ROSTER_SQL.format(game_ref='gc.game_id')}), "
+        "updated_at = NOW() WHERE gc.game_id = %s",
+        (game_id,),
+    )
+
+
+def set_opening_message(cur, game_id: str, message_id: int):
+    """Record the first GM message as the opening scene, if none is set yet."""
+    cur.execute(
+        "UPDATE game_context SET opening_message_id = %s, updated_at = NOW() "
+        "WHERE game_id = %s AND opening_message_id IS NULL",
+        (message_id, game_id),
+    )
+
+
+def set_latest_summary(cur, game_id: str, summary: str):
+    cur.execute(
+        "UPDATE game_context SET latest_summary = %s, updated_at = NOW() WHERE game_id = %s",
+        (summary, game_id),
+    )
+
+
+def refresh_ruleset(cur, ruleset_id: str):
+    """Copy edited ruleset metadata into every snapshot that uses it."""
+    cur.execute(
+        """
+        UPDATE game_context gc
+           SET ruleset_name = r.name,
+               ruleset_description = r.description,
+               ruleset_summary = r.summary,
+               ruleset_long_summary = r.long_summary,
+               updated_at = NOW()
+          FROM rulesets r
+         WHERE r.id = %s AND gc.ruleset_id = r.id
+        """,
+        (ruleset_id,),
+    )
+
+
+def get_game_context(game_id: str, last_k: int = 20) -> Optional[dict]:
+    """
+    Return the snapshot for *game_id* together with its opening scene text
+    and the last *last_k* chat messages (``recent_messages``, oldest first).
+    Builds the snapshot on first use. Returns None for unknown games.
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(_READ_SQL, (last_k, game_id))
+            row = cur.fetchone()
+            if row is None:
+                refresh_game_context(cur, game_id)
+                conn.commit()
+                cur.execute(_READ_SQL, (last_k, game_id))
+                row = cur.fetchone()
+            return row
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def rebuild_game_contexts(game_ids: list[str]):
+    """Rebuild snapshots for several games in one transaction (e.g. after a branch)."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            for gid in game_ids:
+                refresh_game_context(cur, gid)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
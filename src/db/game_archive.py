@@ -0,0 +1,321 @@
+# src/db/game_archive.py
+"""
+Compressed single-file archives for finished games.
+
+Once a game is closed, merged or branched its transcript only ever gets
+replayed. ``archive_game`` writes the transcript (including anything
+inherited from ancestor games), stored summaries, universe events and an
+entity snapshot to one file, records it in ``game_archives`` and purges the
+game's own hot rows. Universe events are only copied: they belong to the
+universe timeline, which keeps reading them from ``universe_events``.
+``load_transcript`` replays from the file.
+
+File layout::
+
+    MAGIC | frame | frame | ... | index JSON | index offset (8 bytes, BE) | MAGIC
+
+Every frame is an independently compressed block of JSON lines, using zstd
+when the optional ``zstandard`` package is installed and zlib otherwise.
+The index records the codec and the offset/length of each section's frames;
+transcript frames also carry their first/last message id so a reader can
+seek to a range without decompressing the rest.
+"""
+
+import json
+import os
+import struct
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+from psycopg2.extras import RealDictCursor
+from src.db.character_db import get_db_connection
+
+# zstd compresses transcripts better; fall back to zlib without it.
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+MAGIC = b"IRPGARC1"
+FORMAT_VERSION = 1
+TRANSCRIPT_FRAME_SIZE = 500
+FINISHED_STATUSES = ("closed", "merged", "branched")
+
+
+def _archive_dir() -> Path:
+    project_root = Path(__file__).resolve().parents[2]
+    try:
+        with open(project_root / "config" / "db_config.json", "r", encoding="utf-8") as f:
+            configured = json.load(f).get("GAME_ARCHIVE_DIR")
+    except Exception:
+        configured = None
+    return project_root / (configured or "archive/games")
+
+
+ARCHIVE_DIR = _archive_dir()
+
+
+# ---- file format -------------------------------------------------------------
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Archive is zstd-compressed but 'zstandard' is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _jsonl(rows: list[dict]) -> bytes:
+    return b"".join(
+        json.dumps(row, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+        for row in rows
+    )
+
+
+def write_archive(path: Path, meta: dict, transcript: list[dict], summaries: list[dict],
+                  events: list[dict], entities: list[dict], codec: Optional[str] = None) -> int:
+    """Write an archive file atomically; returns its size in bytes.
+
+    ``transcript`` rows need ``id``, ``sender``, ``message`` and a
+    ``timestamp`` datetime.
+    """
+    codec = codec or ("zstd" if ZSTD_AVAILABLE else "zlib")
+    index = {"version": FORMAT_VERSION, "codec": codec, "sections": {}, "transcript": []}
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+
+        def frame(rows: list[dict]) -> dict:
+            offset = f.tell()
+            f.write(_compress(_jsonl(rows), codec))
+            return {"offset": offset, "length": f.tell() - offset, "rows": len(rows)}
+
+        for name, rows in (("meta", [meta]), ("summaries", summaries),
+                           ("events", events), ("entities", entities)):
+            index["sections"][name] = frame(rows)
+
+        for start in range(0, len(transcript), TRANSCRIPT_FRAME_SIZE):
+            chunk = [
+                {**m, "timestamp": m["timestamp"].isoformat()}
+                for m in transcript[start:start + TRANSCRIPT_FRAME_SIZE]
+            ]
+            entry = frame(chunk)
+            entry["first_id"] = chunk[0]["id"]
+            entry["last_id"] = chunk[-1]["id"]
+            index["transcript"].append(entry)
+
+        index_offset = f.tell()
+        f.write(json.dumps(index).encode("utf-8"))
+        f.write(struct.pack(">Q", index_offset))
+        f.write(MAGIC)
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+
+    os.replace(tmp, path)
+    return size
+
+
+def read_index(path: Path) -> dict:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a game archive")
+        f.seek(-(8 + len(MAGIC)), os.SEEK_END)
+        footer = f.read(8 + len(MAGIC))
+        if footer[8:] != MAGIC:
+            raise ValueError(f"{path} is truncated")
+        (index_offset,) = struct.unpack(">Q", footer[:8])
+        f.seek(index_offset)
+        return json.loads(f.read()[:-(8 + len(MAGIC))])
+
+
+def _read_frame(f, entry: dict, codec: str) -> list[dict]:
+    f.seek(entry["offset"])
+    data = _decompress(f.read(entry["length"]), codec)
+    return [json.loads(line) for line in data.splitlines() if line]
+
+
+def read_section(path: Path, name: str) -> list[dict]:
+    """Return the rows of the ``meta``, ``summaries``, ``events`` or ``entities`` section."""
+    index = read_index(path)
+    with open(path, "rb") as f:
+        return _read_frame(f, index["sections"][name], index["codec"])
+
+
+def iter_transcript(path: Path, after_id: Optional[int] = None) -> Iterator[dict]:
+    """Yield archived messages in order, skipping frames wholly at or before *after_id*."""
+    index = read_index(path)
+    with open(path, "rb") as f:
+        for entry in index["transcript"]:
+            if after_id is not None and entry["last_id"] <= after_id:
+                continue
+            for msg in _read_frame(f, entry, index["codec"]):
+                if after_id is not None and msg["id"] <= after_id:
+                    continue
+                msg["timestamp"] = datetime.fromisoformat(msg["timestamp"])
+                yield msg
+
+
+# ---- database side -------------------------------------------------------------
+
+_DEPENDENTS_SQL = """
+    WITH RECURSIVE descendants AS (
+        SELECT id FROM games WHERE parent_game_id = %s
+        UNION
+        SELECT g.id FROM games g JOIN descendants d ON g.parent_game_id = d.id
+    )
+    SELECT count(*) AS pending
+      FROM descendants d
+     WHERE NOT EXISTS (SELECT 1 FROM game_archives a WHERE a.game_id = d.id)
+"""
+
+
+def get_archive_path(game_id: str, cur=None) -> Optional[str]:
+    """Archive file of *game_id*, or None if it is not archived.
+
+    Pass *cur* to look it up inside the caller's connection.
+    """
+    if cur is None:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as own:
+                return get_archive_path(game_id, own)
+        finally:
+            conn.close()
+    cur.execute("SELECT file_path FROM game_archives WHERE game_id = %s", (game_id,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return row["file_path"] if isinstance(row, dict) else row[0]
+
+
+def load_transcript(game_id: str) -> Optional[list[dict]]:
+    """Return the archived transcript for *game_id*, or None if it is not archived."""
+    path = get_archive_path(game_id)
+    if path is None:
+        return None
+    return list(iter_transcript(Path(path)))
+
+
+def list_archivable_games() -> list[str]:
+    """IDs of finished, not yet archived games, descendants before ancestors."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT g.id FROM games g
+                 WHERE g.status IN %s
+                   AND NOT EXISTS (SELECT 1 FROM game_archives a WHERE a.game_id = g.id)
+                 ORDER BY g.created_at DESC
+                """,
+                (FINISHED_STATUSES,)
+            )
+            return [str(row[0]) for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def archive_game(game_id: str, archive_dir: Path = ARCHIVE_DIR) -> dict:
+    """
+    Archive a finished game to ``<archive_dir>/<game_id>.irpga`` and purge
+    its chat messages, summaries and context snapshot. Its universe events
+    are copied into the archive but stay in place for the universe timeline.
+
+    Raises ValueError if the game is unknown, still live, already archived,
+    or is the ancestor of a branch that has not been archived yet (branches
+    read their inherited transcript from the ancestor's rows).
+    """
+    conn = get_db_connection()
+    path = None
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                "SELECT id, name, status, created_at, parent_game_id, parent_message_watermark "
+                "FROM games WHERE id = %s FOR UPDATE",
+                (game_id,)
+            )
+            game = cur.fetchone()
+            if game is None:
+                raise ValueError(f"Game {game_id} not found")
+            if game["status"] not in FINISHED_STATUSES:
+                raise ValueError(f"Game {game_id} is still {game['status']}")
+            cur.execute("SELECT 1 FROM game_archives WHERE game_id = %s", (game_id,))
+            if cur.fetchone():
+                raise ValueError(f"Game {game_id} is already archived")
+            cur.execute(_DEPENDENTS_SQL, (game_id,))
+            if cur.fetchone()["pending"]:
+                raise ValueError(f"Game {game_id} has unarchived branches; archive them first")
+
+            from src.db.game_db import LINEAGE_MESSAGES_SQL
+            cur.execute(LINEAGE_MESSAGES_SQL + " ORDER BY m.timestamp, m.id", (game_id,))
+            transcript = [
+                {"id": m["id"], "game_id": str(m["game_id"]), "sender": m["sender"],
+                 "message": m["message"], "timestamp": m["timestamp"]}
+                for m in cur.fetchall()
+            ]
+            cur.execute(
+                "SELECT summary, summary_date FROM game_history "
+                "WHERE game_id = %s ORDER BY summary_date",
+                (game_id,)
+            )
+            summaries = cur.fetchall()
+            cur.execute(
+                "SELECT id, universe_id, event_type, event_payload, event_time "
+                "FROM universe_events WHERE game_id = %s ORDER BY event_time, id",
+                (game_id,)
+            )
+            events = cur.fetchall()
+            cur.execute(
+                """
+                SELECT 'character' AS kind, c.id, c.name, c.owner, c.character_data AS data
+                  FROM game_players gp JOIN characters c ON c.id = gp.character_id
+                 WHERE gp.game_id = %s
+                UNION ALL
+                SELECT 'named_entity', ne.id, ne.name, NULL,
+                       jsonb_build_object('universe_id', ne.universe_id,
+                                          'entity_type', ne.entity_type,
+                                          'description', ne.description)
+                  FROM universe_games ug JOIN named_entities ne ON ne.universe_id = ug.universe_id
+                 WHERE ug.game_id = %s
+                """,
+                (game_id, game_id)
+            )
+            entities = cur.fetchall()
+
+            archived_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            meta = {**game, "archived_at": archived_at}
+            path = Path(archive_dir) / f"{game_id}.irpga"
+            size = write_archive(path, meta, transcript, summaries, events, entities)
+
+            cur.execute(
+                "INSERT INTO game_archives (game_id, file_path, message_count, byte_size) "
+                "VALUES (%s, %s, %s, %s)",
+                (game_id, str(path), len(transcript), size)
+            )
+            cur.execute("DELETE FROM chat_messages WHERE game_id = %s", (game_id,))
+            cur.execute("DELETE FROM game_history WHERE game_id = %s", (game_id,))
+            cur.execute("DELETE FROM game_context WHERE game_id = %s", (game_id,))
+        conn.commit()
+        return {"game_id": game_id, "path": str(path), "messages": len(transcript), "bytes": size}
+    except Exception:
+        conn.rollback()
+        # The rows were not purged, so the file is not the game's archive.
+        if path is not None:
+            path.unlink(missing_ok=True)
+        raise
+    finally:
+        conn.close()
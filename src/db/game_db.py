@@ -4,7 +4,10 @@ import json
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from uuid import uuid4
-from typing import Optional
+from datetime import timezone
+from typing import Iterator, Optional
+from src.db import context_db, game_archive
+from src.db.cache import invalidate
 
 def get_db_config() -> dict:
     """
@@ -86,45 +89,216 @@ def join_game(game_id: str, character_id: str):
                 "INSERT INTO game_players (game_id, character_id) VALUES (%s, %s)",
                 (game_id, character_id)
             )
+            context_db.refresh_roster(cur, game_id)
+            invalidate("game_roster", game_id, cur)
             conn.commit()
+        invalidate("game_roster", game_id)
     except Exception as e:
         conn.rollback()
         raise e
     finally:
         conn.close()
 
-def save_chat_message(game_id: str, sender: str, message: str):
+def save_chat_message(game_id: str, sender: str, message: str) -> int:
     """
-    Insert a chat message into the chat_messages table.
+    Insert a chat message into the chat_messages table and return its id.
     """
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
             cur.execute(
-                "INSERT INTO chat_messages (game_id, sender, message) VALUES (%s, %s, %s)",
+                "INSERT INTO chat_messages (game_id, sender, message) VALUES (%s, %s, %s) RETURNING id",
                 (game_id, sender, message)
             )
+            message_id = cur.fetchone()[0]
+            if sender == "GM":
+                context_db.set_opening_message(cur, game_id, message_id)
             conn.commit()
+            return message_id
     except Exception as e:
         conn.rollback()
         raise e
     finally:
         conn.close()
 
-def list_chat_messages(game_id: str) -> list:
+# Joins chat_messages against a game's lineage; rows are the game's own
+# messages plus those inherited from its ancestors up to each branch point.
+LINEAGE_MESSAGES_SQL = """
+    SELECT m.id, m.game_id, m.sender, m.message, m.timestamp
+      FROM game_lineage(%s) l
+      JOIN chat_messages m
+        ON m.game_id = l.lineage_game_id
+       AND (l.upto_message_id IS NULL OR m.id <= l.upto_message_id)
+"""
+
+def list_chat_messages(game_id: str, include_inherited: bool = True) -> list:
     """
     Retrieve all chat messages for a given game, ordered by timestamp.
+    For branched games this includes the parent transcript up to the branch
+    point unless include_inherited is False. Archived games are replayed
+    from their archive file.
     """
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "SELECT id, game_id, sender, message, timestamp FROM chat_messages WHERE game_id = %s ORDER BY timestamp",
-                (game_id,)
-            )
-            return cur.fetchall()
+            archive = game_archive.get_archive_path(game_id, cur)
+            if archive is None:
+                if include_inherited:
+                    cur.execute(LINEAGE_MESSAGES_SQL + " ORDER BY m.timestamp, m.id", (game_id,))
+                else:
+                    cur.execute(
+                        "SELECT id, game_id, sender, message, timestamp FROM chat_messages WHERE game_id = %s ORDER BY timestamp",
+                        (game_id,)
+                    )
+                rows = cur.fetchall()
     finally:
         conn.close()
+    if archive is None:
+        return rows
+    archived = list(game_archive.iter_transcript(archive))
+    if not include_inherited:
+        archived = [m for m in archived if m["game_id"] == str(game_id)]
+    return archived
+
+# Transcript rendered to JSON by Postgres, one document per message, keyed
+# by message id so pages can be fetched by keyset (after_id < id < before_id).
+# Timestamps are UTC ISO-8601 with a trailing Z.
+MESSAGE_DOCS_SQL = f"""
+    SELECT m.id,
+           json_build_object(
+             'id', m.id,
+             'game_id', %s::text,
+             'sender', m.sender,
+             'message', m.message,
+             'timestamp', to_char(m.timestamp AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"')
+           ) AS doc
+      FROM ({LINEAGE_MESSAGES_SQL}) m
+     WHERE m.id > %s AND m.id < %s
+     ORDER BY m.id {{direction}}
+     LIMIT %s
+"""
+
+MAX_MESSAGE_ID = 2**31 - 1
+
+def _page_args(game_id: str, after_id: Optional[int], before_id: Optional[int],
+               limit: Optional[int]) -> tuple[str, tuple]:
+    """
+    Resolve paging arguments to (direction, params). A page with a limit
+    but no after_id is taken from the newest end (ending at before_id), so
+    ``limit=N`` alone returns the most recent N messages.
+    """
+    direction = "DESC" if after_id is None and limit is not None else "ASC"
+    return direction, (game_id, game_id, after_id or 0, before_id or MAX_MESSAGE_ID, limit)
+
+# An archived game's own rows are purged, but the lineage query would still
+# return what its live ancestors kept, so archived games are always served
+# from the archive file (which holds the inherited lines too).
+def _archived_message_docs(game_id: str, path: str, after_id: Optional[int] = None,
+                           before_id: Optional[int] = None, limit: Optional[int] = None) -> list[str]:
+    msgs = [
+        m for m in game_archive.iter_transcript(path, after_id=after_id)
+        if before_id is None or m["id"] < before_id
+    ]
+    if limit is not None:
+        msgs = msgs[:limit] if after_id is not None else msgs[-limit:]
+    return [
+        json.dumps({
+            "id": m["id"],
+            "game_id": str(game_id),
+            "sender": m["sender"],
+            "message": m["message"],
+            "timestamp": m["timestamp"].astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        }, ensure_ascii=False)
+        for m in msgs
+    ]
+
+def list_chat_message_docs(game_id: str, after_id: Optional[int] = None,
+                           before_id: Optional[int] = None, limit: Optional[int] = None) -> list[str]:
+    """
+    Return transcript messages (inherited lines included) as JSON text in
+    id order, one document per message with id, game_id, sender, message
+    and timestamp, rendered by Postgres. See _page_args for paging.
+    """
+    direction, params = _page_args(game_id, after_id, before_id, limit)
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            archive = game_archive.get_archive_path(game_id, cur)
+            if archive is None:
+                cur.execute(
+                    f"SELECT doc::text FROM ({MESSAGE_DOCS_SQL.format(direction=direction)}) d ORDER BY d.id",
+                    params
+                )
+                docs = [row[0] for row in cur.fetchall()]
+    finally:
+        conn.close()
+    if archive is not None:
+        return _archived_message_docs(game_id, archive, after_id, before_id, limit)
+    return docs
+
+def get_chat_page_json(game_id: str, after_id: Optional[int] = None,
+                       before_id: Optional[int] = None, limit: Optional[int] = None) -> bytes:
+    """
+    Return ``{"messages": [...], "next_after_id": N, "prev_before_id": M}``
+    as UTF-8 JSON bytes, aggregated by Postgres so the server can pass it
+    through untouched. The cursors are the last and first ids on the page
+    (null when empty).
+    """
+    direction, params = _page_args(game_id, after_id, before_id, limit)
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            archive = game_archive.get_archive_path(game_id, cur)
+            if archive is None:
+                cur.execute(
+                    f"""
+                    SELECT json_build_object(
+                             'messages', coalesce(json_agg(d.doc ORDER BY d.id), '[]'::json),
+                             'next_after_id', max(d.id),
+                             'prev_before_id', min(d.id)
+                           )::text
+                      FROM ({MESSAGE_DOCS_SQL.format(direction=direction)}) d
+                    """,
+                    params
+                )
+                body = cur.fetchone()[0]
+    finally:
+        conn.close()
+    if archive is not None:
+        docs = _archived_message_docs(game_id, archive, after_id, before_id, limit)
+        first_id = json.loads(docs[0])["id"] if docs else None
+        last_id = json.loads(docs[-1])["id"] if docs else None
+        body = (f'{{"messages": [{", ".join(docs)}], '
+                f'"next_after_id": {json.dumps(last_id)}, "prev_before_id": {json.dumps(first_id)}}}')
+    return body.encode("utf-8")
+
+def iter_chat_message_docs(game_id: str, after_id: Optional[int] = None,
+                           batch_size: int = 500) -> Iterator[str]:
+    """
+    Yield the transcript as JSON documents (see list_chat_message_docs),
+    oldest first, from a server-side cursor so memory stays bounded by
+    *batch_size* rows however long the campaign. The connection is held
+    until the generator is exhausted or closed.
+    """
+    direction, params = _page_args(game_id, after_id, None, None)
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            archive = game_archive.get_archive_path(game_id, cur)
+        if archive is None:
+            with conn.cursor(name=f"chat_docs_{uuid4().hex}") as cur:
+                cur.itersize = batch_size
+                cur.execute(
+                    f"SELECT doc::text FROM ({MESSAGE_DOCS_SQL.format(direction=direction)}) d",
+                    params
+                )
+                for (doc,) in cur:
+                    yield doc
+        conn.commit()
+    finally:
+        conn.close()
+    if archive is not None:
+        yield from _archived_message_docs(game_id, archive, after_id)
 
 def get_character_for_user_in_game(game_id: str, owner: str) -> Optional[str]:
     """
@@ -208,3 +382,22 @@ def get_latest_game_summary(game_id: str) -> Optional[str]:
             return row[0] if row else None
     finally:
         conn.close()
+
+def save_game_summary(game_id: str, summary: str, embedding: list[float]):
+    """Store a new game_history summary and make it the snapshot's latest summary."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO game_history (game_id, summary, embedding) VALUES (%s, %s, %s)",
+                (game_id, summary, embedding)
+            )
+            context_db.set_latest_summary(cur, game_id, summary)
+            invalidate("game_summary", game_id, cur)
+            conn.commit()
+        invalidate("game_summary", game_id)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -5,6 +5,10 @@ import json
 from typing import List, Optional
 from psycopg2.extras import RealDictCursor
 from src.db.character_db import get_db_connection  # re-use your existing config
+from src.db.cache import get_cache, invalidate
+from src.db import context_db
+
+_ruleset_cache = get_cache("ruleset")
 
 def create_ruleset(name: str, description: str, full_text: str) -> dict:
     """
@@ -40,19 +44,39 @@ def list_rulesets() -> List[dict]:
 
 def get_ruleset(rs_id: str) -> Optional[dict]:
     """
-    Fetch a single ruleset by ID, including its full_text.
+    Fetch a single ruleset by ID: name, description, summary, long_summary
+    and char_creation. The raw full_text (the whole extracted PDF) is left
+    out; use get_ruleset_full_text when it is really needed.
+    Cached; set_summary and update_ruleset invalidate the entry.
     """
+    return _ruleset_cache.get_or_load(str(rs_id), lambda: _fetch_ruleset(rs_id))
+
+def _fetch_ruleset(rs_id: str) -> Optional[dict]:
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(
-                "SELECT id, name, description, full_text, summary, long_summary, char_creation, created_at FROM rulesets WHERE id = %s",
+                "SELECT id, name, description, summary, long_summary, char_creation, created_at FROM rulesets WHERE id = %s",
                 (rs_id,)
             )
             return cur.fetchone()
     finally:
         conn.close()
 
+def get_ruleset_full_text(rs_id: str) -> Optional[str]:
+    """
+    Return the raw full_text of a ruleset, or None if it does not exist.
+    Not cached: rulesets can be megabytes of text.
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT full_text FROM rulesets WHERE id = %s", (rs_id,))
+            row = cur.fetchone()
+            return row[0] if row else None
+    finally:
+        conn.close()
+
 def add_chunk(ruleset_id: str, chunk_index: int, chunk_text: str, embedding: List[float]):
     """
     Inserts one chunk and its embedding into ruleset_chunks.
@@ -72,16 +96,49 @@ def add_chunk(ruleset_id: str, chunk_index: int, chunk_text: str, embedding: Lis
     finally:
         conn.close()
 
-def list_chunks(ruleset_id: str) -> List[dict]:
+def chunk_index_name(ruleset_id: str) -> str:
+    """Name of the partial vector index covering one ruleset's chunks."""
+    return f"idx_ruleset_chunks_emb_{uuid.UUID(str(ruleset_id)).hex}"
+
+def chunk_index_sql(ruleset_id: str) -> str:
     """
-    Retrieves all text chunks (with embeddings) for a ruleset in order.
+    CREATE INDEX statement for a partial HNSW index over one ruleset's chunks.
+
+    Lore lookups always filter on a single ruleset; a global ANN index would
+    return the top-k across all rulesets and filter afterwards (often fewer
+    than k rows), whereas a partial index searches only matching chunks.
+    """
+    rs_id = str(uuid.UUID(str(ruleset_id)))
+    return (
+        f"CREATE INDEX IF NOT EXISTS {chunk_index_name(rs_id)} "
+        "ON ruleset_chunks USING hnsw (embedding vector_cosine_ops) "
+        f"WHERE ruleset_id = '{rs_id}'"
+    )
+
+def create_chunk_index(ruleset_id: str):
+    """
+    Build the partial vector index for a ruleset after its chunks are loaded.
     """
     conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(chunk_index_sql(ruleset_id))
+            cur.execute("ANALYZE ruleset_chunks")
+            conn.commit()
+    finally:
+        conn.close()
+
+def list_chunks(ruleset_id: str, include_embeddings: bool = True) -> List[dict]:
+    """
+    Retrieves all text chunks (optionally with embeddings) for a ruleset in order.
+    """
+    columns = "chunk_index, chunk_text, embedding" if include_embeddings else "chunk_index, chunk_text"
+    conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(
-                """
-                SELECT chunk_index, chunk_text, embedding
+                f"""
+                SELECT {columns}
                   FROM ruleset_chunks
                  WHERE ruleset_id = %s
                  ORDER BY chunk_index
@@ -116,6 +173,9 @@ def set_summary(ruleset_id: str, summary: str):
                 "UPDATE rulesets SET summary = %s WHERE id = %s",
                 (summary, ruleset_id)
             )
+            context_db.refresh_ruleset(cur, ruleset_id)
+            invalidate("ruleset", ruleset_id, cur)
             conn.commit()
+        invalidate("ruleset", ruleset_id)
     finally:
         conn.close()
@@ -0,0 +1,174 @@
+# src/db/unit_of_work.py
+"""
+Unit of work for multi-step game operations (branching, merging).
+
+All reads and writes go through a single connection and are committed
+together when the ``with`` block exits cleanly, or rolled back if it
+raises. Row-producing writes are batched into multi-row INSERTs so a large
+party split or multi-game merge costs a handful of round trips.
+
+    with UnitOfWork() as uow:
+        games = uow.create_games(["Branch A", "Branch B"])
+        uow.join_players([(games[0]["id"], "c1"), (games[1]["id"], "c2")])
+"""
+
+import json
+from uuid import uuid4
+from psycopg2.extras import RealDictCursor, execute_values
+from src.db.character_db import get_db_connection
+from src.db import context_db
+
+
+class UnitOfWork:
+    def __init__(self):
+        self.conn = None
+        self.cur = None
+
+    def __enter__(self) -> "UnitOfWork":
+        self.conn = get_db_connection()
+        self.cur = self.conn.cursor(cursor_factory=RealDictCursor)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.cur.close()
+            self.conn.close()
+        return False
+
+    # ---- reads -------------------------------------------------------------
+
+    def get_games(self, game_ids: list[str]) -> dict[str, dict]:
+        """Return {game_id: game row} for the given IDs in one query."""
+        self.cur.execute(
+            "SELECT id, name, status, created_at FROM games WHERE id = ANY(%s::uuid[])",
+            (list(game_ids),)
+        )
+        return {str(row["id"]): row for row in self.cur.fetchall()}
+
+    def list_universes_for_game(self, game_id: str) -> list[str]:
+        self.cur.execute(
+            "SELECT universe_id FROM universe_games WHERE game_id = %s",
+            (game_id,)
+        )
+        return [str(row["universe_id"]) for row in self.cur.fetchall()]
+
+    def list_players(self, game_ids: list[str]) -> dict[str, list[str]]:
+        """Return {game_id: [character_id, ...]} for the given games."""
+        self.cur.execute(
+            "SELECT game_id, character_id FROM game_players "
+            "WHERE game_id = ANY(%s::uuid[]) ORDER BY joined_at",
+            (list(game_ids),)
+        )
+        players: dict[str, list[str]] = {str(gid): [] for gid in game_ids}
+        for row in self.cur.fetchall():
+            players[str(row["game_id"])].append(str(row["character_id"]))
+        return players
+
+    def latest_summaries(self, game_ids: list[str]) -> dict[str, str]:
+        """Return {game_id: latest game_history summary} for games that have one."""
+        self.cur.execute(
+            "SELECT DISTINCT ON (game_id) game_id, summary FROM game_history "
+            "WHERE game_id = ANY(%s::uuid[]) ORDER BY game_id, summary_date DESC",
+            (list(game_ids),)
+        )
+        return {str(row["game_id"]): row["summary"] for row in self.cur.fetchall()}
+
+    def message_watermark(self, game_id: str) -> int:
+        """Highest chat message id currently stored for the game (0 if none)."""
+        self.cur.execute(
+            "SELECT coalesce(max(id), 0) AS upto FROM chat_messages WHERE game_id = %s",
+            (game_id,)
+        )
+        return self.cur.fetchone()["upto"]
+
+    # ---- writes ------------------------------------------------------------
+
+    def create_games(self, names: list[str], status: str = "waiting",
+                     parent_game_id: str | None = None,
+                     parent_message_watermark: int | None = None) -> list[dict]:
+        """Insert one game per name; returns game dicts in the same order.
+
+        With ``parent_game_id`` the new games inherit the parent's transcript
+        up to ``parent_message_watermark`` instead of copying it.
+        """
+        games = [{"id": str(uuid4()), "name": name, "status": status} for name in names]
+        if games:
+            execute_values(
+                self.cur,
+                "INSERT INTO games (id, name, status, parent_game_id, parent_message_watermark) "
+                "VALUES %s",
+                [
+                    (g["id"], g["name"], g["status"], parent_game_id, parent_message_watermark)
+                    for g in games
+                ]
+            )
+        return games
+
+    def link_games(self, links: list[tuple[str, str]]):
+        """Insert (universe_id, game_id) rows into universe_games."""
+        if links:
+            execute_values(
+                self.cur,
+                "INSERT INTO universe_games (universe_id, game_id) VALUES %s "
+                "ON CONFLICT DO NOTHING",
+                links
+            )
+
+    def join_players(self, joins: list[tuple[str, str]]):
+        """Insert (game_id, character_id) rows; repeated joins are ignored."""
+        if joins:
+            execute_values(
+                self.cur,
+                "INSERT INTO game_players (game_id, character_id) VALUES %s "
+                "ON CONFLICT DO NOTHING",
+                joins
+            )
+
+    def save_messages(self, messages: list[tuple[str, str, str]]):
+        """Insert (game_id, sender, message) rows into chat_messages."""
+        if messages:
+            execute_values(
+                self.cur,
+                "INSERT INTO chat_messages (game_id, sender, message) VALUES %s",
+                messages
+            )
+
+    def update_status(self, game_ids: list[str], status: str):
+        self.cur.execute(
+            "UPDATE games SET status = %s WHERE id = ANY(%s::uuid[])",
+            (status, list(game_ids))
+        )
+
+    def record_branch(self, original_game_id: str, new_game_ids: list[str], branch_info: dict):
+        self.cur.execute(
+            "INSERT INTO game_branches (original_game, new_game_ids, branch_info) "
+            "VALUES (%s, %s, %s)",
+            (original_game_id, json.dumps(new_game_ids), json.dumps(branch_info))
+        )
+
+    def record_merger(self, universe_id: str, from_instance_ids: list[str], into_instance_id: str):
+        self.cur.execute(
+            "INSERT INTO mergers (universe_id, from_instance_ids, into_instance_id) "
+            "VALUES (%s, %s, %s)",
+            (universe_id, json.dumps(from_instance_ids), into_instance_id)
+        )
+
+    def record_events(self, events: list[tuple[str, str, str, dict]]):
+        """Insert (universe_id, game_id, event_type, payload) rows into universe_events."""
+        if events:
+            execute_values(
+                self.cur,
+                "INSERT INTO universe_events "
+                "(universe_id, game_id, event_type, event_payload) VALUES %s",
+                [(uid, gid, etype, json.dumps(payload)) for uid, gid, etype, payload in events]
+            )
+
+    def refresh_contexts(self, game_ids: list[str]):
+        """Rebuild the game_context snapshots for the given games."""
+        for gid in game_ids:
+            context_db.refresh_game_context(self.cur, gid)
@@ -6,6 +6,11 @@ from psycopg2.extras import RealDictCursor
 from uuid import uuid4
 from pathlib import Path
 
+from src.db.cache import get_cache, invalidate
+from src.db import context_db
+
+_universe_cache = get_cache("universe")
+
 def get_db_config() -> dict:
     """Load DB config from config/db_config.json in project root."""
     project_root = Path(__file__).resolve().parents[2]
@@ -61,6 +66,10 @@ def list_universes() -> list[dict]:
 
 # Update get_universe to return ruleset_id too:
 def get_universe(universe_id: str) -> dict | None:
+    """Fetch a universe by ID (cached; universes are never edited in place)."""
+    return _universe_cache.get_or_load(str(universe_id), lambda: _fetch_universe(universe_id))
+
+def _fetch_universe(universe_id: str) -> dict | None:
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -83,7 +92,10 @@ def add_game_to_universe(universe_id: str, game_id: str):
                 "INSERT INTO universe_games (universe_id, game_id) VALUES (%s, %s)",
                 (universe_id, game_id)
             )
+            context_db.refresh_game_context(cur, game_id)
+            invalidate("game_universes", game_id, cur)
             conn.commit()
+        invalidate("game_universes", game_id)
     except Exception:
         conn.rollback()
         raise
@@ -248,7 +260,9 @@ def record_news(universe_id: str, summary: str):
                 "INSERT INTO universe_news (universe_id, summary) VALUES (%s, %s)",
                 (universe_id, summary)
             )
+            invalidate("universe_news", universe_id, cur)
             conn.commit()
+        invalidate("universe_news", universe_id)
     except Exception:
         conn.rollback()
         raise
@@ -350,8 +364,11 @@ def upsert_named_entity(
                         player_character,
                     ),
                 )
+            entity = cur.fetchone()
+            invalidate("universe_entities", universe_id, cur)
             conn.commit()
-            return cur.fetchone()
+        invalidate("universe_entities", universe_id)
+        return entity
     except Exception:
         conn.rollback()
         raise
@@ -1,15 +1,6 @@
 # src/game/brancher.py
 
-import json
-from src.db import universe_db
-from src.db.game_db import (
-    create_game,
-    join_game,
-    update_game_status,
-    get_game,
-    save_chat_message,
-    get_latest_game_summary,
-)
+from src.db.unit_of_work import UnitOfWork
 from src.server.notifications import notify_branch
 
 
@@ -19,55 +10,52 @@ def run_branch(original_game_id: str, groups: list[dict], *, send_notifications:
     Each group should be a dict with ``character_ids`` (list[str]) and
     ``description`` fields. Returns a list of dictionaries containing the
     new game object and its assigned character IDs.
-    """
-    base = get_game(original_game_id)
-    base_name = base["name"] if base else original_game_id
-
-    new_games: list[dict] = []
-
-    summary_text = get_latest_game_summary(original_game_id)
-    uni_ids = universe_db.list_universes_for_game(original_game_id)
 
-    for grp in groups:
-        desc = grp.get("description", "").strip()
-        new_name = f"Branch of {base_name}: {desc}" if desc else f"Branch of {base_name}"
-        g = create_game(new_name)
-        new_id = g["id"]
-
-        for uid in uni_ids:
-            universe_db.add_game_to_universe(uid, new_id)
+    The whole split runs in one transaction: either every new game, link,
+    join and record is written, or nothing is. New games reference the
+    original transcript up to this point rather than copying it.
+    """
+    with UnitOfWork() as uow:
+        base = uow.get_games([original_game_id]).get(original_game_id)
+        base_name = base["name"] if base else original_game_id
+
+        summary_text = uow.latest_summaries([original_game_id]).get(original_game_id)
+        uni_ids = uow.list_universes_for_game(original_game_id)
+
+        names = []
+        for grp in groups:
+            desc = grp.get("description", "").strip()
+            names.append(f"Branch of {base_name}: {desc}" if desc else f"Branch of {base_name}")
+        created = uow.create_games(
+            names,
+            parent_game_id=original_game_id,
+            parent_message_watermark=uow.message_watermark(original_game_id),
+        )
 
-        for cid in grp.get("character_ids", []):
-            try:
-                join_game(new_id, cid)
-            except Exception:
-                pass
+        new_games: list[dict] = [
+            {"game": g, "character_ids": grp.get("character_ids", [])}
+            for g, grp in zip(created, groups)
+        ]
+        new_ids = [g["id"] for g in created]
 
+        uow.link_games([(uid, gid) for gid in new_ids for uid in uni_ids])
+        uow.join_players([
+            (ng["game"]["id"], cid) for ng in new_games for cid in ng["character_ids"]
+        ])
         if summary_text:
             prefix = f"Summary of {base_name}:\n{summary_text}"
-            save_chat_message(new_id, "System", prefix)
-
-        new_games.append({"game": g, "character_ids": grp.get("character_ids", [])})
+            uow.save_messages([(gid, "System", prefix) for gid in new_ids])
 
-    update_game_status(original_game_id, "branched")
+        uow.update_status([original_game_id], "branched")
 
-    new_ids = [ng["game"]["id"] for ng in new_games]
-    branch_info = {"groups": groups}
-    universe_db.record_branch(original_game_id, new_ids, branch_info)
-    for uid in uni_ids:
-        universe_db.record_event(
-            universe_id=uid,
-            game_id=original_game_id,
-            event_type="branch",
-            payload={"new_game_ids": new_ids, "groups": groups},
-        )
-        for ng in new_games:
-            universe_db.record_event(
-                universe_id=uid,
-                game_id=ng["game"]["id"],
-                event_type="branched_from",
-                payload={"original_game_id": original_game_id},
-            )
+        uow.record_branch(original_game_id, new_ids, {"groups": groups})
+        events = []
+        for uid in uni_ids:
+            events.append((uid, original_game_id, "branch", {"new_game_ids": new_ids, "groups": groups}))
+            for gid in new_ids:
+                events.append((uid, gid, "branched_from", {"original_game_id": original_game_id}))
+        uow.record_events(events)
+        uow.refresh_contexts(new_ids)
 
     if send_notifications:
         notify_branch(original_game_id, new_games)
@@ -3,6 +3,7 @@
 import json
 from src.db import universe_db
 from src.db import game_db
+from src.llm.json_stream import parse_json_text
 from src.llm.llm_client import generate_completion
 from src.game.merger import run_merger_for_conflict
 from src.utils.prompt_loader import load_prompt_template
@@ -43,29 +44,16 @@ def run_conflict_detector(universe_id: str):
     full_prompt = "\n".join(prompt_lines)
 
     # 3) Call the LLM
-    response_text = generate_completion(full_prompt)
-    
-    # 4) Strip markdown/code fences if present
-    cleaned = response_text.strip()
-    if cleaned.startswith("```"):
-        lines = cleaned.splitlines()
-        # remove first fence line
-        if lines and lines[0].startswith("```"):
-            lines = lines[1:]
-        # remove last fence line
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        cleaned = "\n".join(lines)
-
+    response_text = generate_completion(full_prompt, call_site="conflict_detection")
     
     #Debug logging
     #print("=== Conflict Prompt ===\n", full_prompt)
-    #print("=== LLM Response ===\n", cleaned)
+    #print("=== LLM Response ===\n", response_text)
 
     # 4) Parse and record any conflicts
     try:
-        conflicts = json.loads(cleaned)
-    except json.JSONDecodeError:
+        conflicts = parse_json_text(response_text, start_chars="[")
+    except ValueError:
         # could log this for inspection
         print("[conflict_detector] ❌ JSON decode failed:", response_text)
         return
@@ -108,4 +108,4 @@ def generate_initial_scene(
         starting_player,
         ruleset_id
     )
-    return generate_completion(prompt)
+    return generate_completion(prompt, call_site="initial_scene")
@@ -10,6 +10,7 @@ import json
 from pathlib import Path
 from typing import Any, Dict, List
 
+from src.llm.json_stream import parse_json_text
 from src.llm.llm_client import generate_completion
 from src.utils.prompt_loader import load_prompt_template
 
@@ -46,20 +47,11 @@ def run_named_entity_extractor(
         known_entities=known_text,
     )
 
-    response_text = generate_completion(prompt)
-
-    cleaned = response_text.strip()
-    if cleaned.startswith("```"):
-        lines = cleaned.splitlines()
-        if lines and lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        cleaned = "\n".join(lines)
+    response_text = generate_completion(prompt, call_site="entity_extraction")
 
     try:
-        data = json.loads(cleaned)
-    except json.JSONDecodeError:
+        data = parse_json_text(response_text, start_chars="{")
+    except ValueError:
         print("[named_entity_extractor] JSON decode failed")
         return {}
 
@@ -40,7 +40,7 @@ def run_news_extractor(universe_id: str, event_limit: int = 50) -> str:
     full_prompt = "\n".join(prompt_lines)
 
     # 3) Generate the summary via LLM
-    summary = generate_completion(full_prompt)
+    summary = generate_completion(full_prompt, call_site="news")
 
     # 4) Record the bulletin in the DB
     universe_db.record_news(universe_id, summary)
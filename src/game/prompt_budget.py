@@ -0,0 +1,85 @@
+"""
+prompt_budget.py - Token budget planning for prompt sections
+
+A prompt is a set of sections (chat history, lore, entities, news, ...),
+each a list of items that can be dropped one at a time. plan_prompt() fits
+them into a token budget:
+
+  1. required sections (static prefix, trigger) are always kept and paid first;
+  2. every section gets its reserved ``share`` of the budget, filled greedily
+     in its preference order, lowest ``priority`` first;
+  3. what the reservations left unused goes to the sections, again by
+     priority, until the next item no longer fits.
+
+Items are counted with the memoizing TokenCounter, so re-planning a turn
+only encodes the text that is new since the last one.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from src.utils.token_counter import TokenCounter, get_token_counter
+
+
+class Section(NamedTuple):
+    name: str
+    items: Sequence[str]
+    priority: int = 0          # lower is filled first
+    share: float = 0.0         # fraction of the budget reserved for this section
+    newest_last: bool = False  # prefer the last items (chat history, news)
+    required: bool = False     # always included in full
+
+
+class PromptPlan(NamedTuple):
+    budget: int
+    used: int
+    items: Dict[str, List[str]]    # kept items per section, in their original order
+    tokens: Dict[str, int]
+    dropped: Dict[str, int]        # items left out per section
+
+    def truncated(self, name: str) -> bool:
+        return self.dropped.get(name, 0) > 0
+
+
+def plan_prompt(sections: Sequence[Section], budget: int, model: str,
+                counter: Optional[TokenCounter] = None) -> PromptPlan:
+    counter = counter or get_token_counter()
+    flat = [item for s in sections for item in s.items]
+    counts = iter(counter.count_batch(flat, model))
+    sizes = {s.name: [next(counts) for _ in s.items] for s in sections}
+
+    taken: Dict[str, List[int]] = {s.name: [] for s in sections}
+    tokens = {s.name: 0 for s in sections}
+    for s in sections:
+        if s.required:
+            taken[s.name] = list(range(len(s.items)))
+            tokens[s.name] = sum(sizes[s.name])
+    remaining = budget - sum(tokens.values())
+
+    def order(s: Section) -> List[int]:
+        idx = range(len(s.items))
+        return list(reversed(idx)) if s.newest_last else list(idx)
+
+    def fill(s: Section, limit: int) -> int:
+        """Take items of *s* in preference order while they fit in *limit*; returns tokens taken."""
+        spent = 0
+        for i in order(s)[len(taken[s.name]):]:
+            if spent + sizes[s.name][i] > limit:
+                break
+            taken[s.name].append(i)
+            spent += sizes[s.name][i]
+        tokens[s.name] += spent
+        return spent
+
+    optional = sorted((s for s in sections if not s.required), key=lambda s: s.priority)
+    for s in optional:
+        remaining -= fill(s, min(int(s.share * budget), max(remaining, 0)))
+    for s in optional:
+        remaining -= fill(s, max(remaining, 0))
+
+    return PromptPlan(
+        budget=budget,
+        used=sum(tokens.values()),
+        items={s.name: [s.items[i] for i in sorted(taken[s.name])] for s in sections},
+        tokens=tokens,
+        dropped={s.name: len(s.items) - len(taken[s.name]) for s in sections},
+    )
@@ -2,7 +2,10 @@
 RAG Retrieval Module for InfluenceRPG
 
 This module embeds a free-text query and retrieves the top-K most similar
-chunks from the `ruleset_chunks` table using PostgreSQL's vector similarity (<->) operator.
+chunks from the `ruleset_chunks` table using pgvector's cosine distance (<=>)
+operator, which matches the `vector_cosine_ops` indexes on that table.
+
+Queries are embedded with the shared model from src.llm.embeddings.
 
 Dependencies:
   pip install sentence-transformers psycopg2-binary
@@ -11,32 +14,44 @@ Place this file at: src/game/rag.py
 """
 import logging
 
-from sentence_transformers import SentenceTransformer
 from src.db.character_db import get_db_connection
+from src.llm.embeddings import get_embedding_service
 
-# Load the embedding model once, falling back to a dummy model if download fails
-try:
-    _embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-except Exception as e:  # pragma: no cover - network/offline fallback
-    logging.error(f"Could not load embedding model: {e}")
-
-    class _DummyModel:
-        def encode(self, texts):
-            # Return a fixed-size zero vector for each text
-            return [[0.0] * 384 for _ in texts]
-
-    _embedding_model = _DummyModel()
 # Default number of chunks to retrieve
 DEFAULT_TOP_K = 5
 
+# Must use <=> (cosine) so the planner can match the vector_cosine_ops
+# indexes; an L2 (<->) ordering can never use them and falls back to a
+# sequential scan over every chunk.
+RETRIEVE_SQL = """
+    SELECT chunk_text
+      FROM ruleset_chunks
+     WHERE ruleset_id = %s
+     ORDER BY embedding <=> %s::vector
+     LIMIT %s
+"""
+
+
+def to_vector_param(embedding) -> str:
+    """
+    Format an embedding as a compact pgvector input value.
+
+    psycopg2 only speaks the text protocol, so the vector still travels as
+    text; formatting at float32 precision roughly halves its size compared
+    to Python's float64 repr.
+    """
+    return "[" + ",".join(f"{float(x):.7g}" for x in embedding) + "]"
+
 
 def embed_query(query: str) -> list[float]:
     """
     Convert a text query into a vector embedding.
     """
     try:
-        emb = _embedding_model.encode([query])[0]
-        return emb.tolist()
+        service = get_embedding_service()
+        emb = service.embed(query)
+        # A zero vector has no cosine distance; there is nothing to look up.
+        return emb if service.state == "ready" else []
     except Exception as e:
         logging.error(f"Failed to embed query: {e}")
         return []
@@ -58,22 +73,12 @@ def retrieve_chunks(ruleset_id: str, query: str, top_k: int = DEFAULT_TOP_K) ->
     if not embedding:
         return []
 
-    # Convert embedding list to pgvector literal '[f1,f2,...]'
-    vec_literal = "[" + ",".join(str(x) for x in embedding) + "]"
-
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT chunk_text
-                  FROM ruleset_chunks
-                 WHERE ruleset_id = %s
-                 ORDER BY embedding <-> %s::vector
-                 LIMIT %s
-                """,
-                (ruleset_id, vec_literal, top_k)
-            )
+            # ruleset_id is bound client-side as a literal, so the planner can
+            # match it against the per-ruleset partial index predicate.
+            cur.execute(RETRIEVE_SQL, (ruleset_id, to_vector_param(embedding), top_k))
             rows = cur.fetchall()
             return [row[0] for row in rows]
     except Exception as e:
@@ -0,0 +1,224 @@
+"""
+session.py - Per-game state shared by GM turns
+
+A GameSession is created on the first connection to a game and kept while
+players are connected (``drop_session`` forgets it when the last one leaves or
+the game is closed), so a GM turn reads what it needs from memory instead of
+re-querying it on every loop iteration. Each part is loaded on first use:
+
+    universe_ids    universes the game is linked to
+    universe        row of the first of them
+    ruleset         that universe's ruleset (summaries, char_creation, ...)
+    gm_prefix       static GM prompt prefix built from the two rows above
+    roster          character rows of the players in the game
+    entity_json     known named entities of the game's universes, as JSON
+    news            recent news of the first universe
+    game_context    the game_context snapshot (latest summary, opening scene),
+                    read only once the chat history outgrows the prompt budget
+
+plus ``news_watermark``, the publish time of the newest news item already
+shown to the GM.
+
+Parts are dropped when a matching invalidation goes through src.db.cache
+(from this worker, or from others over NOTIFY): game_universes, game_roster,
+game_summary, universe, ruleset, character, universe_entities and universe_news. They are
+also reloaded after cache.DEFAULT_TTL seconds, the staleness bound the row
+caches already accept.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.db import character_db, context_db, game_db, ruleset_db, universe_db
+from src.db.cache import DEFAULT_TTL, add_invalidation_listener
+from src.llm.gm_llm import build_gm_prefix
+from src.llm.prefix_cache import StaticPrefix
+
+NEWS_LIMIT = 5
+
+_MISSING = object()
+
+# Parts derived from another part are dropped along with it.
+_DEPENDENTS = {
+    "universe_ids": ("universe", "entities", "news"),
+    "universe": ("ruleset",),
+    "ruleset": ("gm_prefix",),
+}
+
+
+def _as_utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+class GameSession:
+    def __init__(self, game_id: str, max_age: float = DEFAULT_TTL):
+        self.game_id = game_id
+        self.max_age = max_age
+        self.news_watermark = datetime.fromtimestamp(0, tz=timezone.utc)
+        self._parts: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    # -- loading -----------------------------------------------------------------
+
+    def _get(self, part: str, loader: Callable[[], Any]) -> Any:
+        value = self._peek(part)
+        if value is _MISSING:
+            value = loader()
+            with self._lock:
+                self._parts[part] = (time.monotonic() + self.max_age, value)
+        return value
+
+    def _peek(self, part: str) -> Any:
+        """The loaded value of *part*, or _MISSING; never touches the database."""
+        with self._lock:
+            entry = self._parts.get(part)
+            if entry is None or entry[0] <= time.monotonic():
+                return _MISSING
+            return entry[1]
+
+    def invalidate(self, *parts: str) -> None:
+        """Drop *parts* (and what is derived from them); no parts drops everything."""
+        with self._lock:
+            if not parts:
+                self._parts.clear()
+                return
+            pending = list(parts)
+            while pending:
+                part = pending.pop()
+                self._parts.pop(part, None)
+                pending.extend(_DEPENDENTS.get(part, ()))
+
+    # -- parts -------------------------------------------------------------------
+
+    @property
+    def universe_ids(self) -> List[str]:
+        return self._get("universe_ids", lambda: universe_db.list_universes_for_game(self.game_id))
+
+    @property
+    def universe(self) -> Optional[dict]:
+        def load():
+            ids = self.universe_ids
+            return universe_db.get_universe(ids[0]) if ids else None
+        return self._get("universe", load)
+
+    @property
+    def ruleset_id(self) -> Optional[str]:
+        universe = self.universe
+        return universe.get("ruleset_id") if universe else None
+
+    @property
+    def ruleset(self) -> Optional[dict]:
+        def load():
+            rs_id = self.ruleset_id
+            return ruleset_db.get_ruleset(rs_id) if rs_id else None
+        return self._get("ruleset", load)
+
+    @property
+    def gm_prefix(self) -> StaticPrefix:
+        return self._get("gm_prefix", lambda: build_gm_prefix(self.universe, self.ruleset))
+
+    @property
+    def roster(self) -> List[dict]:
+        def load():
+            chars = (character_db.get_character_by_id(cid)
+                     for cid in game_db.list_players_in_game(self.game_id))
+            return [c for c in chars if c]
+        return self._get("roster", load)
+
+    @property
+    def entity_json(self) -> str:
+        return self._get("entities", self._load_entities)
+
+    def _load_entities(self) -> str:
+        entities = []
+        for uid in self.universe_ids:
+            try:
+                entities.extend(universe_db.list_named_entities(uid, limit=100))
+            except Exception:
+                continue
+        # Convert any datetime objects so the list is JSON serializable.
+        for entity in entities:
+            for key, value in list(entity.items()):
+                if isinstance(value, datetime):
+                    entity[key] = value.isoformat()
+        return json.dumps(entities, ensure_ascii=False)
+
+    @property
+    def game_context(self) -> dict:
+        return self._get("context", lambda: context_db.get_game_context(self.game_id, last_k=0) or {})
+
+    def fresh_news(self, limit: int = NEWS_LIMIT) -> List[dict]:
+        """
+        News items of the first universe newer than ``news_watermark``, oldest
+        first, and advance the watermark past them. Only queries the database
+        after news was recorded (or the part expired).
+        """
+        def load():
+            ids = self.universe_ids
+            return universe_db.list_news(ids[0], limit=limit) if ids else []
+
+        fresh = [item for item in self._get("news", load)
+                 if _as_utc(item["published_at"]) > self.news_watermark]
+        fresh.sort(key=lambda item: _as_utc(item["published_at"]))
+        if fresh:
+            self.news_watermark = _as_utc(fresh[-1]["published_at"])
+        return fresh
+
+    # -- invalidation ------------------------------------------------------------
+
+    def on_invalidate(self, name: str, key: str) -> None:
+        if name == "game_universes" and key == str(self.game_id):
+            self.invalidate("universe_ids")
+        elif name == "game_roster" and key == str(self.game_id):
+            self.invalidate("roster")
+        elif name == "game_summary" and key == str(self.game_id):
+            self.invalidate("context")
+        elif name == "character":
+            roster = self._peek("roster")
+            if roster is not _MISSING and any(str(c.get("id")) == key for c in roster):
+                self.invalidate("roster")
+        elif name in ("universe", "universe_entities", "universe_news"):
+            ids = self._peek("universe_ids")
+            if ids is not _MISSING and key in (str(u) for u in ids):
+                part = {"universe": "universe", "universe_entities": "entities",
+                        "universe_news": "news"}[name]
+                self.invalidate(part)
+        elif name == "ruleset":
+            universe = self._peek("universe")
+            if universe not in (_MISSING, None) and str(universe.get("ruleset_id")) == key:
+                self.invalidate("ruleset")
+
+
+_sessions: Dict[str, GameSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(game_id: str) -> GameSession:
+    """The process-wide session for *game_id*, created on first use."""
+    with _sessions_lock:
+        session = _sessions.get(game_id)
+        if session is None:
+            session = _sessions[game_id] = GameSession(game_id)
+        return session
+
+
+def drop_session(game_id: str) -> None:
+    """Forget the session of *game_id*; the next get_session() starts a fresh one."""
+    with _sessions_lock:
+        _sessions.pop(game_id, None)
+
+
+def _on_invalidate(name: Optional[str], key: Optional[str]) -> None:
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+    for session in sessions:
+        if name is None:
+            session.invalidate()
+        else:
+            session.on_invalidate(name, key)
+
+
+add_invalidation_listener(_on_invalidate)
@@ -1,6 +1,7 @@
+import asyncio
 import json
 import random
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 from src.llm.llm_client import generate_completion
 from src.game.rag import retrieve_chunks
@@ -30,7 +31,7 @@ def plan_tool_calls(conversation_context: str, trigger_prompt: str) -> Dict[str,
         f"Latest Prompt: {trigger_prompt}\n\n"
         "Tool Calls:"
     )
-    raw = generate_completion(prompt=tool_prompt, conversation_context="")
+    raw = generate_completion(prompt=tool_prompt, conversation_context="", call_site="tool_planning")
     try:
         return json.loads(raw.strip())
     except Exception:
@@ -46,4 +47,42 @@ def query_ruleset_chunks(ruleset_id: str, query: str, top_k: int = DEFAULT_TOP_K
     try:
         return retrieve_chunks(ruleset_id, query, top_k)
     except Exception:
-        return []
\ No newline at end of file
+        return []
+
+
+class LorePrefetcher:
+    """Ruleset lore lookups for one GM turn, shared by query.
+
+    Lookups run in worker threads as soon as they are requested, so one
+    started speculatively (from the player's trigger text, or from a
+    ``tool_calls`` object that is still streaming in) is simply awaited
+    when the GM asks for the same query.
+    """
+
+    def __init__(self, ruleset_id: Optional[str]):
+        self.ruleset_id = ruleset_id
+        self._lookups: Dict[Tuple[str, int], "asyncio.Future[List[str]]"] = {}
+
+    def prefetch(self, query: str, top_k: int = DEFAULT_TOP_K) -> "asyncio.Future[List[str]]":
+        """Start (or reuse) the lookup for *query*; must be called on the event loop."""
+        key = (" ".join(query.lower().split()), top_k)
+        if key not in self._lookups:
+            if self.ruleset_id and key[0]:
+                lookup = asyncio.ensure_future(
+                    asyncio.to_thread(query_ruleset_chunks, self.ruleset_id, query, top_k)
+                )
+            else:
+                lookup = asyncio.get_running_loop().create_future()
+                lookup.set_result([])
+            self._lookups[key] = lookup
+        return self._lookups[key]
+
+    async def get(self, query: str, top_k: int = DEFAULT_TOP_K) -> List[str]:
+        return await self.prefetch(query, top_k)
+
+    def ready(self, query: str, top_k: int = DEFAULT_TOP_K) -> List[str]:
+        """Chunks of a finished lookup for *query*, or [] if it is not done (or failed)."""
+        lookup = self._lookups.get((" ".join(query.lower().split()), top_k))
+        if lookup is None or not lookup.done() or lookup.cancelled() or lookup.exception():
+            return []
+        return lookup.result()
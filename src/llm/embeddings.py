@@ -0,0 +1,276 @@
+"""
+embeddings.py - Shared sentence-embedding model
+
+One EmbeddingService per process serves every caller (GM summaries, lore
+retrieval, ruleset import), so the model is held in memory once. It loads
+lazily on first use, or ahead of time with ``warmup()`` from a background
+thread at server startup, and loads offline-first:
+
+  1. from the local model cache (``EMBEDDING_CACHE_DIR``, by default the
+     sentence-transformers/Hugging Face cache), without network access;
+  2. only if that fails and ``EMBEDDING_ALLOW_DOWNLOAD`` is on, from the
+     Hugging Face hub into that cache;
+  3. otherwise a zero-vector stand-in, so lookups return nothing instead of
+     failing, and ``status()`` reports ``fallback``. Callers that store
+     vectors pass ``require_model=True`` and get EmbeddingUnavailable instead,
+     since a stored zero vector can never be found by cosine distance.
+
+Single texts (``embed``/``aembed``) go through an EmbeddingBatcher: requests
+from all callers are gathered for up to EMBEDDING_BATCH_WAIT_MS or
+EMBEDDING_BATCH_MAX texts and embedded with one ``encode`` on a dedicated
+thread, so concurrent lore lookups and summaries share a forward pass
+instead of each running their own.
+
+Config keys (config/llm_config.json): EMBEDDING_MODEL (default
+all-MiniLM-L6-v2), EMBEDDING_DIMENSIONS (384), EMBEDDING_CACHE_DIR
+(relative to the project root), EMBEDDING_ALLOW_DOWNLOAD (true),
+EMBEDDING_BATCH_MAX (32) and EMBEDDING_BATCH_WAIT_MS (5).
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.llm import metrics
+from src.llm.llm_client import PROJECT_ROOT, load_llm_config
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    SentenceTransformer = None
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_DIMENSIONS = 384
+DEFAULT_BATCH_MAX = 32
+DEFAULT_BATCH_WAIT_MS = 5.0
+
+
+class EmbeddingUnavailable(RuntimeError):
+    """No embedding model could be loaded, and the caller needs real vectors."""
+
+
+class _ZeroModel:
+    """Stand-in when no model could be loaded: a zero vector per text."""
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+
+    def encode(self, texts, **kwargs):
+        return np.zeros((len(texts), self.dimensions), dtype=np.float32)
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batches single texts into one ``encode`` call on a worker thread.
+    The thread takes the first waiting request, keeps collecting for up to
+    ``max_wait_ms`` (or until ``max_batch`` texts), encodes the distinct texts
+    and resolves each caller's future with its vector.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray],
+                 max_batch: int = DEFAULT_BATCH_MAX, max_wait_ms: float = DEFAULT_BATCH_WAIT_MS):
+        self.encode = encode
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.SimpleQueue[Tuple[str, Future]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, text: str) -> "Future[List[float]]":
+        future: "Future[List[float]]" = Future()
+        self._queue.put((text, future))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher",
+                                                    daemon=True)
+                    self._thread.start()
+        return future
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return [(t, f) for t, f in batch if f.set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+            texts = list(dict.fromkeys(t for t, _ in batch))
+            start = time.monotonic()
+            try:
+                vectors = self.encode(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            metrics.observe("embedding_encode", time.monotonic() - start)
+            metrics.incr("embedding_batches")
+            metrics.incr("embedding_texts", "", len(batch))
+            by_text = {t: v for t, v in zip(texts, vectors)}
+            for text, future in batch:
+                future.set_result(np.asarray(by_text[text]).tolist())
+
+
+class EmbeddingService:
+    def __init__(self, model_name: str = DEFAULT_MODEL, dimensions: int = DEFAULT_DIMENSIONS,
+                 cache_dir: Optional[Path] = None, allow_download: bool = True,
+                 batch_max: int = DEFAULT_BATCH_MAX, batch_wait_ms: float = DEFAULT_BATCH_WAIT_MS):
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.cache_dir = cache_dir
+        self.allow_download = allow_download
+        self.batcher = EmbeddingBatcher(self.encode, batch_max, batch_wait_ms)
+        self.state = "cold"           # cold, loading, ready or fallback
+        self.source: Optional[str] = None
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._model = None
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+
+    # -- loading -----------------------------------------------------------------
+
+    def _open(self, local_only: bool):
+        kwargs = {"local_files_only": local_only}
+        if self.cache_dir is not None:
+            kwargs["cache_folder"] = str(self.cache_dir)
+        return SentenceTransformer(self.model_name, **kwargs)
+
+    def model(self):
+        """The loaded model; the first caller loads it, the others wait."""
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            if self._model is None:
+                self.state = "loading"
+                start = time.monotonic()
+                model, self.source = self._load()
+                self.load_seconds = time.monotonic() - start
+                self.state = "fallback" if isinstance(model, _ZeroModel) else "ready"
+                self._model = model
+                self._loaded.set()
+                logging.info(f"[embeddings] {self.model_name} {self.state} "
+                             f"({self.source}, {self.load_seconds:.1f}s)")
+        return self._model
+
+    def _load(self):
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            self.error = "sentence-transformers is not installed"
+            return _ZeroModel(self.dimensions), "none"
+        try:
+            return self._open(local_only=True), "local cache"
+        except Exception as e:
+            self.error = f"not in local cache: {e}"
+        if self.allow_download:
+            try:
+                model = self._open(local_only=False)
+                self.error = None
+                return model, "download"
+            except Exception as e:
+                self.error = f"download failed: {e}"
+        logging.error(f"[embeddings] could not load {self.model_name}: {self.error}")
+        return _ZeroModel(self.dimensions), "none"
+
+    def warmup(self) -> threading.Thread:
+        """Load the model and run one encode in a background thread."""
+        def run():
+            try:
+                self.encode(["warmup"])
+            except Exception as e:
+                logging.error(f"[embeddings] warmup failed: {e}")
+
+        thread = threading.Thread(target=run, name="embedding-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._loaded.wait(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def require_model(self) -> None:
+        """Load the model; raise EmbeddingUnavailable if only the zero-vector stand-in loaded."""
+        self.model()
+        if not self.ready:
+            raise EmbeddingUnavailable(f"embedding model {self.model_name} is unavailable: {self.error}")
+
+    def status(self) -> dict:
+        batches = metrics.count("embedding_batches")
+        return {
+            "model": self.model_name,
+            "state": self.state,
+            "source": self.source,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+            "batches": batches,
+            "mean_batch_size": metrics.count("embedding_texts") / batches if batches else 0.0,
+        }
+
+    # -- encoding ----------------------------------------------------------------
+
+    def encode(self, texts: Union[str, Sequence[str]], require_model: bool = False,
+               **kwargs) -> np.ndarray:
+        """Embeddings of *texts* (one row per text; a 1-D vector for a single string)."""
+        if require_model:
+            self.require_model()
+        if isinstance(texts, str):
+            return self.encode([texts], **kwargs)[0]
+        return np.asarray(self.model().encode(list(texts), **kwargs))
+
+    def submit(self, text: str) -> "Future[List[float]]":
+        """Queue *text* for the next micro-batch; the future resolves to its vector."""
+        return self.batcher.submit(text)
+
+    def embed(self, text: str, require_model: bool = False) -> List[float]:
+        """Vector of one text, batched with other callers' (blocks the calling thread)."""
+        if require_model:
+            self.require_model()
+        return self.submit(text).result()
+
+    async def aembed(self, text: str, require_model: bool = False) -> List[float]:
+        """Like embed(), awaiting the batch instead of blocking the event loop."""
+        if require_model:
+            await asyncio.to_thread(self.require_model)
+        return await asyncio.wrap_future(self.submit(text))
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """The process-wide EmbeddingService, configured from config/llm_config.json."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            config = load_llm_config()
+            cache_dir = config.get("EMBEDDING_CACHE_DIR")
+            _service = EmbeddingService(
+                model_name=config.get("EMBEDDING_MODEL", DEFAULT_MODEL),
+                dimensions=int(config.get("EMBEDDING_DIMENSIONS", DEFAULT_DIMENSIONS)),
+                cache_dir=PROJECT_ROOT / cache_dir if cache_dir else None,
+                allow_download=bool(config.get("EMBEDDING_ALLOW_DOWNLOAD", True)),
+                batch_max=int(config.get("EMBEDDING_BATCH_MAX", DEFAULT_BATCH_MAX)),
+                batch_wait_ms=float(config.get("EMBEDDING_BATCH_WAIT_MS", DEFAULT_BATCH_WAIT_MS)),
+            )
+        return _service
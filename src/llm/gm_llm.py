@@ -6,71 +6,256 @@ This module provides a function for generating narrative responses in a game cha
 It leverages the generic LLM client (from src/llm/llm_client.py) and is designed to handle
 the full conversation context that occurs during a chat session.
 
+The prompt is split in two: a static prefix (gm_llm_system.txt plus the universe
+header and ruleset summaries, see build_gm_prefix) that the provider can cache, and
+the per-turn part (gm_llm_turn.txt) with entities, history and the trigger.
+
+GM turns have a latency bound: the whole turn must finish within GM_DEADLINE_SECONDS
+(config, default: the timeout of the gm_narrative tier). The first completion is
+hedged after the call site's p95 latency; if it fails, the turn degrades to a
+compressed prompt and then to LLM_FALLBACK_MODEL (default: the tier's fallback
+tier). Each step gets the time left in the turn, less FALLBACK_RESERVE of it for
+every step still after it, and every step taken is counted in the ``gm_degraded``
+metric.
+
+Callers can pass ``on_narrative`` / ``on_tool_calls`` to get the reply while it is
+generated: narrative text as it arrives, and the tool_calls object as soon as it
+closes, so tools can start before the model has finished the narrative.
+
 Usage:
     Call generate_gm_response(conversation_context, trigger_prompt) to produce a GM narrative response.
 """
 
-from typing import Any, Dict, Tuple
-import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
 import re
 import yaml
 
-from src.llm.llm_client import generate_completion
-from src.utils.prompt_loader import load_prompt_template
+from src.llm import metrics
+from src.llm.json_stream import JsonStreamParser, strip_fences
+from src.llm.llm_client import agenerate_completion, astream_completion, get_router, load_llm_config
+from src.llm.prefix_cache import StaticPrefix, make_prefix
+from src.utils.prompt_loader import load_prompt_template, template_version
 
 
-def generate_gm_output(
-    conversation_context: str,
-    trigger_prompt: str = "Provide a narrative update.",
-    entity_list: str = "",
-) -> Tuple[str, Dict[str, Any]]:
-    """Generate a GM response along with any desired tool calls."""
-    template = load_prompt_template("gm_llm_system.txt")
-    gm_prompt = template.format(
+def build_gm_prefix(universe: Optional[dict] = None, ruleset: Optional[dict] = None) -> StaticPrefix:
+    """
+    Static GM prompt prefix: system instructions, then the universe header and
+    ruleset summaries when given. Keyed by template version and universe/ruleset id.
+    """
+    parts = [load_prompt_template("gm_llm_system.txt").format()]
+    if universe:
+        parts.append(f"Universe: {universe['name']} - {universe.get('description') or ''}\n")
+    if ruleset:
+        parts.append(f"Ruleset: {ruleset['name']} - {ruleset.get('description') or ''}\n")
+        if ruleset.get("summary"):
+            parts.append(f"Ruleset Summary:\n{ruleset['summary']}\n")
+        if ruleset.get("long_summary"):
+            parts.append(f"Ruleset Details:\n{ruleset['long_summary']}\n")
+    return make_prefix(
+        "gm",
+        "\n".join(parts) + "\n",
+        tpl=template_version("gm_llm_system.txt"),
+        universe=universe.get("id") if universe else None,
+        ruleset=ruleset.get("id") if ruleset else None,
+    )
+
+
+def _build_gm_prompt(conversation_context: str, trigger_prompt: str, entity_list: str) -> str:
+    template = load_prompt_template("gm_llm_turn.txt")
+    return template.format(
         conversation_context=conversation_context,
         trigger_prompt=trigger_prompt,
         entity_list=entity_list,
     )
-    raw = generate_completion(prompt=gm_prompt, conversation_context="")
-
-    # 1) Strip markdown fences if present
-    cleaned = raw.strip()
-    if cleaned.startswith("```"):
-        lines = cleaned.splitlines()
-        if lines and lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        cleaned = "\n".join(lines).strip()
-
-    # 2) Extract the first `{ ... }` blob
-    m = re.search(r'(\{[\s\S]*\})', cleaned)
-    if m:
-        json_str = m.group(1)
-    else:
-        json_str = cleaned
 
+
+def gm_models() -> Tuple[str, Optional[str]]:
+    """The model GM turns are routed to, and the last step's fallback model (None if there is none)."""
+    router = get_router()
+    fallback = load_llm_config().get("LLM_FALLBACK_MODEL") or router.fallback_model("gm_narrative")
+    return router.tier_for("gm_narrative").model, fallback
+
+
+# Share of the turn deadline kept back for each fallback step after the current one.
+FALLBACK_RESERVE = 0.2
+
+_OBJECT_START_RE = re.compile(r'\{\s*"')
+
+NarrativeCallback = Callable[[str], Awaitable[None]]
+ToolCallsCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def _load_lenient(raw: str) -> Any:
+    """YAML reading of the outermost {...} of a reply that is not strict JSON (e.g. single quotes)."""
+    cleaned = strip_fences(raw)
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start < 0 or end < start:
+        return None
     try:
-        data = json.loads(json_str)
-    except Exception:
-        try:
-            data = yaml.safe_load(json_str)
-        except Exception:
-            # If parsing fails, treat entire output as narrative only
-            return cleaned, {}
-
-    if isinstance(data, dict):
-        text = data.get("narrative", "")
-        tools = data.get("tool_calls", {}) if isinstance(data.get("tool_calls"), dict) else {}
-        return text, tools
-
-    # Unexpected non-dict structure
-    return cleaned, {}
+        return yaml.safe_load(cleaned[start:end + 1])
+    except yaml.YAMLError:
+        return None
+
+
+def _cut_off(raw: str) -> bool:
+    """True for a reply that opened its JSON object (``{"...``) but ended before closing it."""
+    parser = JsonStreamParser(start_chars="{")
+    parser.feed(raw)
+    return parser.incomplete and _OBJECT_START_RE.search(raw) is not None
+
+
+def _parse_gm_output(raw: str) -> Tuple[str, Dict[str, Any]]:
+    """Split a raw GM completion into (narrative, tool_calls)."""
+    parser = JsonStreamParser(stream_fields=("narrative",), start_chars="{")
+    events = parser.feed(raw)
+    data = parser.value if parser.finished else _load_lenient(raw)
+    if not isinstance(data, dict):
+        if _cut_off(raw):
+            # Cut off mid-object: keep the narrative written so far, never the raw JSON.
+            return "".join(e[2] for e in events if e[0] == "text"), {}
+        # Not JSON: treat the entire output as narrative only
+        return strip_fences(raw), {}
+    text = data.get("narrative", "")
+    tools = data.get("tool_calls") if isinstance(data.get("tool_calls"), dict) else {}
+    return text, tools
+
+
+async def _astream_gm_raw(
+    gm_prompt: str,
+    prefix: StaticPrefix,
+    deadline: Optional[float],
+    on_narrative: Optional[NarrativeCallback],
+    on_tool_calls: Optional[ToolCallsCallback],
+) -> str:
+    """Stream one GM completion, reporting narrative deltas and the tool_calls object as they arrive."""
+    parser = JsonStreamParser(stream_fields=("narrative",), start_chars="{")
+    async for chunk in astream_completion(prompt=gm_prompt, call_site="gm_narrative", prefix=prefix,
+                                          deadline=deadline):
+        for event in parser.feed(chunk):
+            if event[0] == "text" and on_narrative is not None:
+                await on_narrative(event[2])
+            elif event[0] == "field" and event[1] == "tool_calls" and on_tool_calls is not None:
+                if isinstance(event[2], dict) and event[2]:
+                    await on_tool_calls(event[2])
+    return parser.raw
+
+
+async def _agenerate_gm_raw(
+    gm_prompt: str,
+    prefix: StaticPrefix,
+    compressed_prompt: Optional[Callable[[], str]] = None,
+    on_narrative: Optional[NarrativeCallback] = None,
+    on_tool_calls: Optional[ToolCallsCallback] = None,
+) -> str:
+    """
+    Return the first complete reply of the degradation chain:
+      1. the full prompt on the default model, streamed when a callback is
+         given, otherwise hedged after its p95 latency
+      2. the prompt from *compressed_prompt* (skipped when None)
+      3. the shortest prompt so far on the fallback model
+    all within one turn deadline (see FALLBACK_RESERVE). A reply cut off
+    mid-object (an error or the deadline ended its stream) counts as a
+    failure; if every step fails, the longest such reply is returned so its
+    narrative can be salvaged.
+    """
+    _, fallback_model = gm_models()
+    turn = load_llm_config().get("GM_DEADLINE_SECONDS") or get_router().tier_for("gm_narrative").timeout_seconds
+    loop = asyncio.get_running_loop()
+    turn_end = loop.time() + float(turn) if turn else None
+
+    def time_left(later_steps: int) -> Optional[float]:
+        """Seconds this step may take: the rest of the turn less the later steps' reserve."""
+        if turn_end is None:
+            return None
+        return turn_end - loop.time() - later_steps * FALLBACK_RESERVE * float(turn)
+
+    later = (compressed_prompt is not None) + bool(fallback_model)
+    deadline = time_left(later)
+    if on_narrative is None and on_tool_calls is None:
+        raw = await agenerate_completion(prompt=gm_prompt, call_site="gm_narrative", prefix=prefix,
+                                         deadline=deadline, hedge=True)
+    else:
+        raw = await _astream_gm_raw(gm_prompt, prefix, deadline, on_narrative, on_tool_calls)
+    partial = ""
+
+    def usable(reply: str) -> bool:
+        nonlocal partial
+        if reply and _cut_off(reply):
+            metrics.incr("gm_degraded", "cut_off")
+            partial = max(partial, reply, key=len)
+            return False
+        return bool(reply)
+
+    if usable(raw):
+        return raw
+
+    if compressed_prompt is not None:
+        later -= 1
+        metrics.incr("gm_degraded", "compressed_prompt")
+        gm_prompt = await asyncio.to_thread(compressed_prompt)
+        deadline = time_left(later)
+        if deadline is None or deadline > 0:
+            raw = await agenerate_completion(prompt=gm_prompt, call_site="gm_narrative", prefix=prefix,
+                                             deadline=deadline)
+            if usable(raw):
+                return raw
+
+    deadline = time_left(0)
+    if fallback_model and (deadline is None or deadline > 0):
+        metrics.incr("gm_degraded", "fallback_model")
+        raw = await agenerate_completion(prompt=gm_prompt, call_site="gm_narrative", prefix=prefix,
+                                         model=fallback_model, deadline=deadline)
+        if usable(raw):
+            return raw
+    metrics.incr("gm_degraded", "failed")
+    return partial
+
+
+def generate_gm_output(
+    conversation_context: str,
+    trigger_prompt: str = "Provide a narrative update.",
+    entity_list: str = "",
+    prefix: Optional[StaticPrefix] = None,
+    compressed_context: Optional[Callable[[], str]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Generate a GM response along with any desired tool calls (blocking; not for event loops)."""
+    return asyncio.run(agenerate_gm_output(
+        conversation_context, trigger_prompt, entity_list, prefix, compressed_context
+    ))
+
+
+async def agenerate_gm_output(
+    conversation_context: str,
+    trigger_prompt: str = "Provide a narrative update.",
+    entity_list: str = "",
+    prefix: Optional[StaticPrefix] = None,
+    compressed_context: Optional[Callable[[], str]] = None,
+    on_narrative: Optional[NarrativeCallback] = None,
+    on_tool_calls: Optional[ToolCallsCallback] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Async version of generate_gm_output for the chat event loop.
+    *compressed_context* builds a shorter conversation context for the
+    fallback step; it is only called if the full prompt fails.
+    *on_narrative* receives narrative text as it streams in and *on_tool_calls*
+    the tool_calls object once complete. Neither is called for a reply from a
+    fallback step, so callers should still act on the returned values.
+    """
+    gm_prompt = _build_gm_prompt(conversation_context, trigger_prompt, entity_list)
+    compressed_prompt = None
+    if compressed_context is not None:
+        def compressed_prompt():
+            return _build_gm_prompt(compressed_context(), trigger_prompt, entity_list)
+    raw = await _agenerate_gm_raw(gm_prompt, prefix or build_gm_prefix(), compressed_prompt,
+                                  on_narrative, on_tool_calls)
+    return _parse_gm_output(raw)
 
 def generate_gm_response(
     conversation_context: str,
     trigger_prompt: str = "Provide a narrative update.",
     entity_list: str = "",
+    prefix: Optional[StaticPrefix] = None,
 ) -> str:
     """
     Generate a narrative GM response based on the full conversation context and an optional trigger prompt.
@@ -81,6 +266,8 @@ def generate_gm_response(
                                         Defaults to "Provide a narrative update."
         entity_list (str, optional): JSON string describing known entities to include in the prompt.
                                      Defaults to "".
+        prefix (StaticPrefix, optional): Static prompt prefix from build_gm_prefix().
+                                         Defaults to the bare system instructions.
     
     Returns:
         str: A narrative response generated by the GM.
@@ -89,6 +276,22 @@ def generate_gm_response(
         conversation_context=conversation_context,
         trigger_prompt=trigger_prompt,
         entity_list=entity_list,
+        prefix=prefix,
+    )
+    return text
+
+async def agenerate_gm_response(
+    conversation_context: str,
+    trigger_prompt: str = "Provide a narrative update.",
+    entity_list: str = "",
+    prefix: Optional[StaticPrefix] = None,
+) -> str:
+    """Async version of generate_gm_response."""
+    text, _ = await agenerate_gm_output(
+        conversation_context=conversation_context,
+        trigger_prompt=trigger_prompt,
+        entity_list=entity_list,
+        prefix=prefix,
     )
     return text
 
@@ -0,0 +1,222 @@
+"""
+json_stream.py - Incremental JSON parsing of LLM replies
+
+Model replies usually carry one JSON value, sometimes wrapped in markdown
+fences or after a sentence of prose. JsonStreamParser consumes a reply chunk
+by chunk as it streams in, skips everything before the first opening bracket
+and after the value closes, and reports progress as events:
+
+    ("text", key, delta)    new characters of a top-level string member named
+                            in ``stream_fields``, escapes already decoded
+    ("field", key, value)   a top-level object member is complete
+    ("item", index, value)  a top-level array element is complete
+    ("done", value)         the whole value is complete
+
+So a GM reply ``{"tool_calls": {...}, "narrative": "..."}`` yields its tool
+calls as soon as that object closes and the narrative while it is written.
+parse_json_text() runs the parser over a complete reply.
+"""
+
+import json
+import re
+from typing import Any, Iterable, List, Optional, Tuple
+
+_SCALAR_END = frozenset(",}] \t\r\n")
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def strip_fences(text: str) -> str:
+    """Remove a surrounding markdown code fence, if any."""
+    cleaned = text.strip()
+    if cleaned.startswith("```"):
+        lines = cleaned.splitlines()[1:]
+        if lines and lines[-1].startswith("```"):
+            lines = lines[:-1]
+        cleaned = "\n".join(lines).strip()
+    return cleaned
+
+
+def _loads(text: str) -> Any:
+    # strict=False: models often put raw newlines inside strings.
+    try:
+        return json.loads(text, strict=False)
+    except json.JSONDecodeError:
+        return json.loads(_TRAILING_COMMA_RE.sub(r"\1", text), strict=False)
+
+
+class JsonStreamParser:
+    def __init__(self, stream_fields: Iterable[str] = (), start_chars: str = "{["):
+        self.stream_fields = frozenset(stream_fields)
+        self.start_chars = start_chars
+        self.raw = ""                 # everything fed so far
+        self.finished = False
+        self.value: Any = None
+        self._broken = False
+        self._buf = ""                # text from the opening bracket on
+        self._pos = 0
+        self._stack: List[str] = []
+        # string scanning
+        self._in_string = False
+        self._string_role: Optional[str] = None   # "key", "value" or None (nested)
+        self._escape = False
+        self._hex_left = 0
+        # top-level member / element tracking
+        self._expect = "value"        # "key", "colon", "value" or "comma"
+        self._key: Optional[str] = None
+        self._token_start = 0
+        self._scalar = False
+        self._index = 0
+        # streamed string member
+        self._stream_key: Optional[str] = None
+        self._emitted = 0
+        self._safe = 0
+        self._events: List[Tuple] = []
+
+    def feed(self, chunk: str) -> List[Tuple]:
+        """Consume the next piece of the reply and return the events it completed."""
+        self.raw += chunk
+        if self.finished or self._broken or not chunk:
+            return []
+        if not self._stack and not self._buf:
+            starts = [i for i in (self.raw.find(c) for c in self.start_chars) if i >= 0]
+            if not starts:
+                return []
+            self._buf = self.raw[min(starts):]
+        else:
+            self._buf += chunk
+        self._scan()
+        self._flush_text(self._safe)
+        events, self._events = self._events, []
+        return events
+
+    @property
+    def incomplete(self) -> bool:
+        """A value was opened but the reply ended before it closed (e.g. it was cut off)."""
+        return bool(self._stack) and not self._broken
+
+    def close(self) -> Any:
+        """The parsed value; raises ValueError if the reply held no complete JSON value."""
+        if not self.finished:
+            raise ValueError("no complete JSON value in reply")
+        return self.value
+
+    # -- scanning -----------------------------------------------------------------
+
+    def _scan(self):
+        buf = self._buf
+        while self._pos < len(buf) and not (self.finished or self._broken):
+            c = buf[self._pos]
+            depth = len(self._stack)
+            if self._in_string:
+                self._string_char(c)
+            elif depth == 1 and self._scalar and c in _SCALAR_END:
+                self._end_value(self._pos)
+                continue                      # re-read the delimiter
+            elif c == '"':
+                self._in_string = True
+                self._string_role = None
+                if depth == 1:
+                    self._begin_string()
+            elif c in "{[":
+                if depth == 0:
+                    self._expect = "key" if c == "{" else "value"
+                elif depth == 1 and self._expect == "value":
+                    self._begin_value()
+                self._stack.append(c)
+            elif c in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self._finish(self._pos + 1)
+                elif len(self._stack) == 1:
+                    self._end_value(self._pos + 1)
+            elif depth == 1:
+                if c == ":" and self._expect == "colon":
+                    self._expect = "value"
+                elif c == ",":
+                    self._expect = "key" if self._stack[0] == "{" else "value"
+                elif not c.isspace() and self._expect == "value":
+                    self._begin_value()
+                    self._scalar = True
+            self._pos += 1
+
+    def _string_char(self, c: str):
+        if self._hex_left:
+            self._hex_left -= 1
+            if not self._hex_left:
+                code = int(self._buf[self._pos - 3:self._pos + 1], 16)
+                # Hold a high surrogate back until its pair has arrived.
+                if not 0xD800 <= code <= 0xDBFF:
+                    self._safe = self._pos + 1
+        elif self._escape:
+            self._escape = False
+            if c == "u":
+                self._hex_left = 4
+            else:
+                self._safe = self._pos + 1
+        elif c == "\\":
+            self._escape = True
+        elif c == '"':
+            self._in_string = False
+            if self._string_role == "key":
+                self._key = _loads(self._buf[self._token_start:self._pos + 1])
+                self._expect = "colon"
+            elif self._string_role == "value":
+                self._flush_text(self._pos)
+                self._stream_key = None
+                self._end_value(self._pos + 1)
+        else:
+            self._safe = self._pos + 1
+
+    def _begin_string(self):
+        if self._stack[0] == "{" and self._expect == "key":
+            self._string_role = "key"
+            self._token_start = self._pos
+        elif self._expect == "value":
+            self._string_role = "value"
+            self._begin_value()
+            if self._stack[0] == "{" and self._key in self.stream_fields:
+                self._stream_key = self._key
+                self._emitted = self._safe = self._pos + 1
+
+    def _begin_value(self):
+        self._token_start = self._pos
+        self._expect = "comma"
+
+    def _end_value(self, end: int):
+        self._scalar = False
+        try:
+            value = _loads(self._buf[self._token_start:end])
+        except json.JSONDecodeError:
+            value = None
+        else:
+            if self._stack[0] == "{":
+                self._events.append(("field", self._key, value))
+            else:
+                self._events.append(("item", self._index, value))
+        if self._stack[0] == "[":
+            self._index += 1
+
+    def _finish(self, end: int):
+        try:
+            self.value = _loads(self._buf[:end])
+        except json.JSONDecodeError:
+            self._broken = True
+            return
+        self.finished = True
+        self._events.append(("done", self.value))
+
+    def _flush_text(self, upto: int):
+        if self._stream_key is None or upto <= self._emitted:
+            return
+        delta = _loads('"' + self._buf[self._emitted:upto] + '"')
+        self._emitted = upto
+        if delta:
+            self._events.append(("text", self._stream_key, delta))
+
+
+def parse_json_text(text: str, start_chars: str = "{[") -> Any:
+    """Parse the JSON value in a complete reply; raises ValueError if there is none."""
+    parser = JsonStreamParser(start_chars=start_chars)
+    parser.feed(text)
+    return parser.close()
@@ -3,87 +3,465 @@
 llm_client.py - Generic LLM Client for Chat Completions
 
 This module loads LLM configuration from config/llm_config.json and provides a function
-to generate completions using the Gemini API (or a simulated response if the API is unavailable).
+to generate completions through the configured provider (see src/llm/providers.py).
 It supports chat completions by accepting an optional conversation context parameter.
+
+The configuration and the provider (including its API client) are created once per
+process; call reload_llm_config() after editing the config file.
+
+All provider calls run on one dedicated event loop thread, which owns the process-wide
+concurrency limit and request-rate token bucket. agenerate_completion awaits that loop
+without blocking the caller's loop; generate_completion is the blocking wrapper for CLI
+scripts and worker threads; astream_completion yields the reply as it is generated.
+Rate-limit errors are retried with async exponential backoff and jitter, honouring the
+server's Retry-After hint.
+
+Each call site is routed to a model tier (config/llm_routing.json, see routing.py)
+that sets its model, output token limit and default deadline.
+
+Config keys:
+    GEMINI_API_KEY, DEFAULT_MODEL (model of tiers that do not name one)
+    LLM_PROVIDER             "gemini" or "local" (default: gemini when google-genai is
+                             installed, otherwise local)
+    LOCAL_LATENCY_MEDIAN_MS  local provider median latency (default 1000)
+    LOCAL_LATENCY_SIGMA      local provider log-normal sigma (default 0, constant delay)
+    LOCAL_SEED               local provider latency seed (default 0)
+    LOCAL_PREFILL_MS_PER_1K_TOKENS  local provider delay per uncached input token (default 0)
+    LLM_PREFIX_CACHE         register static prompt prefixes with the provider (default true)
+    LLM_PREFIX_CACHE_TTL     lifetime of a registered prefix in seconds (default 3600)
+    LLM_MAX_CONCURRENCY      provider calls in flight per process (default 8)
+    LLM_REQUESTS_PER_MINUTE  request start rate limit (default: unlimited)
+    LLM_BURST                token bucket capacity (default: LLM_MAX_CONCURRENCY)
+    LLM_CACHE_ENABLED        response cache on/off (default true; see response_cache.py)
+    LLM_CACHE_PATH           SQLite file, relative to the project root
+                             (default cache/llm_responses.sqlite3)
+    LLM_CACHE_MAX_ENTRIES    LRU bound of the response cache (default 5000)
+    LLM_CACHE_POLICIES       {call_site: ttl_seconds} overriding the defaults; 0 disables
+    LLM_HEDGE_PERCENTILE     latency percentile after which hedged calls send a duplicate
+                             (default 95)
+    LLM_HEDGE_MIN_SAMPLES    latency samples needed before hedging starts (default 20)
 """
 
+import asyncio
 import json
+import threading
 import time
 from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from src.llm.providers import GEMINI_AVAILABLE, GeminiProvider, LLMProvider, LocalProvider
+from src.llm import metrics
+from src.llm.prefix_cache import StaticPrefix, estimate_tokens
+from src.llm.rate_limit import TokenBucket, retry_delay
+from src.llm.response_cache import DEFAULT_POLICIES, ResponseCache, make_key
+from src.llm.routing import Router, Tier, load_router
 
-# Attempt to import the Gemini API client.
-try:
-    from google import genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+CONFIG_PATH = PROJECT_ROOT / "config" / "llm_config.json"
+ROUTING_PATH = PROJECT_ROOT / "config" / "llm_routing.json"
+
+_config: Optional[dict] = None
+_provider: Optional[LLMProvider] = None
+_limits: Optional[tuple[asyncio.Semaphore, Optional[TokenBucket]]] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_response_cache: Optional[ResponseCache] = None
+_router: Optional[Router] = None
+_lock = threading.Lock()
 
 def load_llm_config() -> dict:
     """
     Load LLM configuration settings from config/llm_config.json.
+    The file is read once per process; see reload_llm_config().
 
     Returns:
         dict: A dictionary containing the configuration settings.
     """
-    config_path = Path("config") / "llm_config.json"
+    global _config
+    if _config is None:
+        try:
+            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+                _config = json.load(f)
+        except Exception as e:
+            print(f"Error loading config from {CONFIG_PATH}: {e}")
+            _config = {}
+    return _config
+
+def reload_llm_config() -> dict:
+    """Re-read the config file and rebuild the provider on next use."""
+    global _config, _provider, _limits, _response_cache, _router
+    with _lock:
+        _config = None
+        _provider = None
+        _limits = None
+        _response_cache = None
+        _router = None
+    return load_llm_config()
+
+def create_provider(config: dict) -> LLMProvider:
+    """Build the provider selected by *config*."""
+    name = config.get("LLM_PROVIDER") or ("gemini" if GEMINI_AVAILABLE else "local")
+    prefix_ttl = float(config.get("LLM_PREFIX_CACHE_TTL", 3600))
+    if name == "gemini":
+        return GeminiProvider(
+            api_key=config.get("GEMINI_API_KEY", ""),
+            prefix_cache=bool(config.get("LLM_PREFIX_CACHE", True)),
+            prefix_ttl_seconds=prefix_ttl,
+        )
+    if name == "local":
+        return LocalProvider(
+            latency_median_ms=float(config.get("LOCAL_LATENCY_MEDIAN_MS", 1000)),
+            latency_sigma=float(config.get("LOCAL_LATENCY_SIGMA", 0.0)),
+            seed=int(config.get("LOCAL_SEED", 0)),
+            prefill_ms_per_1k_tokens=float(config.get("LOCAL_PREFILL_MS_PER_1K_TOKENS", 0.0)),
+            prefix_ttl_seconds=prefix_ttl,
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER: {name}")
+
+def get_provider() -> LLMProvider:
+    """Return the process-wide provider, creating it on first use."""
+    global _provider
+    if _provider is None:
+        with _lock:
+            if _provider is None:
+                _provider = create_provider(load_llm_config())
+    return _provider
+
+def set_provider(provider: Optional[LLMProvider]):
+    """Replace the process-wide provider (None rebuilds it from config on next use)."""
+    global _provider
+    with _lock:
+        _provider = provider
+
+def get_router() -> Router:
+    """The call-site -> model tier router, loaded from config/llm_routing.json once."""
+    global _router
+    if _router is None:
+        default_model = load_llm_config().get("DEFAULT_MODEL", "gemini-2.0-flash")
+        with _lock:
+            if _router is None:
+                _router = load_router(ROUTING_PATH, default_model)
+    return _router
+
+def routing_stats() -> dict:
+    """Per-tier model, call counts, latency and throughput."""
+    return get_router().stats()
+
+def _llm_loop() -> asyncio.AbstractEventLoop:
+    """Return the dedicated LLM event loop, starting its thread on first use."""
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-client", daemon=True).start()
+                _loop = loop
+    return _loop
+
+def _get_limits() -> tuple[asyncio.Semaphore, Optional[TokenBucket]]:
+    """Concurrency semaphore and rate bucket; only used on the LLM loop."""
+    global _limits
+    if _limits is None:
+        config = load_llm_config()
+        concurrency = int(config.get("LLM_MAX_CONCURRENCY", 8))
+        rpm = config.get("LLM_REQUESTS_PER_MINUTE")
+        bucket = None
+        if rpm:
+            bucket = TokenBucket(float(rpm) / 60.0, float(config.get("LLM_BURST", concurrency)))
+        _limits = (asyncio.Semaphore(concurrency), bucket)
+    return _limits
+
+def get_response_cache(call_site: Optional[str]) -> Optional[ResponseCache]:
+    """The response cache if *call_site* is cached under the current policies, else None."""
+    global _response_cache
+    config = load_llm_config()
+    if not config.get("LLM_CACHE_ENABLED", True):
+        return None
+    policies = {**DEFAULT_POLICIES, **config.get("LLM_CACHE_POLICIES", {})}
+    if not policies.get(call_site or ""):
+        return None
+    if _response_cache is None:
+        with _lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    PROJECT_ROOT / config.get("LLM_CACHE_PATH", "cache/llm_responses.sqlite3"),
+                    max_entries=int(config.get("LLM_CACHE_MAX_ENTRIES", 5000)),
+                    policies=policies,
+                )
+    return _response_cache
+
+def response_cache_stats() -> dict:
+    """Per-call-site entries and hit rates, or {} if the cache has not been used."""
+    return _response_cache.stats() if _response_cache is not None else {}
+
+def _cache_key(provider: LLMProvider, tier: Tier, prefix: Optional[StaticPrefix], full_prompt: str) -> str:
+    """Response-cache key of a call: model, whole prompt and the generation parameters."""
+    params = {"tier": tier.name, "max_output_tokens": tier.max_output_tokens}
+    return make_key(provider.name, tier.model, (prefix.text if prefix else "") + full_prompt, params)
+
+async def _call_provider(provider: LLMProvider, prompt: str, tier: Tier,
+                         prefix: Optional[StaticPrefix]) -> str:
+    # Only pass what is set, so minimal providers need not accept every option.
+    options = {}
+    if prefix is not None:
+        options["prefix"] = prefix
+    if tier.max_output_tokens:
+        options["max_output_tokens"] = tier.max_output_tokens
+    return await provider.agenerate(prompt, tier.model, **options)
+
+def _hedge_delay(label: str) -> Optional[float]:
+    """The call site's recent p95 latency, or None until enough samples exist."""
+    config = load_llm_config()
+    if metrics.sample_count("llm_latency", label) < int(config.get("LLM_HEDGE_MIN_SAMPLES", 20)):
+        return None
+    return metrics.percentile("llm_latency", float(config.get("LLM_HEDGE_PERCENTILE", 95)), label)
+
+async def _hedged_call(provider: LLMProvider, prompt: str, tier: Tier, prefix: Optional[StaticPrefix],
+                       label: str, semaphore: asyncio.Semaphore, bucket: Optional[TokenBucket]) -> str:
+    """
+    Call the provider; if it has not answered by the call site's p95 latency,
+    send one duplicate request (only when a concurrency slot and a rate token
+    are free right away) and return whichever succeeds first.
+    """
+    primary = asyncio.ensure_future(_call_provider(provider, prompt, tier, prefix))
+    hedge = None
+    try:
+        hedge_after = _hedge_delay(label)
+        if hedge_after is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done or semaphore.locked() or (bucket is not None and not bucket.try_acquire()):
+            return await primary
+        metrics.incr("llm_hedged", label)
+        async with semaphore:
+            hedge = asyncio.ensure_future(_call_provider(provider, prompt, tier, prefix))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            metrics.incr("llm_hedge_won", label)
+                        return task.result()
+            return primary.result()  # both failed: raise the primary's error
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+
+async def _complete(full_prompt: str, tier: Tier, max_retries: int, call_site: Optional[str],
+                    prefix: Optional[StaticPrefix] = None, hedge: bool = False) -> str:
+    provider = get_provider()
+    label = call_site or "default"
+    metrics.current_label.set(label)
+    cache = get_response_cache(call_site)
+    key = None
+    if cache is not None:
+        key = _cache_key(provider, tier, prefix, full_prompt)
+        cached = cache.get(key, label)
+        if cached is not None:
+            return cached
+
+    semaphore, bucket = _get_limits()
+    for attempt in range(max_retries):
+        async with semaphore:
+            if bucket is not None:
+                await bucket.acquire()
+            start = time.perf_counter()
+            try:
+                if hedge:
+                    text = await _hedged_call(provider, full_prompt, tier, prefix, label, semaphore, bucket)
+                else:
+                    text = await _call_provider(provider, full_prompt, tier, prefix)
+            except Exception as e:
+                metrics.incr("llm_errors", label)
+                delay = retry_delay(e, attempt)
+                if delay is None:
+                    get_router().record(tier, time.perf_counter() - start, ok=False)
+                    print(f"Error calling {provider.name} provider: {e}")
+                    return ""
+            else:
+                elapsed = time.perf_counter() - start
+                metrics.incr("llm_calls", label)
+                metrics.observe("llm_latency", elapsed, label)
+                get_router().record(tier, elapsed, ok=True)
+                if cache is not None and text:
+                    cache.put(key, label, text)
+                return text
+        if attempt + 1 < max_retries:
+            print(f"Rate limited by {provider.name}, retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+    # If retries are exhausted, return an empty string.
+    get_router().record(tier, 0.0, ok=False)
+    return ""
+
+async def _stream(full_prompt: str, tier: Tier, max_retries: int, call_site: Optional[str],
+                  prefix: Optional[StaticPrefix], emit: Callable[[str], None]) -> str:
+    """Streaming counterpart of _complete: passes chunks to *emit*, returns the full text."""
+    provider = get_provider()
+    label = call_site or "default"
+    metrics.current_label.set(label)
+    cache = get_response_cache(call_site)
+    key = None
+    if cache is not None:
+        key = _cache_key(provider, tier, prefix, full_prompt)
+        cached = cache.get(key, label)
+        if cached is not None:
+            emit(cached)
+            return cached
+
+    options = {}
+    if prefix is not None:
+        options["prefix"] = prefix
+    if tier.max_output_tokens:
+        options["max_output_tokens"] = tier.max_output_tokens
+    semaphore, bucket = _get_limits()
+    parts: list[str] = []
+    for attempt in range(max_retries):
+        async with semaphore:
+            if bucket is not None:
+                await bucket.acquire()
+            start = time.perf_counter()
+            try:
+                async for chunk in provider.astream(full_prompt, tier.model, **options):
+                    if not parts:
+                        metrics.observe("llm_first_chunk", time.perf_counter() - start, label)
+                    parts.append(chunk)
+                    emit(chunk)
+            except Exception as e:
+                metrics.incr("llm_errors", label)
+                delay = retry_delay(e, attempt)
+                # Once text has gone out a retry would repeat it; keep what we have.
+                if delay is None or parts:
+                    get_router().record(tier, time.perf_counter() - start, ok=False)
+                    print(f"Error streaming from {provider.name} provider: {e}")
+                    return "".join(parts)
+            else:
+                elapsed = time.perf_counter() - start
+                metrics.incr("llm_calls", label)
+                metrics.observe("llm_latency", elapsed, label)
+                get_router().record(tier, elapsed, ok=True)
+                text = "".join(parts)
+                if cache is not None and text:
+                    cache.put(key, label, text)
+                return text
+        if attempt + 1 < max_retries:
+            print(f"Rate limited by {provider.name}, retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+    get_router().record(tier, 0.0, ok=False)
+    return ""
+
+async def _complete_by(deadline: Optional[float], call_site: Optional[str], coro: Awaitable[str]) -> str:
+    if deadline is None:
+        return await coro
+    try:
+        return await asyncio.wait_for(coro, deadline)
+    except asyncio.TimeoutError:
+        metrics.incr("llm_deadline_exceeded", call_site or "default")
+        print(f"LLM call {call_site or 'default'} missed its {deadline:.1f}s deadline")
+        return ""
+
+def _route(full_prompt: str, call_site: Optional[str], prefix: Optional[StaticPrefix],
+           model: Optional[str], deadline: Optional[float]) -> tuple[Tier, Optional[float]]:
+    router = get_router()
+    tier = router.route(call_site, estimate_tokens(full_prompt) + (estimate_tokens(prefix.text) if prefix else 0))
+    if model and model != tier.model:
+        # The same task on another model keeps the routed tier's output limit.
+        match = next((t for t in router.tiers.values() if t.model == model), None)
+        tier = match._replace(max_output_tokens=tier.max_output_tokens) if match else tier._replace(model=model)
+    return tier, deadline if deadline is not None else tier.timeout_seconds
+
+def _submit(prompt: str, conversation_context: str, max_retries: int, call_site: Optional[str],
+            prefix: Optional[StaticPrefix] = None, model: Optional[str] = None,
+            deadline: Optional[float] = None, hedge: bool = False):
+    # Combine conversation context and the prompt.
+    full_prompt = f"{conversation_context}\n\n{prompt}" if conversation_context else prompt
+    tier, deadline = _route(full_prompt, call_site, prefix, model, deadline)
+    return asyncio.run_coroutine_threadsafe(
+        _complete_by(deadline, call_site,
+                     _complete(full_prompt, tier, max_retries, call_site, prefix=prefix, hedge=hedge)),
+        _llm_loop(),
+    )
+
+async def astream_completion(prompt: str, conversation_context: str = "", max_retries: int = 3,
+                             call_site: Optional[str] = None,
+                             prefix: Optional[StaticPrefix] = None,
+                             model: Optional[str] = None,
+                             deadline: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Like agenerate_completion, but yields the completion in pieces as the
+    provider produces them. Nothing is yielded on failure; a deadline or
+    error mid-stream ends the stream early. Stopping iteration cancels the call.
+    """
+    full_prompt = f"{conversation_context}\n\n{prompt}" if conversation_context else prompt
+    tier, deadline = _route(full_prompt, call_site, prefix, model, deadline)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    end = object()
+
+    def emit(chunk: str):
+        loop.call_soon_threadsafe(queue.put_nowait, chunk)
+
+    future = asyncio.run_coroutine_threadsafe(
+        _complete_by(deadline, call_site,
+                     _stream(full_prompt, tier, max_retries, call_site, prefix, emit)),
+        _llm_loop(),
+    )
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(queue.put_nowait, end))
     try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = json.load(f)
-        return config
-    except Exception as e:
-        print(f"Error loading config from {config_path}: {e}")
-        return {}
-
-def generate_completion(prompt: str, conversation_context: str = "", max_retries: int = 3) -> str:
+        while True:
+            chunk = await queue.get()
+            if chunk is end:
+                break
+            yield chunk
+    finally:
+        future.cancel()
+
+async def agenerate_completion(prompt: str, conversation_context: str = "", max_retries: int = 3,
+                               call_site: Optional[str] = None,
+                               prefix: Optional[StaticPrefix] = None,
+                               model: Optional[str] = None,
+                               deadline: Optional[float] = None,
+                               hedge: bool = False) -> str:
+    """
+    Async version of generate_completion. The call runs on the shared LLM
+    loop, so waiting for a concurrency slot, the rate limit or a backoff
+    never blocks the caller's event loop.
+    """
+    return await asyncio.wrap_future(
+        _submit(prompt, conversation_context, max_retries, call_site, prefix, model, deadline, hedge)
+    )
+
+def generate_completion(prompt: str, conversation_context: str = "", max_retries: int = 3,
+                        call_site: Optional[str] = None,
+                        prefix: Optional[StaticPrefix] = None,
+                        model: Optional[str] = None,
+                        deadline: Optional[float] = None,
+                        hedge: bool = False) -> str:
     """
-    Generate a completion using the Gemini API (or a simulated response) based on the provided prompt.
+    Generate a completion using the configured provider based on the provided prompt.
     For chat completions, the conversation context (e.g., the full chat history) can be prepended to the prompt.
+    Blocks the calling thread; use agenerate_completion from async code.
 
     Args:
         prompt (str): The primary prompt text.
         conversation_context (str, optional): Full conversation context for chat completions.
                                               Defaults to an empty string.
-        max_retries (int, optional): Maximum number of retries on rate limit errors. Defaults to 3.
+        max_retries (int, optional): Maximum number of attempts when rate limited. Defaults to 3.
+        call_site (str, optional): Name of the calling feature, used for metrics and to pick
+                                   its response-cache policy. Defaults to None (uncached).
+        prefix (StaticPrefix, optional): Static text sent ahead of everything else and
+                                         cached on the provider side (see prefix_cache.py).
+        model (str, optional): Model to use instead of the call site's routed tier.
+        deadline (float, optional): Seconds the whole call, including queueing and retries,
+                                    may take; past it the call is cancelled and returns "".
+                                    Defaults to the tier's timeout_seconds.
+        hedge (bool, optional): Send a duplicate request once the call outlives the call
+                                site's p95 latency. Only for idempotent prompts.
 
     Returns:
-        str: The generated completion text.
+        str: The generated completion text ("" on failure or a missed deadline).
     """
-    config = load_llm_config()
-    api_key = config.get("GEMINI_API_KEY", "")
-    model = config.get("DEFAULT_MODEL", "gemini-2.0-flash")
-    
-    # Combine conversation context and the prompt.
-    full_prompt = f"{conversation_context}\n\n{prompt}" if conversation_context else prompt
-
-    # If the Gemini API client is available, use it.
-    if GEMINI_AVAILABLE:
-        retries = max_retries
-        while retries > 0:
-            try:
-                client = genai.Client(api_key=api_key)
-                response = client.models.generate_content(
-                    model=model,
-                    contents=[full_prompt]
-                )
-                completion_text = response.text.strip()
-                return completion_text
-            except Exception as e:
-                error_message = str(e).lower()
-                if "429" in error_message or "resource_exhausted" in error_message:
-                    print("Rate limit exceeded, waiting before retrying...")
-                    time.sleep(60)
-                    retries -= 1
-                    continue
-                else:
-                    print(f"Error calling Gemini API: {e}")
-                    return ""
-        # If retries are exhausted, return an empty string.
-        return ""
-    else:
-        # Simulate a response if Gemini is not available.
-        time.sleep(1)  # Simulate API delay.
-        simulated_response = f"Simulated response for prompt:\n{full_prompt}"
-        return simulated_response
+    return _submit(prompt, conversation_context, max_retries, call_site, prefix, model, deadline, hedge).result()
 
 if __name__ == "__main__":
     # Test block for generating a chat completion.
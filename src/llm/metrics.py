@@ -0,0 +1,79 @@
+"""
+metrics.py - In-process counters and latency samples for LLM calls
+
+Everything is keyed by (metric, label), where the label is usually the call
+site ("gm_narrative", "news", ...). ``snapshot()`` returns plain dicts for
+logging or the /api/metrics endpoint. ``current_label`` holds the call site
+of the LLM call in progress, for code below llm_client (e.g. providers).
+"""
+
+import contextvars
+import math
+import threading
+from collections import defaultdict, deque
+from typing import Deque, Dict, Tuple
+
+LATENCY_WINDOW = 500
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, str], float] = defaultdict(float)
+_latencies: Dict[Tuple[str, str], Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+
+current_label: contextvars.ContextVar[str] = contextvars.ContextVar("llm_call_site", default="")
+
+
+def incr(metric: str, label: str = "", amount: float = 1) -> None:
+    with _lock:
+        _counters[(metric, label)] += amount
+
+
+def observe(metric: str, seconds: float, label: str = "") -> None:
+    """Record one latency sample (kept in a sliding window per key)."""
+    with _lock:
+        _latencies[(metric, label)].append(seconds)
+
+
+def count(metric: str, label: str = "") -> float:
+    with _lock:
+        return _counters.get((metric, label), 0)
+
+
+def sample_count(metric: str, label: str = "") -> int:
+    with _lock:
+        return len(_latencies.get((metric, label), ()))
+
+
+def _nearest_rank(samples: list, pct: float) -> float:
+    return samples[max(1, math.ceil(pct / 100.0 * len(samples))) - 1] if samples else 0.0
+
+
+def percentile(metric: str, pct: float, label: str = "") -> float:
+    """Nearest-rank percentile in seconds over the recent window (0.0 if empty)."""
+    with _lock:
+        samples = sorted(_latencies.get((metric, label), ()))
+    return _nearest_rank(samples, pct)
+
+
+def snapshot() -> dict:
+    """Counters plus p50/p95 latency (ms) per key, grouped by metric."""
+    with _lock:
+        counters = dict(_counters)
+        latencies = {key: sorted(values) for key, values in _latencies.items()}
+    out: dict = {"counters": defaultdict(dict), "latency_ms": defaultdict(dict)}
+    for (metric, label), value in counters.items():
+        out["counters"][metric][label or "all"] = value
+    for (metric, label), samples in latencies.items():
+        if not samples:
+            continue
+        out["latency_ms"][metric][label or "all"] = {
+            "count": len(samples),
+            "p50": _nearest_rank(samples, 50) * 1000.0,
+            "p95": _nearest_rank(samples, 95) * 1000.0,
+        }
+    return {"counters": dict(out["counters"]), "latency_ms": dict(out["latency_ms"])}
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _latencies.clear()
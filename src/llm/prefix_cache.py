@@ -0,0 +1,98 @@
+"""
+prefix_cache.py - Static prompt prefixes and provider-side context caching
+
+Prompt builders split a prompt into a static prefix (system template,
+ruleset summaries, universe header, character-creation rules) and the
+per-turn remainder. The prefix key is built from the template version, the
+ruleset/universe ids and a digest of the prefix text, so editing any of
+them produces a new key instead of serving a stale cache.
+
+Providers register each prefix once per model with their cached-content
+facility and reuse the handle until it expires:
+
+  * GeminiProvider creates a ``client.caches`` entry and sends only the
+    per-turn remainder with ``cached_content`` set.
+  * LocalProvider emulates the discount: cached tokens are billed at
+    CACHED_TOKEN_RATE and skip the simulated prefill time.
+
+Token usage is recorded per call site as the ``input_tokens``,
+``cached_input_tokens`` and ``billed_input_tokens`` counters in metrics.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from src.llm import metrics
+
+# Fraction of the normal input price charged for tokens served from a cache.
+CACHED_TOKEN_RATE = 0.25
+
+
+class StaticPrefix(NamedTuple):
+    key: str
+    text: str
+
+
+def text_version(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def make_prefix(kind: str, text: str, **ids) -> StaticPrefix:
+    """
+    Build a StaticPrefix whose key reads like
+    ``gm:tpl=3f2a..:universe=4:ruleset=2:9c1e..``; ids that are None are left out.
+    """
+    parts = [kind] + [f"{name}={value}" for name, value in ids.items() if value is not None]
+    parts.append(text_version(text))
+    return StaticPrefix(":".join(parts), text)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def record_usage(input_tokens: int, cached_tokens: int = 0) -> None:
+    """Add one call's input usage to the counters of the current call site."""
+    label = metrics.current_label.get()
+    metrics.incr("input_tokens", label, input_tokens)
+    metrics.incr("cached_input_tokens", label, cached_tokens)
+    metrics.incr("billed_input_tokens", label,
+                 input_tokens - cached_tokens + cached_tokens * CACHED_TOKEN_RATE)
+
+
+class PrefixRegistry:
+    """
+    (model, prefix key) -> provider cache handle, with expiry. A handle of
+    None records a prefix the provider refused (e.g. below its minimum
+    cacheable size), so it is sent inline until the entry expires.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600.0):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[str, str], Tuple[Optional[str], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str, key: str) -> Tuple[bool, Optional[str]]:
+        """(registered, handle) for a live entry; (False, None) if unknown or expired."""
+        with self._lock:
+            entry = self._entries.get((model, key))
+            if entry is None or entry[1] <= time.time():
+                self._entries.pop((model, key), None)
+                return False, None
+            return True, entry[0]
+
+    def put(self, model: str, key: str, handle: Optional[str]) -> None:
+        # Expire our entry a little before the provider does.
+        expires = time.time() + self.ttl_seconds - min(60.0, self.ttl_seconds / 10)
+        with self._lock:
+            self._entries[(model, key)] = (handle, expires)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
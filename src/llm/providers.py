@@ -0,0 +1,227 @@
+"""
+providers.py - LLM provider implementations used by llm_client
+
+A provider turns a prompt into completion text for a model name and raises
+on failure; retries and error handling live in llm_client. One provider
+instance is created per process (see llm_client.get_provider):
+
+  * GeminiProvider keeps a single long-lived ``genai.Client``.
+  * LocalProvider is a deterministic offline stand-in whose latency follows
+    a configurable log-normal distribution, for load testing the stack
+    without network access or API quota.
+
+Both accept an optional StaticPrefix (see prefix_cache.py) that is sent
+ahead of the prompt and cached on the provider side where possible, and an
+optional output token limit (set per model tier, see routing.py).
+``astream`` yields the completion in pieces as the model produces them;
+providers without native streaming yield it in one piece.
+"""
+
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+from typing import AsyncIterator, Optional
+
+from src.llm.prefix_cache import PrefixRegistry, StaticPrefix, estimate_tokens, record_usage
+
+try:
+    from google import genai
+    from google.genai import types as genai_types
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+
+class LLMProvider:
+    """Base class: subclasses implement ``generate`` and, ideally, ``agenerate``."""
+
+    name = "base"
+
+    def generate(self, prompt: str, model: str, prefix: Optional[StaticPrefix] = None,
+                 max_output_tokens: Optional[int] = None) -> str:
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str, model: str, prefix: Optional[StaticPrefix] = None,
+                        max_output_tokens: Optional[int] = None) -> str:
+        return await asyncio.to_thread(self.generate, prompt, model, prefix, max_output_tokens)
+
+    async def astream(self, prompt: str, model: str, **options) -> AsyncIterator[str]:
+        yield await self.agenerate(prompt, model, **options)
+
+
+class GeminiProvider(LLMProvider):
+    """
+    Gemini via google-genai. A StaticPrefix is registered as explicit cached
+    content the first time it is seen for a model; prefixes the API refuses
+    (too short for the model's minimum, unsupported model) are sent inline.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, prefix_cache: bool = True, prefix_ttl_seconds: float = 3600.0):
+        if not GEMINI_AVAILABLE:
+            raise RuntimeError("google-genai is not installed")
+        self.client = genai.Client(api_key=api_key)
+        self.prefix_cache = prefix_cache
+        self.prefixes = PrefixRegistry(prefix_ttl_seconds)
+
+    def _cache_config(self, prefix: StaticPrefix):
+        return genai_types.CreateCachedContentConfig(
+            display_name=prefix.key[:128],
+            contents=[prefix.text],
+            ttl=f"{int(self.prefixes.ttl_seconds)}s",
+        )
+
+    def _request(self, prompt: str, prefix: Optional[StaticPrefix], handle: Optional[str],
+                 max_output_tokens: Optional[int]) -> dict:
+        request = {"contents": [prompt] if handle or prefix is None else [prefix.text + prompt]}
+        if handle or max_output_tokens:
+            request["config"] = genai_types.GenerateContentConfig(
+                cached_content=handle or None, max_output_tokens=max_output_tokens
+            )
+        return request
+
+    @staticmethod
+    def _text(response) -> str:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            record_usage(usage.prompt_token_count or 0, usage.cached_content_token_count or 0)
+        return response.text.strip()
+
+    def _registered(self, model: str, prefix: Optional[StaticPrefix]):
+        if prefix is None or not self.prefix_cache:
+            return True, None
+        return self.prefixes.get(model, prefix.key)
+
+    def _refused(self, model: str, prefix: StaticPrefix, exc: Exception) -> None:
+        logging.info("Not caching prompt prefix %s: %s", prefix.key, exc)
+        self.prefixes.put(model, prefix.key, None)
+
+    def generate(self, prompt: str, model: str, prefix: Optional[StaticPrefix] = None,
+                 max_output_tokens: Optional[int] = None) -> str:
+        registered, handle = self._registered(model, prefix)
+        if not registered:
+            try:
+                handle = self.client.caches.create(model=model, config=self._cache_config(prefix)).name
+                self.prefixes.put(model, prefix.key, handle)
+            except Exception as e:
+                self._refused(model, prefix, e)
+        response = self.client.models.generate_content(
+            model=model, **self._request(prompt, prefix, handle, max_output_tokens)
+        )
+        return self._text(response)
+
+    async def _ahandle(self, model: str, prefix: Optional[StaticPrefix]) -> Optional[str]:
+        registered, handle = self._registered(model, prefix)
+        if not registered:
+            try:
+                cached = await self.client.aio.caches.create(model=model, config=self._cache_config(prefix))
+                handle = cached.name
+                self.prefixes.put(model, prefix.key, handle)
+            except Exception as e:
+                self._refused(model, prefix, e)
+        return handle
+
+    async def agenerate(self, prompt: str, model: str, prefix: Optional[StaticPrefix] = None,
+                        max_output_tokens: Optional[int] = None) -> str:
+        handle = await self._ahandle(model, prefix)
+        response = await self.client.aio.models.generate_content(
+            model=model, **self._request(prompt, prefix, handle, max_output_tokens)
+        )
+        return self._text(response)
+
+    async def astream(self, prompt: str, model: str, prefix: Optional[StaticPrefix] = None,
+                      max_output_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        handle = await self._ahandle(model, prefix)
+        usage = None
+        stream = await self.client.aio.models.generate_content_stream(
+            model=model, **self._request(prompt, prefix, handle, max_output_tokens)
+        )
+        async for chunk in stream:
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if chunk.text:
+                yield chunk.text
+        if usage is not None:
+            record_usage(usage.prompt_token_count or 0, usage.cached_content_token_count or 0)
+
+
+class LocalProvider(LLMProvider):
+    """
+    Offline provider returning a deterministic echo of the prompt.
+
+    Each call sleeps for a latency drawn from a log-normal distribution with
+    the given median and sigma (sigma=0 gives a constant delay), plus
+    *prefill_ms_per_1k_tokens* for every uncached input token. Draws come
+    from one seeded generator, so a run with the same call sequence
+    reproduces the same latencies.
+
+    Static prefixes are "cached" from their second use onwards, mirroring
+    how a provider-side cache bills and skips prefill for them.
+    """
+
+    name = "local"
+    STREAM_CHUNK_CHARS = 64
+
+    def __init__(self, latency_median_ms: float = 1000.0, latency_sigma: float = 0.0,
+                 seed: int = 0, prefill_ms_per_1k_tokens: float = 0.0,
+                 prefix_ttl_seconds: float = 3600.0):
+        self.latency_median_ms = latency_median_ms
+        self.latency_sigma = latency_sigma
+        self.prefill_ms_per_1k_tokens = prefill_ms_per_1k_tokens
+        self.prefixes = PrefixRegistry(prefix_ttl_seconds)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self) -> float:
+        """Next simulated latency in seconds."""
+        if self.latency_median_ms <= 0:
+            return 0.0
+        with self._lock:
+            factor = self._rng.lognormvariate(0.0, self.latency_sigma) if self.latency_sigma else 1.0
+        return self.latency_median_ms / 1000.0 * factor
+
+    def respond(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return f"Simulated response [{digest}] for prompt:\n{prompt}"
+
+    def _prepare(self, prompt: str, model: str, prefix: Optional[StaticPrefix]):
+        """Full prompt text and simulated delay, recording token usage."""
+        text = prefix.text + prompt if prefix else prompt
+        cached = 0
+        if prefix is not None:
+            registered, _ = self.prefixes.get(model, prefix.key)
+            if registered:
+                cached = estimate_tokens(prefix.text)
+            else:
+                self.prefixes.put(model, prefix.key, prefix.key)
+        total = estimate_tokens(text)
+        record_usage(total, cached)
+        prefill = (total - cached) * self.prefill_ms_per_1k_tokens / 1e6
+        return text, self.sample_latency() + prefill
+
+    def generate(self, prompt: str, model: str, prefix: Optional[StaticPrefix] = None,
+                 max_output_tokens: Optional[int] = None) -> str:
+        text, delay = self._prepare(prompt, model, prefix)
+        time.sleep(delay)
+        return self.respond(text)
+
+    async def agenerate(self, prompt: str, model: str, prefix: Optional[StaticPrefix] = None,
+                        max_output_tokens: Optional[int] = None) -> str:
+        text, delay = self._prepare(prompt, model, prefix)
+        await asyncio.sleep(delay)
+        return self.respond(text)
+
+    async def astream(self, prompt: str, model: str, prefix: Optional[StaticPrefix] = None,
+                      max_output_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """The response in STREAM_CHUNK_CHARS pieces, a fifth of the delay before the first."""
+        text, delay = self._prepare(prompt, model, prefix)
+        response = self.respond(text)
+        pieces = [response[i:i + self.STREAM_CHUNK_CHARS]
+                  for i in range(0, len(response), self.STREAM_CHUNK_CHARS)]
+        await asyncio.sleep(delay * 0.2)
+        for piece in pieces:
+            yield piece
+            await asyncio.sleep(delay * 0.8 / len(pieces))
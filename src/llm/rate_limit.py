@@ -0,0 +1,81 @@
+"""
+rate_limit.py - Request pacing and retry policy for LLM calls
+
+Used by llm_client on its dedicated event loop: a TokenBucket paces request
+starts, and retry_delay decides whether (and how long) to back off after a
+provider error, preferring the server's own Retry-After / retryDelay hint
+over exponential backoff with full jitter.
+"""
+
+import asyncio
+import random
+import re
+import time
+from typing import Optional
+
+RETRYABLE_MARKERS = ("429", "resource_exhausted", "503", "unavailable")
+_RETRY_DELAY_RE = re.compile(r"retry[-_ ]?delay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", re.IGNORECASE)
+
+
+class TokenBucket:
+    """Allows *rate* acquisitions per second on average, with bursts up to *capacity*."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right now."""
+        if self._lock.locked():
+            return False
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Server-provided wait from a Retry-After header or a retryDelay field, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            pass
+    match = _RETRY_DELAY_RE.search(str(exc))
+    return float(match.group(1)) if match else None
+
+
+def retry_delay(exc: Exception, attempt: int, base: float = 1.0, cap: float = 60.0) -> Optional[float]:
+    """
+    Seconds to wait before retry number *attempt* (0-based) after *exc*, or
+    None if the error is not worth retrying (anything but rate limiting or
+    temporary unavailability).
+    """
+    message = str(exc).lower()
+    if not any(marker in message for marker in RETRYABLE_MARKERS):
+        return None
+    hinted = retry_after_seconds(exc)
+    if hinted is not None:
+        return min(hinted, cap)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,137 @@
+"""
+response_cache.py - Content-addressed cache of LLM completions
+
+Opt-in per call site: llm_client only consults the cache when the call's
+``call_site`` has a positive TTL in the policy table (DEFAULT_POLICIES,
+overridden by ``LLM_CACHE_POLICIES`` in config/llm_config.json). Entries
+are keyed by a SHA-256 of (provider, model, prompt, parameters), stored in
+SQLite and evicted by TTL and, past ``LLM_CACHE_MAX_ENTRIES``, least
+recently used first.
+
+GM narrative turns are deliberately absent from the defaults: the same
+prompt should be able to produce a different scene.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from src.llm import metrics
+
+# call_site -> TTL in seconds
+DEFAULT_POLICIES = {
+    "summarize_ruleset": 30 * 24 * 3600,   # chunks rarely change
+    "news": 6 * 3600,                      # same event window, same news
+    "entity_extraction": 24 * 3600,        # unchanged history
+    "character_wizard": 7 * 24 * 3600,     # first question per ruleset
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    call_site   TEXT NOT NULL,
+    response    TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL,
+    expires_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access);
+CREATE INDEX IF NOT EXISTS idx_responses_expires ON responses (expires_at);
+"""
+
+
+def make_key(provider: str, model: str, prompt: str, params: Optional[dict] = None) -> str:
+    payload = json.dumps(
+        {"provider": provider, "model": model, "prompt": prompt, "params": params or {}},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed completion cache with TTL and LRU eviction."""
+
+    def __init__(self, path: Path, max_entries: int = 5000, policies: Optional[dict] = None):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.policies = {**DEFAULT_POLICIES, **(policies or {})}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def ttl_for(self, call_site: Optional[str]) -> float:
+        """TTL for *call_site*; 0 means the call site is not cached."""
+        return float(self.policies.get(call_site or "", 0) or 0)
+
+    def get(self, key: str, call_site: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+        metrics.incr("cache_hit" if row is not None else "cache_miss", call_site)
+        return row[0] if row is not None else None
+
+    def put(self, key: str, call_site: str, response: str) -> None:
+        ttl = self.ttl_for(call_site)
+        if ttl <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, call_site, response, created_at, last_access, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, call_site, response, now, now, now + ttl),
+            )
+            evicted = self._evict(now)
+            self._conn.commit()
+        metrics.incr("cache_store", call_site)
+        if evicted:
+            metrics.incr("cache_evict", "", evicted)
+
+    def _evict(self, now: float) -> int:
+        evicted = self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,)).rowcount
+        (total,) = self._conn.execute("SELECT count(*) FROM responses").fetchone()
+        if total > self.max_entries:
+            evicted += self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (total - self.max_entries,),
+            ).rowcount
+        return evicted
+
+    def clear(self, call_site: Optional[str] = None) -> None:
+        with self._lock:
+            if call_site is None:
+                self._conn.execute("DELETE FROM responses")
+            else:
+                self._conn.execute("DELETE FROM responses WHERE call_site = ?", (call_site,))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Entries per call site plus hit rate from the metrics counters."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT call_site, count(*) FROM responses GROUP BY call_site"
+            ).fetchall()
+        out = {}
+        for call_site in set(self.policies) | {r[0] for r in rows}:
+            hits = metrics.count("cache_hit", call_site)
+            misses = metrics.count("cache_miss", call_site)
+            out[call_site] = {
+                "entries": next((n for cs, n in rows if cs == call_site), 0),
+                "ttl": self.ttl_for(call_site),
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            }
+        return out
@@ -0,0 +1,122 @@
+"""
+routing.py - Model tiers per call site
+
+config/llm_routing.json maps each call site to a tier; a tier names a model
+plus its limits:
+
+    {
+      "default_tier": "large",
+      "tiers": {
+        "large": {"model": null, "max_input_tokens": 900000, "max_output_tokens": 2048,
+                  "timeout_seconds": 30, "fallback": "small"},
+        "small": {"model": "gemini-2.0-flash-lite", "max_input_tokens": 100000,
+                  "max_output_tokens": 1024, "timeout_seconds": 15}
+      },
+      "routes": {"gm_narrative": "large", "tool_planning": "small", ...}
+    }
+
+A tier without a model uses DEFAULT_MODEL from llm_config.json. Prompts too
+big for their tier's ``max_input_tokens`` are escalated to the default tier.
+``timeout_seconds`` is the deadline of calls that do not pass their own;
+tiers for background and CLI work leave it (and ``max_output_tokens``)
+unset, and keep no deadline when escalated.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, NamedTuple, Optional
+
+from src.llm import metrics
+
+THROUGHPUT_WINDOW_SECONDS = 60.0
+
+
+class Tier(NamedTuple):
+    name: str
+    model: str
+    max_input_tokens: Optional[int] = None
+    max_output_tokens: Optional[int] = None
+    timeout_seconds: Optional[float] = None
+    fallback: Optional[str] = None
+
+
+class Router:
+    def __init__(self, routing: dict, default_model: str):
+        self.tiers: Dict[str, Tier] = {}
+        for name, spec in (routing.get("tiers") or {}).items():
+            self.tiers[name] = Tier(
+                name=name,
+                model=spec.get("model") or default_model,
+                max_input_tokens=spec.get("max_input_tokens"),
+                max_output_tokens=spec.get("max_output_tokens"),
+                timeout_seconds=spec.get("timeout_seconds"),
+                fallback=spec.get("fallback"),
+            )
+        self.default_tier = routing.get("default_tier") or "default"
+        self.tiers.setdefault(self.default_tier, Tier(self.default_tier, default_model))
+        self.routes: Dict[str, str] = dict(routing.get("routes") or {})
+        for call_site, tier in self.routes.items():
+            if tier not in self.tiers:
+                raise ValueError(f"Route {call_site!r} points to unknown tier {tier!r}")
+        self._finished: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def tier_for(self, call_site: Optional[str]) -> Tier:
+        return self.tiers[self.routes.get(call_site or "", self.default_tier)]
+
+    def route(self, call_site: Optional[str], input_tokens: int) -> Tier:
+        """Tier for *call_site*, escalated to the default tier if the prompt does not fit."""
+        tier = self.tier_for(call_site)
+        if tier.max_input_tokens and input_tokens > tier.max_input_tokens \
+                and tier.name != self.default_tier:
+            metrics.incr("route_escalated", call_site or "default")
+            escalated = self.tiers[self.default_tier]
+            if tier.timeout_seconds is None:
+                escalated = escalated._replace(timeout_seconds=None)
+            tier = escalated
+        return tier
+
+    def fallback_model(self, call_site: Optional[str]) -> Optional[str]:
+        tier = self.tier_for(call_site)
+        return self.tiers[tier.fallback].model if tier.fallback in self.tiers else None
+
+    def record(self, tier: Tier, seconds: float, ok: bool) -> None:
+        metrics.incr("tier_calls" if ok else "tier_errors", tier.name)
+        if ok:
+            metrics.observe("tier_latency", seconds, tier.name)
+        with self._lock:
+            self._finished.setdefault(tier.name, deque(maxlen=10000)).append(time.monotonic())
+
+    def stats(self) -> dict:
+        """Per tier: model, calls, errors, p50/p95 latency (ms) and calls per minute."""
+        now = time.monotonic()
+        out = {}
+        for name, tier in self.tiers.items():
+            with self._lock:
+                recent = sum(1 for t in self._finished.get(name, ()) if now - t <= THROUGHPUT_WINDOW_SECONDS)
+            out[name] = {
+                "model": tier.model,
+                "calls": metrics.count("tier_calls", name),
+                "errors": metrics.count("tier_errors", name),
+                "p50_ms": metrics.percentile("tier_latency", 50, name) * 1000.0,
+                "p95_ms": metrics.percentile("tier_latency", 95, name) * 1000.0,
+                "calls_per_minute": recent * 60.0 / THROUGHPUT_WINDOW_SECONDS,
+                "call_sites": sorted(cs for cs, t in self.routes.items() if t == name),
+            }
+        return out
+
+
+def load_router(path: Path, default_model: str) -> Router:
+    """Router from *path*; a missing or unreadable file routes everything to DEFAULT_MODEL."""
+    try:
+        routing = json.loads(Path(path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        routing = {}
+    except Exception as e:
+        logging.error(f"Error loading routing from {path}: {e}")
+        routing = {}
+    return Router(routing, default_model)
@@ -1,38 +1,26 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-import json
-import re
 
 from src.db.ruleset_db import get_ruleset
+from src.llm.json_stream import parse_json_text, strip_fences
 from src.llm.llm_client import generate_completion
-from src.utils.prompt_loader import load_prompt_template
+from src.llm.prefix_cache import make_prefix
+from src.utils.prompt_loader import load_prompt_template, template_version
 from src.game.tools import roll_dice
 
 def _extract_tools(text: str) -> (str, Dict[str, Any]):
     """Return plain text and any requested tool calls."""
-    cleaned = text.strip()
-    if cleaned.startswith("```"):
-        lines = cleaned.splitlines()
-        if lines and lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        cleaned = "\n".join(lines).strip()
-
-    m = re.search(r'(\{[\s\S]*\})', cleaned)
-    json_str = m.group(1).strip() if m else cleaned
     try:
-        data = json.loads(json_str)
-        if isinstance(data, dict) and "tool_calls" in data:
-            tools = data.get("tool_calls") or {}
-            if not isinstance(tools, dict):
-                tools = {}
-            text_out = data.get("narrative", "")
-            return text_out, tools
-    except Exception:
-        pass
-    return cleaned, {}
+        data = parse_json_text(text, start_chars="{")
+    except ValueError:
+        data = None
+    if isinstance(data, dict) and "tool_calls" in data:
+        tools = data.get("tool_calls") or {}
+        if not isinstance(tools, dict):
+            tools = {}
+        return data.get("narrative", ""), tools
+    return strip_fences(text), {}
 
 router = APIRouter(prefix="/api/character", tags=["character"])
 
@@ -62,9 +50,15 @@ def character_wizard(req: WizardRequest):
 
     ruleset_text = rs["char_creation"]
 
-    # 2) Build system prompt from template
+    # 2) Build system prompt from template; it is the same for every step with
+    #    this ruleset, so it goes to the provider as a cacheable prefix
     template = load_prompt_template("character_wizard_system.txt")
-    system_prompt = template.format(ruleset_text=ruleset_text)
+    system_prefix = make_prefix(
+        "wizard",
+        template.format(ruleset_text=ruleset_text),
+        tpl=template_version("character_wizard_system.txt"),
+        ruleset=req.ruleset_id,
+    )
 
     # 3) Append history
     history_prompt = ""
@@ -79,12 +73,14 @@ def character_wizard(req: WizardRequest):
 
     extra_context = ""
     while True:
-        full_prompt = system_prompt + history_prompt + extra_context + next_step_prompt
+        step_prompt = history_prompt + extra_context + next_step_prompt
 
         print("Prompt:")
-        print(full_prompt)
+        print(system_prefix.text + step_prompt)
 
-        response_text = generate_completion(full_prompt).strip()
+        response_text = generate_completion(
+            step_prompt, call_site="character_wizard", prefix=system_prefix
+        ).strip()
         text, tools = _extract_tools(response_text)
 
         if tools.get("dice"):
@@ -95,27 +91,18 @@ def character_wizard(req: WizardRequest):
             extra_context += f"Dice results for {num}d{sides}: {results}\n\n"
             continue
 
-        cleaned = text.strip()
-        if cleaned.startswith("```"):
-            lines = cleaned.splitlines()
-            if lines and lines[0].startswith("```"):
-                lines = lines[1:]
-            if lines and lines[-1].startswith("```"):
-                lines = lines[:-1]
-            cleaned = "\n".join(lines)
-
-        m = re.search(r'(\{[\s\S]*\})', cleaned)
-        if m:
-            cleaned = m.group(1).strip()
-        else:
+        cleaned = strip_fences(text)
+        try:
+            data = parse_json_text(cleaned, start_chars="{")
+        except ValueError:
+            data = None
             if cleaned.startswith("Q:") and "A:" in cleaned:
                 cleaned = cleaned.split("A:")[0].strip()
 
         print("Response:")
         print(cleaned)
 
-        try:
-            data = json.loads(cleaned)
+        if isinstance(data, dict):
             name = data.pop("name", None)
             char_data = data.get("character_data", data)
             return WizardResponse(
@@ -124,5 +111,4 @@ def character_wizard(req: WizardRequest):
                 name=name,
                 character_data=char_data
             )
-        except json.JSONDecodeError:
-            return WizardResponse(question=cleaned, complete=False)
+        return WizardResponse(question=cleaned, complete=False)
@@ -1,5 +1,6 @@
 # src/server/game.py
-from fastapi import APIRouter, HTTPException, status, Request, Query
+from fastapi import APIRouter, HTTPException, status, Request, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from src.db import universe_db, game_db
@@ -7,6 +8,7 @@ from src.db.universe_db import get_universe
 from src.db.character_db import get_character_by_id
 from src.game.initial_prompt import generate_initial_scene
 from src.game.brancher import run_branch
+from src.game.session import drop_session
 from src.server.notifications import notify_branch
 
 router = APIRouter()
@@ -187,31 +189,57 @@ def get_user_character(game_id: str, request: Request):
         raise HTTPException(status_code=500, detail=f"Error fetching bound character: {e}")
 
 class ChatMessage(BaseModel):
+    id: int
     sender: str
     message: str
     timestamp: str
 
 class GameMessagesResponse(BaseModel):
     messages: List[ChatMessage]
+    next_after_id: Optional[int] = None
+    prev_before_id: Optional[int] = None
+
+DEFAULT_MESSAGES_PAGE = 100
+MAX_MESSAGES_PAGE = 1000
 
 @router.get("/game/{game_id}/messages", response_model=GameMessagesResponse)
-def list_game_messages(game_id: str, request: Request):
+def list_game_messages(
+    game_id: str,
+    request: Request,
+    after_id: Optional[int] = Query(None, ge=0, description="Only messages with a larger id"),
+    before_id: Optional[int] = Query(None, ge=1, description="Only messages with a smaller id"),
+    limit: int = Query(DEFAULT_MESSAGES_PAGE, ge=1, le=MAX_MESSAGES_PAGE),
+):
+    """
+    Transcript page; the JSON body is rendered by Postgres and passed through
+    as-is. Without ``after_id`` the newest ``limit`` messages are returned;
+    page back with ``before_id=prev_before_id`` or forward with
+    ``after_id=next_after_id``. Full exports go through ``/messages/stream``.
+    """
     username = request.session.get("username")
     if not username:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     try:
-        msgs = game_db.list_chat_messages(game_id)
-        serialized = [
-            {
-                "sender": msg["sender"],
-                "message": msg["message"],
-                "timestamp": msg["timestamp"].isoformat() + "Z",
-            }
-            for msg in msgs
-        ]
-        return {"messages": serialized}
+        body = game_db.get_chat_page_json(
+            game_id, after_id=after_id, before_id=before_id, limit=limit
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/game/{game_id}/messages/stream")
+def stream_game_messages(
+    game_id: str,
+    request: Request,
+    after_id: Optional[int] = Query(None, ge=0, description="Only messages with a larger id"),
+):
+    """Whole transcript as newline-delimited JSON, streamed from a server-side cursor."""
+    username = request.session.get("username")
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    lines = (doc + "\n" for doc in game_db.iter_chat_message_docs(game_id, after_id=after_id))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 
 @router.post("/game/{game_id}/branch", response_model=List[GameCreateResponse])
@@ -264,5 +292,6 @@ def close_game_endpoint(game_id: str, request: Request):
         game_db.update_game_status(game_id, "closed")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    drop_session(game_id)
     game["status"] = "closed"
     return _add_universe_names(game)
@@ -1,160 +1,103 @@
 # src/server/game_chat.py
 
+import asyncio
 import json
 import logging
+import time
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from datetime import datetime, timezone
 from src.db import game_db, universe_db
-from src.db import game_db
-from sentence_transformers import SentenceTransformer
-from src.llm.gm_llm import generate_gm_response, generate_gm_output
-from src.game.tools import roll_dice, query_ruleset_chunks
+from src.llm.gm_llm import agenerate_gm_response, agenerate_gm_output, gm_models
+from src.llm.embeddings import EmbeddingUnavailable, get_embedding_service
+from src.llm.llm_client import load_llm_config
+from src.game.prompt_budget import PromptPlan, Section, plan_prompt
+from src.game.session import drop_session, get_session
+from src.game.tools import DEFAULT_TOP_K, LorePrefetcher, roll_dice
 from src.db.character_db import get_character_by_id
 from src.game.conflict_detector import run_conflict_detector
 from src.game.named_entity_extractor import run_named_entity_extractor
 from src.server.notifications import notify_game_advanced, notify_branch
 from src.game.brancher import run_branch
-from src.utils.token_counter import count_tokens, compute_usage_percentage
-from src.db.universe_db import (
-    get_universe,
-    upsert_named_entity,
-)
-from src.db.ruleset_db import get_ruleset
+from src.utils.token_counter import compute_usage_percentage, get_model_max_tokens
+from src.db.universe_db import upsert_named_entity
 
 logging.getLogger().setLevel(logging.INFO)
-MODEL_NAME = "gemini-2.0-flash"
-CONTEXT_USAGE_THRESHOLD = 50.0
+# Token budgets of a GM turn's prompt; see plan_gm_context
+GM_PROMPT_BUDGET_TOKENS = int(load_llm_config().get("GM_PROMPT_BUDGET_TOKENS", 32000))
+GM_FALLBACK_BUDGET_TOKENS = int(load_llm_config().get("GM_FALLBACK_BUDGET_TOKENS", 8000))
+MAX_LORE_CHUNKS = 10
+MAX_TOOL_ROUNDS = 5
+REPLAY_PAGE_SIZE = 100
+# Most recent messages loaded into an empty GM history (the prompt budget
+# keeps what fits; older turns are covered by the game summary)
+GM_HISTORY_SEED_MESSAGES = 500
 
 router = APIRouter()
 
-try:
-    summary_model = SentenceTransformer("all-MiniLM-L6-v2")
-except Exception as e:  # pragma: no cover - offline fallback
-    logging.error(f"Could not load summary model: {e}")
-
-    class _DummyModel:
-        def encode(self, texts):
-            return [[0.0] * 384 for _ in texts]
-
-    summary_model = _DummyModel()
-
 # Global conversation history storage per game instance.
 conversation_histories: Dict[str, List[str]] = {}
 
-# Track, per‐game, the latest news‐timestamp we've already included in a GM prompt
-last_included_news_time: Dict[str, datetime] = {}
+def plan_gm_context(game_id: str, gm_prompt: str, news_lines: List[str],
+                    lore_queries: List[str], lore_chunks: List[str],
+                    budget: int, model: str) -> Tuple[str, str, PromptPlan]:
+    """
+    Fit the GM turn into *budget* tokens of *model* (capped at its context
+    window) and return its conversation context, the entity list JSON and
+    the plan. The chat history gets half the budget
+    and whatever the other sections leave; only if it still does not fit are
+    the player list, opening scene and latest summary (the session's cached
+    game_context snapshot) added to stand in for the dropped messages.
+    """
+    session = get_session(game_id)
+    history = conversation_histories[game_id]
+    entities = [json.dumps(e, ensure_ascii=False) for e in json.loads(session.entity_json or "[]")]
+    sections = [
+        Section("fixed", [session.gm_prefix.text, f"User Prompt: {gm_prompt}\n\nGM Response:"],
+                required=True),
+        Section("history", history, priority=0, share=0.5, newest_last=True),
+        Section("lore", lore_chunks, priority=1, share=0.15),
+        Section("news", news_lines, priority=2, share=0.05, newest_last=True),
+        Section("entities", entities, priority=3, share=0.1),
+    ]
+    budget = min(budget, get_model_max_tokens(model) or budget)
+    plan = plan_prompt(sections, budget, model)
+    players = opening = summary = ""
+    if plan.truncated("history"):
+        ctx = session.game_context
+        names = [p.get("name") for p in session.roster]
+        players = "Players: " + ", ".join(n for n in names if n) if names else ""
+        extra = [
+            Section("players", [players] if players else [], required=True),
+            Section("summary", [ctx.get("latest_summary") or ""], priority=0, share=0.1),
+            Section("opening", [ctx.get("opening_scene") or ""], priority=2, share=0.05),
+        ]
+        plan = plan_prompt(sections + extra, budget, model)
+        opening = "".join(plan.items["opening"])
+        summary = "".join(plan.items["summary"])
 
-# Cache of the latest entity list per game
-entity_cache: Dict[str, str] = {}
-
-def fetch_full_entity_list(game_id: str) -> str:
-    """Return the full JSON list of known entities for this game's universes."""
-    uni_ids = universe_db.list_universes_for_game(game_id)
-    entities = []
-    for uid in uni_ids:
-        try:
-            entities.extend(universe_db.list_named_entities(uid, limit=100))
-        except Exception:
-            continue
-    # Convert any datetime objects in the entity list to ISO strings so the
-    # structure is fully JSON serializable.
-    for entity in entities:
-        for key, value in list(entity.items()):
-            if isinstance(value, datetime):
-                entity[key] = value.isoformat()
-
-    return json.dumps(entities, ensure_ascii=False)
-
-def build_compressed_context(game_id: str, gm_prompt: str, last_k: int = 20) -> str:
-    """
-    Returns a prompt string composed of:
-      1) Universe metadata (name, description)
-      2) Ruleset info (name, description, summary, long_summary)
-      3) Current players in the game
-      4) The opening scene (first GM message)
-      5) The latest stored summary from game_history
-      6) The last `last_k` chat messages
-      7) The current user trigger (gm_prompt)
-    """
-    # 1) Universe & ruleset
-    uni_section = ""
-    ruleset_section = ""
-    uni_ids = universe_db.list_universes_for_game(game_id)
-    if uni_ids:
-        uni = get_universe(uni_ids[0])
-        if uni:
-            uni_section = f"Universe: {uni['name']} — {uni['description']}\n\n"
-            rs = get_ruleset(uni.get("ruleset_id"))
-            if rs:
-                ruleset_section = (
-                    f"Ruleset: {rs['name']} — {rs['description']}\n"
-                    f"Summary: {rs.get('summary','')}\n\n"
-                    f"Details: {rs.get('long_summary','')}\n\n"
-                )
-
-    # 2) Players list
-    player_ids = game_db.list_players_in_game(game_id)
-    names = []
-    for cid in player_ids:
-        char = get_character_by_id(cid)
-        if char:
-            names.append(char["name"])
-    players_section = "Players: " + ", ".join(names) + "\n\n" if names else ""
-
-    # 3) Opening scene (first GM message)
-    opening_scene = ""
-    for m in game_db.list_chat_messages(game_id):
-        if m["sender"] == "GM":
-            opening_scene = m["message"]
-            break
-
-    # 4) Latest stored summary
-    conn = game_db.get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT summary FROM game_history "
-                "WHERE game_id=%s ORDER BY summary_date DESC LIMIT 1",
-                (game_id,)
-            )
-            row = cur.fetchone()
-        summary = row[0] if row else ""
-    finally:
-        conn.close()
-
-    # 5) Recent messages
-    conn = game_db.get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT sender, message FROM chat_messages "
-                "WHERE game_id=%s ORDER BY timestamp DESC LIMIT %s",
-                (game_id, last_k)
-            )
-            rows = cur.fetchall()
-        rows.reverse()
-        recent = "\n".join(f"{r[0]}: {r[1]}" for r in rows)
-    finally:
-        conn.close()
-
-    # 6) Latest entity list
-    entity_json = fetch_full_entity_list(game_id)
-    entity_cache[game_id] = entity_json
-    entity_section = f"Known Entities:\n{entity_json}\n\n" if entity_json else ""
+    parts = []
+    if plan.items["news"]:
+        lines = [f"Recent Universe News (as of {datetime.utcnow().isoformat()}Z):"]
+        lines += [f"{idx}) {line}" for idx, line in enumerate(plan.items["news"], start=1)]
+        parts.append("\n".join(lines))
+    if plan.items["lore"]:
+        quoted = ", ".join(f"'{q}'" for q in lore_queries)
+        lines = [f"Relevant Lore for {quoted}:"]
+        lines += [f"{idx}. {chunk.strip()}" for idx, chunk in enumerate(plan.items["lore"], start=1)]
+        parts.append("\n".join(lines))
+    if players:
+        parts.append(players)
+    if opening:
+        parts.append(f"Opening Scene:\n{opening}")
+    if summary:
+        parts.append(f"Summary of the Game So Far:\n{summary}")
+    if plan.truncated("history"):
+        parts.append(f"Recent Messages ({plan.dropped['history']} earlier omitted):")
+    parts.append("\n".join(plan.items["history"]))
 
-    # 7) Assemble compressed prompt
-    return (
-        f"{uni_section}"
-        f"{ruleset_section}"
-        f"{players_section}"
-        f"{entity_section}"
-        f"Opening Scene:\n{opening_scene}\n\n"
-        f"Summary of the Game So Far:\n{summary}\n\n"
-        f"Recent Messages:\n{recent}\n\n"
-        f"User (trigger): {gm_prompt}\n\n"
-        "GM Response:"
-    )
+    entity_json = "[" + ", ".join(plan.items["entities"]) + "]"
+    return "\n\n".join(parts), entity_json, plan
 
 class GameConnectionManager:
     def __init__(self):
@@ -167,14 +110,14 @@ class GameConnectionManager:
         self.active_connections[game_id].append(websocket)
         if game_id not in conversation_histories:
             conversation_histories[game_id] = []
-        # Initialize last_included_news_time if not set
-        if game_id not in last_included_news_time:
-            # Start with epoch so that the first time we include any news
-            last_included_news_time[game_id] = datetime.fromtimestamp(0, tz=timezone.utc)
 
     def disconnect(self, game_id: str, websocket: WebSocket):
         if game_id in self.active_connections and websocket in self.active_connections[game_id]:
             self.active_connections[game_id].remove(websocket)
+            # Nobody left to play: free the game's cached GM state.
+            if not self.active_connections[game_id]:
+                del self.active_connections[game_id]
+                drop_session(game_id)
 
     async def broadcast(self, game_id: str, message: str):
         if game_id in self.active_connections:
@@ -194,6 +137,7 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
         char = get_character_by_id(character_id)
         character_name = char["name"] if char else "unknown"
     except Exception:
+        char = None
         character_name = "unknown"
 
     # 3. Combine into a display name
@@ -203,42 +147,34 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
     game_info = game_db.get_game(game_id)
     if game_info and game_info.get("status") in ("closed", "merged", "branched"):
         await websocket.accept()
-        persisted = game_db.list_chat_messages(game_id)
-        for msg in persisted:
-            await websocket.send_text(json.dumps({
-                "game_id":   game_id,
-                "sender":    msg["sender"],
-                "message":   msg["message"],
-                "timestamp": msg["timestamp"].isoformat() + "Z"
-            }))
+        for doc in game_db.list_chat_message_docs(game_id):
+            await websocket.send_text(doc)
         await websocket.close()
         return
 
-    # 4. Register this connection
+    # 4. Register this connection; the session is shared by every turn of this game
     await manager.connect(game_id, websocket)
-
-    # 4.1 Load & send existing messages from the DB to this socket
-    if not conversation_histories.get(game_id):
-        conversation_histories[game_id] = []
-
-    # Pull everything from chat_messages table
-    persisted = game_db.list_chat_messages(game_id)
-    for msg in persisted:
-        entry = f"{msg['sender']}: {msg['message']}"
-        conversation_histories[game_id].append(entry)
-        # send each past message just to this new client
-        await websocket.send_text(json.dumps({
-            "game_id":   game_id,
-            "sender":    msg["sender"],
-            "message":   msg["message"],
-            "timestamp": msg["timestamp"].isoformat() + "Z"
-        }))
+    session = get_session(game_id)
+
+    # 4.1 Send the most recent page, rendered by Postgres, to this socket; the
+    # client fetches older pages from /api/game/{id}/messages?before_id=...
+    # as the user scrolls. The first player in also seeds the GM history;
+    # later joins share the history already in memory.
+    seed = not conversation_histories[game_id]
+    recent = game_db.list_chat_message_docs(
+        game_id, limit=GM_HISTORY_SEED_MESSAGES if seed else REPLAY_PAGE_SIZE
+    )
+    for doc in recent[-REPLAY_PAGE_SIZE:]:
+        await websocket.send_text(doc)
+
+    if seed:
+        for doc in recent:
+            msg = json.loads(doc)
+            conversation_histories[game_id].append(f"{msg['sender']}: {msg['message']}")
 
     # If this is a brand new history, prepend the entity list for the GM
     if not conversation_histories[game_id]:
-        entity_json = fetch_full_entity_list(game_id)
-        entity_cache[game_id] = entity_json
-        conversation_histories[game_id].append(f"System: Entities: {entity_json}")
+        conversation_histories[game_id].append(f"System: Entities: {session.entity_json}")
 
     # 5. Log & broadcast a “join” event for both players and GM context
     join_msg = f"{sender_display} has joined the game."
@@ -257,8 +193,7 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
 
     # 5.1 Broadcast full character details so the GM knows their stats
     try:
-        full_char = get_character_by_id(character_id) or {}
-        char_data = full_char.get("character_data", {})
+        char_data = (char or {}).get("character_data", {})
         attrs_msg = f"{character_name}'s full profile: {json.dumps(char_data)}"
         conversation_histories[game_id].append(f"System: {attrs_msg}")
         payload = json.dumps({
@@ -315,24 +250,24 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
                         "Please provide a concise summary of the following game chat:\n\n"
                         f"{convo}"
                     )
-                    summary_text = generate_gm_response(
+                    universe_ids = session.universe_ids
+                    summary_text = await agenerate_gm_response(
                         summary_prompt,
-                        entity_list=entity_cache.get(game_id, fetch_full_entity_list(game_id)),
+                        entity_list=session.entity_json,
+                        prefix=session.gm_prefix,
                     ) if summary_prompt.strip() else ""
 
-                    embedding = summary_model.encode(summary_text).tolist()
-
-                    conn = game_db.get_db_connection()
-                    with conn.cursor() as cur:
-                        cur.execute(
-                            "INSERT INTO game_history (game_id, summary, embedding) VALUES (%s, %s, %s)",
-                            (game_id, summary_text, embedding)
-                        )
-                        conn.commit()
-                    conn.close()
+                    saved = True
+                    try:
+                        embedding = await get_embedding_service().aembed(summary_text, require_model=True)
+                    except EmbeddingUnavailable as e:
+                        # A zero vector would make this summary unsearchable for good.
+                        logging.error(f"[gm summarize] game={game_id}: {e}")
+                        saved = False
+                    else:
+                        game_db.save_game_summary(game_id, summary_text, embedding)
 
                     # Record this summary as a universe event
-                    universe_ids = universe_db.list_universes_for_game(game_id)
                     for uni in universe_ids:
                         universe_db.record_event(
                             universe_id=uni,
@@ -343,9 +278,11 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
 
                     # Run conflict detection
                     for uni in universe_ids:
-                        run_conflict_detector(uni)
+                        await asyncio.to_thread(run_conflict_detector, uni)
 
                     note = f"[Summary generated at {datetime.utcnow().isoformat()}]"
+                    if not saved:
+                        note += " (not saved to the game history: embedding model unavailable)"
                     conversation_histories[game_id].append(f"System: {note}")
                     await manager.broadcast(game_id, json.dumps({
                         "game_id":   game_id,
@@ -392,23 +329,18 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
                     convo_text = "\n".join(conversation_histories[game_id])
 
                     # Gather known player characters in this game
-                    known_entities = []
                     try:
-                        player_ids = game_db.list_players_in_game(game_id)
-                        for cid in player_ids:
-                            char = get_character_by_id(cid)
-                            if char:
-                                known_entities.append({
-                                    "name": char.get("name"),
-                                    "entity_type": "Character",
-                                    "description": "",
-                                    "player_character": True,
-                                })
+                        known_entities = [{
+                            "name": player.get("name"),
+                            "entity_type": "Character",
+                            "description": "",
+                            "player_character": True,
+                        } for player in session.roster]
                     except Exception:
                         known_entities = []
 
-                    entities = run_named_entity_extractor(
-                        convo_text, known_entities=known_entities
+                    entities = await asyncio.to_thread(
+                        run_named_entity_extractor, convo_text, known_entities=known_entities
                     )
                     entity_json = json.dumps(entities)
 
@@ -421,8 +353,7 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
                         "timestamp": datetime.utcnow().isoformat() + "Z"
                     }))
 
-                    universe_ids = universe_db.list_universes_for_game(game_id)
-                    for uni in universe_ids:
+                    for uni in session.universe_ids:
                         universe_db.record_event(
                             universe_id=uni,
                             game_id=game_id,
@@ -438,9 +369,8 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
                                 player_character=e.get("player_character", False),
                             )
 
-                    # Refresh entity cache and include in conversation
-                    entity_cache[game_id] = fetch_full_entity_list(game_id)
-                    refreshed_msg = f"Entities updated: {entity_cache[game_id]}"
+                    # The upserts invalidated the session's entity list; include the new one
+                    refreshed_msg = f"Entities updated: {session.entity_json}"
                     conversation_histories[game_id].append(f"System: {refreshed_msg}")
                     await manager.broadcast(game_id, json.dumps({
                         "game_id":   game_id,
@@ -451,45 +381,13 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
 
                 # 4) Fallback: narrative GM
                 else:
-                    # --- NEW: Fetch recent universe news, up to 5 items newer than last_included_news_time ---
-                    # Determine the first universe this game is in (if any)
-                    universe_ids = universe_db.list_universes_for_game(game_id)
-                    news_block = ""
-                    if universe_ids:
-                        uni = universe_ids[0]
-                        # Get all recent news items (limit 5)
-                        raw_news = universe_db.list_news(uni, limit=5)
-                        # Filter only those strictly newer than last_included_news_time
-                        newest_allowed = last_included_news_time.get(game_id)
-                        fresh_items = []
-                        for item in raw_news:
-                            published = item["published_at"]
-                            # Make sure both are timezone-aware UTC
-                            if published.tzinfo is None:
-                                published = published.replace(tzinfo=timezone.utc)
-                            if newest_allowed is None or published > newest_allowed:
-                                fresh_items.append(item)
-
-                        if fresh_items:
-                            # Build a short “Recent Universe News” block
-                            lines = [
-                                f"Recent Universe News (as of {datetime.utcnow().isoformat()}Z):"
-                            ]
-                            # Sort by published_at ascending so oldest of the fresh first
-                            fresh_items.sort(key=lambda x: x["published_at"])
-                            for idx, itm in enumerate(fresh_items, start=1):
-                                ts = itm["published_at"].astimezone(timezone.utc).isoformat()
-                                summary = itm["summary"].replace("\n", " ").strip()
-                                lines.append(f"{idx}) [{ts}] {summary}")
-                                # Update our last included timestamp
-                                if itm["published_at"] > last_included_news_time[game_id]:
-                                    last_included_news_time[game_id] = itm["published_at"]
-                            news_block = "\n".join(lines) + "\n\n"
-                        else:
-                            # No new items since last time: no block
-                            news_block = ""
-                    else:
-                        news_block = ""
+                    # Universe news the GM has not seen yet (the session only
+                    # re-reads news after some was recorded)
+                    news_lines = []
+                    for itm in session.fresh_news():
+                        ts = itm["published_at"].astimezone(timezone.utc).isoformat()
+                        summary = itm["summary"].replace("\n", " ").strip()
+                        news_lines.append(f"[{ts}] {summary}")
 
                      # --- Build the conversation context as before ---
                     if stripped.startswith("/gm"):
@@ -498,50 +396,69 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
                         # If it somehow was not a /gm (rare), treat as default
                         gm_prompt = "Provide a narrative update."
 
+                    gm_prefix = session.gm_prefix
+
+                    # Speculatively look up lore for the trigger text while the first
+                    # GM call is in flight; a later lore request can use it right away.
+                    lore = LorePrefetcher(session.ruleset_id)
+                    if stripped[3:].strip():
+                        lore.prefetch(gm_prompt)
+
                     # Iteratively let the GM decide on tool usage before broadcasting
                     lore_chunks = []
-                    lore_query = ""
+                    lore_queries = []
                     branch_performed = False
+                    tool_rounds = 0
+                    # Measure prompts with the models that will read them; the
+                    # compressed prompt is the one the fallback model ends up with.
+                    gm_model, fallback_model = gm_models()
                     while True:
-                        full_history = "\n".join(conversation_histories[game_id])
-                        entity_json = entity_cache.get(game_id)
-                        if not entity_json:
-                            entity_json = fetch_full_entity_list(game_id)
-                            entity_cache[game_id] = entity_json
-                        entity_block = f"Known Entities:\n{entity_json}\n\n" if entity_json else ""
+                        # Plan the prompt into the token budget; item counts are
+                        # memoized, so re-planning only encodes the new messages.
+                        context, entity_json, prompt_plan = plan_gm_context(
+                            game_id, gm_prompt, news_lines, lore_queries, lore_chunks,
+                            GM_PROMPT_BUDGET_TOKENS, gm_model,
+                        )
+                        pct = compute_usage_percentage(prompt_plan.used, gm_model)
+                        logging.info(
+                            f"[TokenUsage] game={game_id} prompt={prompt_plan.used}/{prompt_plan.budget} "
+                            f"tokens ({pct:.1f}% of window), dropped={prompt_plan.dropped}"
+                        )
 
-                        lore_block = ""
-                        if lore_chunks:
-                            lore_lines = [f"Relevant Lore for '{lore_query}':"]
-                            for idx, chunk in enumerate(lore_chunks, start=1):
-                                lore_lines.append(f"{idx}. {chunk.strip()}")
-                            lore_block = "\n".join(lore_lines) + "\n\n"
+                        # Smaller prompt for when the full one misses its deadline
+                        def fallback_context(lore_chunks=list(lore_chunks),
+                                             lore_queries=list(lore_queries)):
+                            return plan_gm_context(
+                                game_id, gm_prompt, news_lines, lore_queries, lore_chunks,
+                                GM_FALLBACK_BUDGET_TOKENS, fallback_model or gm_model,
+                            )[0]
 
-                        baseline_prompt = (
-                            f"{news_block}"
-                            f"{lore_block}"
-                            f"{entity_block}"
-                            f"Conversation History:\n{full_history}\n\n"
-                            f"User (trigger): {gm_prompt}\n\n"
-                            "GM Response:"
-                        )
+                        # Stream the narrative to clients as it is generated, and start
+                        # lore lookups as soon as the tool_calls object is complete.
+                        stream_id = f"{game_id}-{time.monotonic_ns()}"
 
-                        prompt_tokens = count_tokens(baseline_prompt, MODEL_NAME)
-                        pct = compute_usage_percentage(prompt_tokens, MODEL_NAME)
-                        logging.info(f"[TokenUsage] game={game_id} prompt={prompt_tokens} tokens ({pct:.1f}%)")
+                        async def on_narrative(delta, stream_id=stream_id):
+                            await manager.broadcast(game_id, json.dumps({
+                                "game_id":   game_id,
+                                "sender":    "GM",
+                                "stream_id": stream_id,
+                                "delta":     delta,
+                                "timestamp": datetime.utcnow().isoformat() + "Z",
+                            }))
 
-                        if pct >= CONTEXT_USAGE_THRESHOLD:
-                            assembled_prompt = (
-                                f"{news_block}"
-                                f"{lore_block}"
-                                + build_compressed_context(game_id, gm_prompt, last_k=20)
-                            )
-                        else:
-                            assembled_prompt = baseline_prompt
+                        async def on_tool_calls(plan):
+                            spec = plan.get("lore") or {}
+                            if isinstance(spec, dict) and spec.get("query"):
+                                lore.prefetch(spec["query"], int(spec.get("top_k", DEFAULT_TOP_K)))
 
-                        gm_text, tool_plan = generate_gm_output(
-                            assembled_prompt,
+                        gm_text, tool_plan = await agenerate_gm_output(
+                            context,
+                            trigger_prompt=gm_prompt,
                             entity_list=entity_json,
+                            prefix=gm_prefix,
+                            compressed_context=fallback_context,
+                            on_narrative=on_narrative,
+                            on_tool_calls=on_tool_calls,
                         )
 
                         if tool_plan:
@@ -555,9 +472,11 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
                             "game_id":   game_id,
                             "sender":    tag,
                             "message":   gm_text,
+                            "stream_id": stream_id,
                             "timestamp": datetime.utcnow().isoformat() + "Z",
                         }))
 
+                        # Dice are instant; lore lookups and branching run concurrently.
                         if tool_plan.get("dice"):
                             spec = tool_plan["dice"] or {}
                             num = int(spec.get("num_rolls", 1))
@@ -573,50 +492,67 @@ async def game_chat_endpoint(game_id: str, websocket: WebSocket):
                                 "timestamp": datetime.utcnow().isoformat() + "Z",
                             }))
 
-                        if tool_plan.get("lore"):
-                            spec = tool_plan["lore"] or {}
-                            lore_query = spec.get("query", "")
-                            top_k = int(spec.get("top_k", 5))
-                            if lore_query:
-                                uni_ids = universe_db.list_universes_for_game(game_id)
-                                if uni_ids:
-                                    uni = get_universe(uni_ids[0])
-                                    if uni and uni.get("ruleset_id"):
-                                        lore_chunks = query_ruleset_chunks(uni["ruleset_id"], lore_query, top_k)
-
+                        lore_spec = tool_plan.get("lore") or {}
+                        lore_query = lore_spec.get("query", "")
+                        branch_spec = tool_plan.get("branch") or {}
+                        lookups = {}
+                        if lore_query:
+                            lookups["lore"] = lore.get(lore_query, int(lore_spec.get("top_k", DEFAULT_TOP_K)))
                         if tool_plan.get("branch"):
-                            spec = tool_plan["branch"] or {}
-                            groups = spec.get("groups", [])
-                            try:
-                                results = run_branch(game_id, groups)
-                                ids = [r["game"]["id"] for r in results]
-                                msg = f"Game branched into {len(ids)} parts."
-                                game_db.save_chat_message(game_id, "System", msg)
-                                conversation_histories[game_id].append(f"System: {msg}")
-                                await manager.broadcast(game_id, json.dumps({
-                                    "game_id":   game_id,
-                                    "sender":    "System",
-                                    "message":   msg,
-                                    "timestamp": datetime.utcnow().isoformat() + "Z",
-                                }))
+                            lookups["branch"] = asyncio.to_thread(
+                                run_branch, game_id, branch_spec.get("groups", [])
+                            )
+                        outcomes = dict(zip(
+                            lookups, await asyncio.gather(*lookups.values(), return_exceptions=True)
+                        ))
+
+                        lore_failed = False
+                        if "lore" in outcomes and isinstance(outcomes["lore"], BaseException):
+                            # Asking the GM again with the same context would just repeat the request
+                            logging.error(f"[gm tools] game={game_id} lore lookup failed: {outcomes['lore']!r}")
+                            lore_failed = True
+                            msg = f"Lore lookup failed: {outcomes['lore']}"
+                            game_db.save_chat_message(game_id, "System", msg)
+                            conversation_histories[game_id].append(f"System: {msg}")
+                            await manager.broadcast(game_id, json.dumps({
+                                "game_id":   game_id,
+                                "sender":    "System",
+                                "message":   msg,
+                                "timestamp": datetime.utcnow().isoformat() + "Z",
+                            }))
+                        elif "lore" in outcomes:
+                            # Keep earlier rounds' lore, plus the speculative trigger lookup if done
+                            found = outcomes["lore"] + lore.ready(gm_prompt)
+                            lore_queries.append(lore_query)
+                            for chunk in found:
+                                if chunk not in lore_chunks and len(lore_chunks) < MAX_LORE_CHUNKS:
+                                    lore_chunks.append(chunk)
+
+                        if "branch" in outcomes:
+                            results = outcomes["branch"]
+                            if isinstance(results, BaseException):
+                                msg = f"Branch failed: {results}"
+                            else:
+                                msg = f"Game branched into {len(results)} parts."
                                 branch_performed = True
-                                break
-                            except Exception as e:
-                                err = f"Branch failed: {e}"
-                                game_db.save_chat_message(game_id, "System", err)
-                                conversation_histories[game_id].append(f"System: {err}")
-                                await manager.broadcast(game_id, json.dumps({
-                                    "game_id":   game_id,
-                                    "sender":    "System",
-                                    "message":   err,
-                                    "timestamp": datetime.utcnow().isoformat() + "Z",
-                                }))
+                            game_db.save_chat_message(game_id, "System", msg)
+                            conversation_histories[game_id].append(f"System: {msg}")
+                            await manager.broadcast(game_id, json.dumps({
+                                "game_id":   game_id,
+                                "sender":    "System",
+                                "message":   msg,
+                                "timestamp": datetime.utcnow().isoformat() + "Z",
+                            }))
 
-                        if branch_performed:
+                        if branch_performed or lore_failed:
                             break
-                        if tool_plan:
+                        tool_rounds += 1
+                        if tool_plan and tool_rounds < MAX_TOOL_ROUNDS:
                             # Append tool results and loop again
                             continue
+                        if tool_plan:
+                            logging.warning(f"[gm tools] game={game_id} stopped after {tool_rounds} tool rounds")
+                            break
 
                         # No tools requested, finalize GM text
                         game_db.save_chat_message(game_id, "GM", gm_text)
@@ -42,6 +42,6 @@ def generate_setup_endpoint(req: GenerateSetupRequest):
         news_items=news_items,
     )
 
-    generated = generate_completion(prompt)
+    generated = generate_completion(prompt, call_site="game_setup")
 
     return GenerateSetupResponse(generated_setup=generated)
@@ -27,6 +27,9 @@ from src.server.character_wizard import router as character_wizard_router
 from src.server.game_chat import router as game_chat_router
 
 from src.db import universe_db
+from src.db.cache import cache_stats, start_invalidation_listener
+from src.llm import llm_client, metrics as llm_metrics
+from src.llm.embeddings import get_embedding_service
 from src.game.news_extractor import run_news_extractor
 
 # Load environment variables from .env
@@ -38,10 +41,11 @@ logging.basicConfig(level=logging.INFO)
 # Initialize FastAPI app
 app = FastAPI(title="Influence RPG Prototype Server")
 
-# Mount static files for fingerprinted assets
+# Mount static files for fingerprinted assets (built by `vite build`; the
+# directory may not exist yet in a checkout that has not been built)
 app.mount(
     "/static",
-    StaticFiles(directory="dist/static", html=False),
+    StaticFiles(directory="dist/static", html=False, check_dir=False),
     name="static",
 )
 
@@ -68,7 +72,11 @@ templates = Jinja2TemplatesWithSession(directory="src/server/templates")
 
 # Load Vite manifest for asset paths
 _manifest_path = Path("dist/static/.vite/manifest.json")
-_manifest = json.loads(_manifest_path.read_text())
+try:
+    _manifest = json.loads(_manifest_path.read_text())
+except FileNotFoundError:
+    logging.warning(f"{_manifest_path} not found; run `vite build`. Asset paths will be empty.")
+    _manifest = {}
 
 # Expose asset_path function to templates
 templates.env.globals["asset_path"] = lambda name: (
@@ -108,7 +116,7 @@ async def start_periodic_news_loop():
             universes = universe_db.list_universes()
             for uni in universes:
                 try:
-                    run_news_extractor(uni["id"])
+                    await asyncio.to_thread(run_news_extractor, uni["id"])
                 except Exception as e:
                     logging.error(f"Error in scheduled news for {uni['id']}: {e}")
             await asyncio.sleep(30 * 60)
@@ -116,6 +124,18 @@ async def start_periodic_news_loop():
     asyncio.create_task(news_loop())
 
 
+@app.on_event("startup")
+def warm_up_embeddings():
+    """Load the embedding model in the background instead of on the first lookup."""
+    get_embedding_service().warmup()
+
+
+@app.on_event("startup")
+def start_cache_listener():
+    """Apply cache invalidations published by other workers (if configured)."""
+    start_invalidation_listener()
+
+
 # Models for login
 class LoginRequest(BaseModel):
     username: str
@@ -142,6 +162,20 @@ def login(request_data: LoginRequest, request: Request):
     return LoginResponse(username=user["username"], role=user["role"], message="Login successful")
 
 
+@app.get("/api/metrics")
+def get_metrics(request: Request):
+    """LLM call/cache metrics and DB cache hit rates for this worker."""
+    if not request.session.get("username"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return {
+        "llm": llm_metrics.snapshot(),
+        "llm_response_cache": llm_client.response_cache_stats(),
+        "llm_tiers": llm_client.routing_stats(),
+        "db_caches": cache_stats(),
+        "embeddings": get_embedding_service().status(),
+    }
+
+
 @app.get("/logout")
 def logout(request: Request):
     request.session.clear()
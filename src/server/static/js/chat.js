@@ -18,9 +18,53 @@ document.addEventListener("DOMContentLoaded", () => {
   }
 
   document.getElementById("current-game-id").innerText = gameId;
+  transcript.gameId = gameId;
+  document
+    .getElementById("chat-box")
+    .addEventListener("scroll", (e) => {
+      if (e.target.scrollTop < 40) loadOlderMessages();
+    });
   startChat(username, gameId, characterId, universeId);
 });
 
+// Messages are loaded newest page first; older pages are fetched by id as the
+// user scrolls to the top of the chat box.
+const PAGE_SIZE = 100;
+const transcript = { gameId: "", oldestId: null, loading: false, done: false };
+
+function renderMessage(msg) {
+  const raw = marked.parse(msg.message);
+  const safe = DOMPurify.sanitize(raw);
+  const div = document.createElement("div");
+  div.classList.add("message");
+  div.innerHTML =
+    `<strong>${msg.sender}:</strong> ${safe} ` +
+    `<span class="timestamp">[${new Date(msg.timestamp).toLocaleTimeString()}]</span>`;
+  return div;
+}
+
+// GM narrative streamed in pieces, by stream_id, until the final message arrives.
+const streams = {};
+
+function appendStreamDelta(chatBox, msg) {
+  let stream = streams[msg.stream_id];
+  if (!stream) {
+    const div = document.createElement("div");
+    div.classList.add("message", "streaming");
+    div.innerHTML = `<strong>${msg.sender}:</strong> <span class="stream-text"></span>`;
+    chatBox.appendChild(div);
+    stream = streams[msg.stream_id] = { div, text: "" };
+  }
+  stream.text += msg.delta;
+  stream.div.querySelector(".stream-text").textContent = stream.text;
+}
+
+function trackOldest(msg) {
+  if (msg.id && (transcript.oldestId === null || msg.id < transcript.oldestId)) {
+    transcript.oldestId = msg.id;
+  }
+}
+
 async function startChat(username, gameId, characterId, universeId) {
   const gameResp = await fetch(`/api/game/${encodeURIComponent(gameId)}`);
   if (!gameResp.ok) return;
@@ -55,17 +99,16 @@ async function startChat(username, gameId, characterId, universeId) {
   ws.onmessage = (event) => {
     const msg = JSON.parse(event.data);
     const chatBox = document.getElementById("chat-box");
-
-    const rawHtml = marked.parse(msg.message);
-    const safeHtml = DOMPurify.sanitize(rawHtml);
-
-    const messageDiv = document.createElement("div");
-    messageDiv.classList.add("message");
-    messageDiv.innerHTML =
-      `<strong>${msg.sender}:</strong> ${safeHtml} ` +
-      `<span class="timestamp">[${new Date(msg.timestamp).toLocaleTimeString()}]</span>`;
-
-    chatBox.appendChild(messageDiv);
+    if (msg.delta !== undefined) {
+      appendStreamDelta(chatBox, msg);
+    } else if (msg.stream_id && streams[msg.stream_id]) {
+      // The final GM message replaces its streamed draft.
+      chatBox.replaceChild(renderMessage(msg), streams[msg.stream_id].div);
+      delete streams[msg.stream_id];
+    } else {
+      trackOldest(msg);
+      chatBox.appendChild(renderMessage(msg));
+    }
     chatBox.scrollTop = chatBox.scrollHeight;
   };
 
@@ -98,27 +141,48 @@ async function startChat(username, gameId, characterId, universeId) {
 
 async function loadPastMessages(gameId) {
   try {
-    const resp = await fetch(`/api/game/${encodeURIComponent(gameId)}/messages`);
+    const resp = await fetch(
+      `/api/game/${encodeURIComponent(gameId)}/messages?limit=${PAGE_SIZE}`
+    );
     if (!resp.ok) return;
     const data = await resp.json();
     const chatBox = document.getElementById("chat-box");
     chatBox.innerHTML = "";
-    data.messages.forEach((msg) => {
-      const raw = marked.parse(msg.message);
-      const safe = DOMPurify.sanitize(raw);
-      const div = document.createElement("div");
-      div.classList.add("message");
-      div.innerHTML =
-        `<strong>${msg.sender}:</strong> ${safe} ` +
-        `<span class="timestamp">[${new Date(msg.timestamp).toLocaleTimeString()}]</span>`;
-      chatBox.appendChild(div);
-    });
+    data.messages.forEach((msg) => chatBox.appendChild(renderMessage(msg)));
+    transcript.oldestId = data.prev_before_id;
+    transcript.done = data.messages.length < PAGE_SIZE;
     chatBox.scrollTop = chatBox.scrollHeight;
   } catch (e) {
     console.error("Error loading messages:", e);
   }
 }
 
+async function loadOlderMessages() {
+  if (transcript.loading || transcript.done || transcript.oldestId === null) return;
+  transcript.loading = true;
+  try {
+    const resp = await fetch(
+      `/api/game/${encodeURIComponent(transcript.gameId)}/messages` +
+        `?before_id=${transcript.oldestId}&limit=${PAGE_SIZE}`
+    );
+    if (!resp.ok) return;
+    const data = await resp.json();
+    const chatBox = document.getElementById("chat-box");
+    // Keep the visible messages in place while prepending above them.
+    const fromBottom = chatBox.scrollHeight - chatBox.scrollTop;
+    const fragment = document.createDocumentFragment();
+    data.messages.forEach((msg) => fragment.appendChild(renderMessage(msg)));
+    chatBox.insertBefore(fragment, chatBox.firstChild);
+    chatBox.scrollTop = chatBox.scrollHeight - fromBottom;
+    if (data.prev_before_id !== null) transcript.oldestId = data.prev_before_id;
+    transcript.done = data.messages.length < PAGE_SIZE;
+  } catch (e) {
+    console.error("Error loading older messages:", e);
+  } finally {
+    transcript.loading = false;
+  }
+}
+
 async function loadNews(universeId) {
   try {
     const resp = await fetch(
@@ -43,6 +43,15 @@ CREATE TABLE IF NOT EXISTS games (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Branched games inherit their parent's transcript instead of copying it:
+-- messages of parent_game_id with id <= parent_message_watermark belong to
+-- the child's history too (see game_lineage below).
+ALTER TABLE games ADD COLUMN IF NOT EXISTS parent_game_id UUID
+    CONSTRAINT fk_game_parent
+        REFERENCES games(id)
+        ON DELETE SET NULL;
+ALTER TABLE games ADD COLUMN IF NOT EXISTS parent_message_watermark INT;
+
 -- Join Table for Game Participants (mapping characters to games)
 CREATE TABLE IF NOT EXISTS game_players (
     game_id UUID NOT NULL,
@@ -60,16 +69,54 @@ CREATE TABLE IF NOT EXISTS game_players (
 );
 
 -- Table for Chat Messages (to store game chat logs)
+-- Range-partitioned by month on timestamp (see partitioning.sql for the
+-- monthly partitions, the default partition and archival bookkeeping).
 CREATE TABLE IF NOT EXISTS chat_messages (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     game_id UUID NOT NULL,
     sender VARCHAR(255) NOT NULL,
     message TEXT NOT NULL,
-    timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, timestamp),
     CONSTRAINT fk_game_chat
         FOREIGN KEY (game_id)
             REFERENCES games(id)
             ON DELETE CASCADE
+) PARTITION BY RANGE (timestamp);
+
+-- Every transcript query filters by game and orders by time
+CREATE INDEX IF NOT EXISTS idx_chat_messages_game_time
+  ON chat_messages (game_id, timestamp);
+-- Keyset paging of a game's transcript by message id
+CREATE INDEX IF NOT EXISTS idx_chat_messages_game_id
+  ON chat_messages (game_id, id);
+
+-- A game's transcript lineage: the game itself (no upper bound) followed by
+-- each ancestor with the highest message id inherited from it.
+CREATE OR REPLACE FUNCTION game_lineage(root UUID)
+RETURNS TABLE (lineage_game_id UUID, upto_message_id INT)
+LANGUAGE sql STABLE AS $$
+    WITH RECURSIVE lineage(gid, upto) AS (
+        SELECT id, NULL::INT FROM games WHERE id = $1
+      UNION ALL
+        SELECT g.parent_game_id, g.parent_message_watermark
+          FROM lineage l
+          JOIN games g ON g.id = l.gid
+         WHERE g.parent_game_id IS NOT NULL
+    )
+    SELECT gid, upto FROM lineage
+$$;
+
+-- Finished games moved out of the hot tables into a compressed archive file
+-- (see src/db/game_archive.py).
+CREATE TABLE IF NOT EXISTS game_archives (
+    game_id       UUID PRIMARY KEY
+        REFERENCES games(id)
+        ON DELETE CASCADE,
+    file_path     TEXT        NOT NULL,
+    message_count INT         NOT NULL,
+    byte_size     BIGINT      NOT NULL,
+    archived_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 -- You must build pgvector on your platform before running the following.
@@ -88,6 +135,9 @@ CREATE TABLE IF NOT EXISTS document_embeddings (
 );
 
 -- IVFFlat is a good compromise of speed & accuracy; set lists ≈ √N 
+-- lists = 100 is only a placeholder: once data is loaded run
+--   python -m src.utils.db_admin reindex-vectors
+-- to size lists from the row count (or switch to HNSW).
 CREATE INDEX IF NOT EXISTS idx_document_embeddings_embedding
   ON document_embeddings
   USING ivfflat (embedding vector_cosine_ops)
@@ -109,6 +159,10 @@ CREATE TABLE IF NOT EXISTS game_history (
             ON DELETE CASCADE
 );
 
+-- Latest-summary lookups per game
+CREATE INDEX IF NOT EXISTS idx_game_history_game_date
+  ON game_history (game_id, summary_date);
+
 -- And index on the embedding vector for similarity search:
 CREATE INDEX IF NOT EXISTS idx_game_history_embedding
   ON game_history
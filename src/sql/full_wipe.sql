@@ -1,6 +1,8 @@
 BEGIN;
 
 -- Child tables first
+DELETE FROM game_context;
+DELETE FROM game_archives;
 DELETE FROM game_players;
 DELETE FROM chat_messages;
 DELETE FROM game_history;
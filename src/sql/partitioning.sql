@@ -0,0 +1,138 @@
+-- =============================================================================
+-- Monthly range partitioning for chat_messages and universe_events
+-- =============================================================================
+-- Both tables are declared PARTITION BY RANGE in db_setup.sql /
+-- universes_setup.sql. This file (run after them by db_admin rebuild/migrate):
+--   1. converts databases created before partitioning, keeping ids,
+--   2. adds a DEFAULT partition and one partition per calendar month,
+--   3. tracks partitions detached to compressed files by
+--      `db_admin archive-partitions` so `restore-partition` can bring them back.
+-- Partitions are named <table>_pYYYYMM; run `db_admin ensure-partitions`
+-- monthly (cron) so the next months exist before rows arrive.
+
+-- 1. Archived partition bookkeeping
+CREATE TABLE IF NOT EXISTS archived_partitions (
+    partition_name  TEXT PRIMARY KEY,
+    parent_table    TEXT        NOT NULL,
+    range_from      DATE        NOT NULL,
+    range_to        DATE        NOT NULL,
+    row_count       BIGINT      NOT NULL,
+    file_path       TEXT        NOT NULL,
+    archived_at     TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- 2. Convert pre-partitioning heap tables in place
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'chat_messages'::regclass) = 'r' THEN
+        ALTER TABLE chat_messages RENAME TO chat_messages_legacy;
+        ALTER INDEX IF EXISTS chat_messages_pkey RENAME TO chat_messages_legacy_pkey;
+        ALTER INDEX IF EXISTS idx_chat_messages_game_time RENAME TO idx_chat_messages_legacy_game_time;
+        ALTER INDEX IF EXISTS idx_chat_messages_game_id RENAME TO idx_chat_messages_legacy_game_id;
+
+        CREATE TABLE chat_messages (
+            id INT NOT NULL DEFAULT nextval('chat_messages_id_seq'),
+            game_id UUID NOT NULL,
+            sender VARCHAR(255) NOT NULL,
+            message TEXT NOT NULL,
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (id, timestamp),
+            CONSTRAINT fk_game_chat
+                FOREIGN KEY (game_id)
+                    REFERENCES games(id)
+                    ON DELETE CASCADE
+        ) PARTITION BY RANGE (timestamp);
+        ALTER SEQUENCE chat_messages_id_seq OWNED BY chat_messages.id;
+        CREATE TABLE chat_messages_default PARTITION OF chat_messages DEFAULT;
+
+        INSERT INTO chat_messages (id, game_id, sender, message, timestamp)
+        SELECT id, game_id, sender, message, coalesce(timestamp, NOW())
+          FROM chat_messages_legacy;
+        DROP TABLE chat_messages_legacy;
+    END IF;
+
+    IF (SELECT relkind FROM pg_class WHERE oid = 'universe_events'::regclass) = 'r' THEN
+        ALTER TABLE universe_events RENAME TO universe_events_legacy;
+        ALTER INDEX IF EXISTS universe_events_pkey RENAME TO universe_events_legacy_pkey;
+
+        CREATE TABLE universe_events (
+            id             INT NOT NULL DEFAULT nextval('universe_events_id_seq'),
+            universe_id    UUID    NOT NULL
+                CONSTRAINT fk_universe_events
+                    REFERENCES universes(id)
+                    ON DELETE CASCADE,
+            game_id        UUID    NOT NULL
+                CONSTRAINT fk_game_events
+                    REFERENCES games(id)
+                    ON DELETE CASCADE,
+            event_type     VARCHAR(100) NOT NULL,
+            event_payload  JSONB   NOT NULL,
+            event_time     TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (id, event_time)
+        ) PARTITION BY RANGE (event_time);
+        ALTER SEQUENCE universe_events_id_seq OWNED BY universe_events.id;
+        CREATE TABLE universe_events_default PARTITION OF universe_events DEFAULT;
+
+        INSERT INTO universe_events (id, universe_id, game_id, event_type, event_payload, event_time)
+        SELECT id, universe_id, game_id, event_type, event_payload, coalesce(event_time, NOW())
+          FROM universe_events_legacy;
+        DROP TABLE universe_events_legacy;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS chat_messages_default PARTITION OF chat_messages DEFAULT;
+CREATE TABLE IF NOT EXISTS universe_events_default PARTITION OF universe_events DEFAULT;
+
+-- Partitioned indexes: created on every current and future partition
+CREATE INDEX IF NOT EXISTS idx_chat_messages_game_time
+  ON chat_messages (game_id, timestamp);
+-- Keyset paging of a game's transcript by message id
+CREATE INDEX IF NOT EXISTS idx_chat_messages_game_id
+  ON chat_messages (game_id, id);
+CREATE INDEX IF NOT EXISTS idx_universe_events_universe_time
+  ON universe_events (universe_id, event_time);
+
+-- 3. Monthly partition maintenance
+-- Creates <parent>_pYYYYMM for every month from the oldest row still in the
+-- DEFAULT partition up to *months_ahead* months from now, moving matching
+-- rows out of DEFAULT first (ATTACH would otherwise fail). Months that were
+-- archived are left alone. Returns the number of partitions created.
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(
+    parent TEXT, ts_column TEXT, months_ahead INT DEFAULT 3)
+RETURNS INT
+LANGUAGE plpgsql AS $$
+DECLARE
+    this_month DATE := date_trunc('month', NOW())::date;
+    month_start DATE;
+    month_end DATE;
+    part TEXT;
+    created INT := 0;
+BEGIN
+    EXECUTE format('SELECT date_trunc(''month'', min(%I))::date FROM %I',
+                   ts_column, parent || '_default')
+       INTO month_start;
+    month_start := least(coalesce(month_start, this_month), this_month);
+
+    WHILE month_start <= (this_month + make_interval(months => months_ahead))::date LOOP
+        month_end := (month_start + interval '1 month')::date;
+        part := format('%s_p%s', parent, to_char(month_start, 'YYYYMM'));
+        IF to_regclass(part) IS NULL
+           AND NOT EXISTS (SELECT 1 FROM archived_partitions WHERE partition_name = part) THEN
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                           part, parent);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                parent || '_default', ts_column, month_start, ts_column, month_end, part);
+            EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           parent, part, month_start, month_end);
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+SELECT ensure_monthly_partitions('chat_messages', 'timestamp');
+SELECT ensure_monthly_partitions('universe_events', 'event_time');
@@ -23,7 +23,14 @@ CREATE TABLE IF NOT EXISTS ruleset_chunks (
 );
 
 -- 3) Index for similarity search
+--    Rebuild with `python -m src.utils.db_admin reindex-vectors` after importing.
 CREATE INDEX IF NOT EXISTS idx_ruleset_chunks_embedding
   ON ruleset_chunks
   USING ivfflat (embedding vector_cosine_ops)
-  WITH (lists = 100);
\ No newline at end of file
+  WITH (lists = 100);
+
+-- 4) Per-ruleset lookups (chunk listing, filtered retrieval).
+--    Each imported ruleset also gets a partial HNSW index on its own chunks,
+--    see ruleset_db.create_chunk_index.
+CREATE INDEX IF NOT EXISTS idx_ruleset_chunks_ruleset
+  ON ruleset_chunks (ruleset_id, chunk_index);
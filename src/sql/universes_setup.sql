@@ -31,8 +31,9 @@ CREATE TABLE IF NOT EXISTS universe_games (
 );
 
 -- 3. Event store for universes
+-- Range-partitioned by month on event_time (see partitioning.sql).
 CREATE TABLE IF NOT EXISTS universe_events (
-    id             SERIAL PRIMARY KEY,
+    id             SERIAL,
     universe_id    UUID    NOT NULL
         CONSTRAINT fk_universe_events
             REFERENCES universes(id)
@@ -43,8 +44,9 @@ CREATE TABLE IF NOT EXISTS universe_events (
             ON DELETE CASCADE,
     event_type     VARCHAR(100) NOT NULL,
     event_payload  JSONB   NOT NULL,
-    event_time     TIMESTAMPTZ DEFAULT NOW()
-);
+    event_time     TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, event_time)
+) PARTITION BY RANGE (event_time);
 
 -- 4. Conflict detector log
 CREATE TABLE IF NOT EXISTS conflict_detections (
@@ -109,3 +111,27 @@ CREATE TABLE IF NOT EXISTS named_entities (
     created_at TIMESTAMPTZ DEFAULT NOW(),
     UNIQUE (universe_id, name)
 );
+
+-- 8. Per-game context snapshot used to assemble compressed GM prompts.
+--    Maintained incrementally by src/db/context_db.py.
+CREATE TABLE IF NOT EXISTS game_context (
+    game_id              UUID PRIMARY KEY
+        CONSTRAINT fk_context_game
+            REFERENCES games(id)
+            ON DELETE CASCADE,
+    universe_id          UUID,
+    universe_name        VARCHAR(255),
+    universe_description TEXT,
+    ruleset_id           UUID,
+    ruleset_name         VARCHAR(255),
+    ruleset_description  TEXT,
+    ruleset_summary      TEXT,
+    ruleset_long_summary TEXT,
+    roster               JSONB   NOT NULL DEFAULT '[]',
+    opening_message_id   INT,
+    latest_summary       TEXT,
+    updated_at           TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_game_context_ruleset
+  ON game_context (ruleset_id);
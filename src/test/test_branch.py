@@ -4,79 +4,99 @@ from fastapi.testclient import TestClient
 
 from src.server.main import app
 
+class FakeUnitOfWork:
+    """In-memory stand-in for src.db.unit_of_work.UnitOfWork."""
+
+    def __init__(self, universes=None, summary=""):
+        self.universes = universes or []
+        self.summary = summary
+        self.created = []
+        self.statuses = {}
+        self.joins = []
+        self.messages = []
+        self.links = []
+        self.events = []
+        self.branches = []
+        self.committed = False
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.committed = exc_type is None
+        return False
+
+    def get_games(self, ids):
+        return {gid: {"id": gid, "name": "Original", "status": "active"} for gid in ids}
+
+    def latest_summaries(self, ids):
+        return {gid: self.summary for gid in ids if self.summary}
+
+    def list_universes_for_game(self, gid):
+        return list(self.universes)
+
+    def message_watermark(self, gid):
+        return 42
+
+    def create_games(self, names, status="waiting", parent_game_id=None, parent_message_watermark=None):
+        games = []
+        for name in names:
+            g = {"id": f"g{len(self.created) + 1}", "name": name, "status": status,
+                 "parent_game_id": parent_game_id, "parent_message_watermark": parent_message_watermark}
+            self.created.append(g)
+            games.append(g)
+        return games
+
+    def link_games(self, links):
+        self.links.extend(links)
+
+    def join_players(self, joins):
+        self.joins.extend(joins)
+
+    def save_messages(self, messages):
+        self.messages.extend(messages)
+
+    def update_status(self, ids, status):
+        for gid in ids:
+            self.statuses[gid] = status
+
+    def record_branch(self, orig, new_ids, info):
+        self.branches.append((orig, new_ids, info))
+
+    def record_events(self, events):
+        self.events.extend(events)
+
+    def refresh_contexts(self, ids):
+        pass
+
+
 # Unit test for run_branch
 
 def test_run_branch(monkeypatch):
     from src.game import brancher
 
-    created = []
-    statuses = {}
-    joins = {}
-    messages = []
-    links = []
-    events = []
-    branches = []
-
-    def fake_create_game(name):
-        gid = f"g{len(created)+1}"
-        g = {"id": gid, "name": name, "status": "waiting"}
-        created.append(g)
-        return g
-
-    def fake_join_game(gid, cid):
-        joins.setdefault(gid, []).append(cid)
-
-    def fake_update_status(gid, status):
-        statuses[gid] = status
-
-    def fake_get_game(gid):
-        if gid == "orig":
-            return {"id": "orig", "name": "Original", "status": "active"}
-        for g in created:
-            if g["id"] == gid:
-                return g
-        return None
-
-    def fake_save_chat_message(gid, sender, msg):
-        messages.append((gid, sender, msg))
-
-    def fake_get_latest_summary(gid):
-        return "summary"
-
-    def fake_list_universes_for_game(gid):
-        return ["u1"]
-
-    def fake_add_game_to_universe(uid, gid):
-        links.append((uid, gid))
-
-    def fake_record_branch(orig, new_ids, info):
-        branches.append((orig, new_ids, info))
-
-    def fake_record_event(universe_id, game_id, event_type, payload):
-        events.append((universe_id, game_id, event_type, payload))
-
-    def fake_notify_branch(orig, results):
-        events.append(("notify", orig, results))
-
-    monkeypatch.setattr(brancher, "create_game", fake_create_game)
-    monkeypatch.setattr(brancher, "join_game", fake_join_game)
-    monkeypatch.setattr(brancher, "update_game_status", fake_update_status)
-    monkeypatch.setattr(brancher, "get_game", fake_get_game)
-    monkeypatch.setattr(brancher, "save_chat_message", fake_save_chat_message)
-    monkeypatch.setattr(brancher, "get_latest_game_summary", fake_get_latest_summary)
-    monkeypatch.setattr(brancher.universe_db, "list_universes_for_game", fake_list_universes_for_game)
-    monkeypatch.setattr(brancher.universe_db, "add_game_to_universe", fake_add_game_to_universe)
-    monkeypatch.setattr(brancher.universe_db, "record_branch", fake_record_branch)
-    monkeypatch.setattr(brancher.universe_db, "record_event", fake_record_event)
-    monkeypatch.setattr(brancher, "notify_branch", fake_notify_branch)
+    uow = FakeUnitOfWork(universes=["u1"], summary="summary")
+    notified = []
+
+    monkeypatch.setattr(brancher, "UnitOfWork", uow)
+    monkeypatch.setattr(brancher, "notify_branch", lambda orig, results: notified.append((orig, results)))
 
     groups = [{"character_ids": ["c1"], "description": "test"}]
     res = brancher.run_branch("orig", groups)
 
-    assert statuses.get("orig") == "branched"
-    assert branches
-    assert any(ev[1] == created[0]["id"] for ev in events if ev[0] == "u1")
-    assert ("notify", "orig", res) in events
+    assert uow.committed
+    assert uow.statuses.get("orig") == "branched"
+    assert uow.branches
+    assert ("u1", uow.created[0]["id"]) in uow.links
+    assert (uow.created[0]["id"], "c1") in uow.joins
+    assert any(ev[1] == uow.created[0]["id"] for ev in uow.events if ev[0] == "u1")
+    assert any("Summary of Original" in m[2] for m in uow.messages)
+    assert uow.created[0]["parent_game_id"] == "orig"
+    assert uow.created[0]["parent_message_watermark"] == 42
+    assert ("orig", res) in notified
 
 # API endpoint test
 
@@ -116,23 +136,18 @@ def test_websocket_branch(monkeypatch):
     from src.server import game_chat
     from src.game import brancher
 
-    monkeypatch.setattr(game_chat.game_db, "list_chat_messages", lambda gid: [])
+    monkeypatch.setattr(game_chat.game_db, "list_chat_message_docs", lambda gid, **k: [])
     monkeypatch.setattr(game_chat.game_db, "get_game", lambda gid: {"id": gid, "name": "Base", "status": "active"})
     monkeypatch.setattr(game_chat.game_db, "save_chat_message", lambda *a, **k: None)
     monkeypatch.setattr(game_chat.game_db, "list_players_in_game", lambda gid: ["c1"])
     monkeypatch.setattr(game_chat.universe_db, "list_universes_for_game", lambda gid: [])
     monkeypatch.setattr(game_chat, "get_character_by_id", lambda cid: {"id": cid, "name": "Char", "owner": "u"})
-    monkeypatch.setattr(game_chat, "generate_gm_output", lambda *a, **k: ("", {"branch": {"groups": [{"character_ids": ["c1"], "description": ""}]}}))
+    async def fake_gm_output(*a, **k):
+        return "", {"branch": {"groups": [{"character_ids": ["c1"], "description": ""}]}}
+
+    monkeypatch.setattr(game_chat, "agenerate_gm_output", fake_gm_output)
     monkeypatch.setattr(brancher, "notify_branch", lambda *a, **k: None)
-    monkeypatch.setattr(brancher, "create_game", lambda name: {"id": "n1", "name": name, "status": "waiting"})
-    monkeypatch.setattr(brancher, "join_game", lambda *a, **k: None)
-    monkeypatch.setattr(brancher, "update_game_status", lambda *a, **k: None)
-    monkeypatch.setattr(brancher, "get_game", lambda gid: {"id": gid, "name": "Base", "status": "active"})
-    monkeypatch.setattr(brancher, "get_latest_game_summary", lambda gid: "")
-    monkeypatch.setattr(brancher.universe_db, "add_game_to_universe", lambda *a, **k: None)
-    monkeypatch.setattr(brancher.universe_db, "list_universes_for_game", lambda gid: [])
-    monkeypatch.setattr(brancher.universe_db, "record_branch", lambda *a, **k: None)
-    monkeypatch.setattr(brancher.universe_db, "record_event", lambda *a, **k: None)
+    monkeypatch.setattr(brancher, "UnitOfWork", FakeUnitOfWork())
 
     client = TestClient(app)
     with client.websocket_connect("/ws/game/base/chat?username=u&character_id=c1") as ws:
@@ -11,7 +11,7 @@ def test_character_wizard_dice(monkeypatch):
 
     calls = {"step": 0}
 
-    def fake_generate(prompt, conversation_context="", max_retries=3):
+    def fake_generate(prompt, conversation_context="", max_retries=3, **kwargs):
         if calls["step"] == 0:
             calls["step"] = 1
             return json.dumps({
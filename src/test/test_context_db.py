@@ -0,0 +1,114 @@
+from src.db import context_db, game_db, ruleset_db
+
+
+class FakeCursor:
+    """Records executed SQL; fetchone() pops the queued rows."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((" ".join(sql.split()), params))
+
+    def fetchone(self):
+        return self.conn.rows.pop(0) if self.conn.rows else None
+
+
+class FakeConnection:
+    def __init__(self, rows=None):
+        self.rows = list(rows or [])
+        self.executed = []
+        self.commits = 0
+
+    def __call__(self):
+        return self
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def statements(self, prefix):
+        return [(sql, params) for sql, params in self.executed if sql.startswith(prefix)]
+
+
+def test_join_refreshes_roster(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(game_db, "get_db_connection", conn)
+
+    game_db.join_game("g1", "c1")
+
+    [(sql, params)] = conn.statements("UPDATE game_context gc SET roster")
+    assert "game_players" in sql and params == ("g1",)
+    assert conn.commits == 1
+
+
+def test_first_gm_message_sets_opening(monkeypatch):
+    conn = FakeConnection(rows=[(7,), (8,)])
+    monkeypatch.setattr(game_db, "get_db_connection", conn)
+
+    assert game_db.save_chat_message("g1", "GM", "You wake up.") == 7
+    assert game_db.save_chat_message("g1", "Hero", "Hello") == 8
+
+    [(sql, params)] = conn.statements("UPDATE game_context SET opening_message_id")
+    assert "opening_message_id IS NULL" in sql
+    assert params == (7, "g1")
+
+
+def test_summary_becomes_latest_summary(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(game_db, "get_db_connection", conn)
+
+    game_db.save_game_summary("g1", "So far...", [0.1, 0.2])
+
+    assert conn.statements("UPDATE game_context SET latest_summary") == [
+        ("UPDATE game_context SET latest_summary = %s, updated_at = NOW() WHERE game_id = %s",
+         ("So far...", "g1"))
+    ]
+
+
+def test_ruleset_edit_refreshes_snapshots(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(ruleset_db, "get_db_connection", conn)
+
+    ruleset_db.set_summary("r1", "Short rules")
+
+    [(sql, params)] = conn.statements("UPDATE game_context gc SET ruleset_name")
+    assert "gc.ruleset_id = r.id" in sql and params == ("r1",)
+
+
+def test_get_game_context_builds_missing_snapshot(monkeypatch):
+    snapshot = {"game_id": "g1", "roster": [], "recent_messages": []}
+    conn = FakeConnection(rows=[None, snapshot])
+    monkeypatch.setattr(context_db, "get_db_connection", conn)
+
+    assert context_db.get_game_context("g1", last_k=5) == snapshot
+
+    reads = conn.statements("SELECT gc.*")
+    assert [params for _, params in reads] == [(5, "g1"), (5, "g1")]
+    assert "game_lineage(gc.game_id)" in reads[0][0]
+    [(refresh, params)] = conn.statements("INSERT INTO game_context")
+    assert "game_lineage(g.id)" in refresh and params == ("g1",)
+    assert conn.commits == 1
+
+
+def test_get_game_context_reads_existing_snapshot_once(monkeypatch):
+    conn = FakeConnection(rows=[{"game_id": "g1"}])
+    monkeypatch.setattr(context_db, "get_db_connection", conn)
+
+    assert context_db.get_game_context("g1") == {"game_id": "g1"}
+    assert not conn.statements("INSERT INTO game_context")
+    assert conn.commits == 0
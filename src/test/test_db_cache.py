@@ -0,0 +1,145 @@
+from src.db import cache
+from src.db.cache import TTLCache
+
+
+def test_ttl_lru_and_counters(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+
+    c = TTLCache("test", maxsize=2, ttl=10)
+    c.set("a", {"v": 1})
+    c.set("b", {"v": 2})
+    assert c.get("a") == {"v": 1}      # refreshes "a" as most recent
+    c.set("c", {"v": 3})               # evicts "b"
+    assert c.get("b") is None
+    assert c.get("c") == {"v": 3}
+
+    now[0] += 11
+    assert c.get("a") is None          # expired
+
+    stats = c.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+
+
+def test_get_or_load_returns_copies_and_skips_none():
+    c = TTLCache("test", maxsize=4, ttl=60)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {"name": "Hero", "character_data": {"stats": {"hp": 10}}}
+
+    first = c.get_or_load("x", loader)
+    first["name"] = "mutated"
+    first["character_data"]["stats"]["hp"] = 0
+    assert c.get_or_load("x", loader) == {"name": "Hero", "character_data": {"stats": {"hp": 10}}}
+    c.get("x")["character_data"]["stats"]["hp"] = 1
+    assert c.get("x")["character_data"]["stats"]["hp"] == 10
+    assert len(loads) == 1
+
+    assert c.get_or_load("missing", lambda: None) is None
+    assert c.get("missing") is None
+
+
+def test_get_character_by_id_is_cached_and_invalidated(monkeypatch):
+    from src.db import character_db
+
+    calls = []
+
+    def fake_fetch(cid):
+        calls.append(cid)
+        return {"id": cid, "name": "Char"}
+
+    monkeypatch.setattr(character_db, "_fetch_character_by_id", fake_fetch)
+    character_db._character_cache.clear()
+
+    assert character_db.get_character_by_id("c1")["name"] == "Char"
+    assert character_db.get_character_by_id("c1")["name"] == "Char"
+    assert calls == ["c1"]
+
+    cache.invalidate("character", "c1")
+    character_db.get_character_by_id("c1")
+    assert calls == ["c1", "c1"]
+
+    cache._apply_notification("character:c1")
+    character_db.get_character_by_id("c1")
+    assert len(calls) == 3
+    character_db._character_cache.clear()
+
+
+def test_game_session_reloads_only_invalidated_parts(monkeypatch):
+    from datetime import datetime, timezone
+    from src.game import session as session_mod
+
+    calls = []
+
+    def track(name, result):
+        def fn(*a, **k):
+            calls.append(name)
+            return result
+        return fn
+
+    news = [{"id": 1, "summary": "War", "published_at": datetime(2024, 1, 1, tzinfo=timezone.utc)}]
+    monkeypatch.setattr(session_mod.universe_db, "list_universes_for_game", track("unis", ["u1"]))
+    monkeypatch.setattr(session_mod.universe_db, "get_universe", track("uni", {"id": "u1", "ruleset_id": "r1"}))
+    monkeypatch.setattr(session_mod.universe_db, "list_news", track("news", news))
+    monkeypatch.setattr(session_mod.game_db, "list_players_in_game", track("players", ["c1"]))
+    monkeypatch.setattr(session_mod.character_db, "get_character_by_id", track("char", {"id": "c1", "name": "Hero"}))
+
+    s = session_mod.GameSession("g1")
+    monkeypatch.setitem(session_mod._sessions, "g1", s)
+    for _ in range(3):
+        assert s.ruleset_id == "r1"
+        assert [c["name"] for c in s.roster] == ["Hero"]
+    assert [n["summary"] for n in s.fresh_news()] == ["War"]
+    assert s.fresh_news() == []
+    assert calls == ["unis", "uni", "players", "char", "news"]
+
+    calls.clear()
+    cache.invalidate("game_roster", "other-game")
+    cache.invalidate("universe_news", "u1")
+    s.roster
+    assert s.fresh_news() == []          # re-read, but nothing newer than the watermark
+    assert calls == ["news"]
+
+    cache.invalidate("game_universes", "g1")
+    s.ruleset_id
+    assert calls == ["news", "unis", "uni"]
+
+
+def test_game_session_is_dropped_with_the_last_connection():
+    from src.game import session as session_mod
+    from src.server.game_chat import GameConnectionManager
+
+    manager = GameConnectionManager()
+    first, second = object(), object()
+    manager.active_connections["g9"] = [first, second]
+    s = session_mod.get_session("g9")
+
+    manager.disconnect("g9", first)
+    assert session_mod.get_session("g9") is s
+    manager.disconnect("g9", second)
+    assert "g9" not in session_mod._sessions
+    assert "g9" not in manager.active_connections
+
+
+def test_game_session_caches_context_until_a_new_summary(monkeypatch):
+    from src.game import session as session_mod
+
+    reads = []
+
+    def fake_context(game_id, last_k=20):
+        reads.append(game_id)
+        return {"latest_summary": f"summary {len(reads)}"}
+
+    monkeypatch.setattr(session_mod.context_db, "get_game_context", fake_context)
+    s = session_mod.GameSession("g1")
+    monkeypatch.setitem(session_mod._sessions, "g1", s)
+
+    assert s.game_context["latest_summary"] == "summary 1"
+    assert s.game_context["latest_summary"] == "summary 1"
+    cache.invalidate("game_summary", "g2")
+    assert len(reads) == 1
+    cache.invalidate("game_summary", "g1")
+    assert s.game_context["latest_summary"] == "summary 2"
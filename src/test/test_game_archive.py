@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta, timezone
+
+from src.db import game_archive
+
+
+def test_archive_round_trip_with_frame_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(game_archive, "TRANSCRIPT_FRAME_SIZE", 2)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    transcript = [
+        {"id": i, "game_id": "g1", "sender": "GM" if i % 2 else "Hero",
+         "message": f"line {i}", "timestamp": start + timedelta(minutes=i)}
+        for i in range(1, 6)
+    ]
+    path = tmp_path / "g1.irpga"
+    game_archive.write_archive(
+        path,
+        meta={"id": "g1", "status": "closed"},
+        transcript=transcript,
+        summaries=[{"summary": "They met.", "summary_date": start}],
+        events=[],
+        entities=[{"kind": "character", "name": "Hero"}],
+        codec="zlib",
+    )
+
+    index = game_archive.read_index(path)
+    assert index["codec"] == "zlib"
+    assert [(f["first_id"], f["last_id"]) for f in index["transcript"]] == [(1, 2), (3, 4), (5, 5)]
+
+    assert list(game_archive.iter_transcript(path)) == transcript
+    assert [m["id"] for m in game_archive.iter_transcript(path, after_id=3)] == [4, 5]
+    assert game_archive.read_section(path, "meta") == [{"id": "g1", "status": "closed"}]
+    assert game_archive.read_section(path, "summaries")[0]["summary"] == "They met."
+
+
+class FakeConnection:
+    """Archive lookups hit *archives*; any transcript query returns *hot_rows*."""
+
+    def __init__(self, archives, hot_rows):
+        self.archives = archives
+        self.hot_rows = hot_rows
+        self.queries = []
+
+    def __call__(self):
+        return self
+
+    def cursor(self, cursor_factory=None, name=None):
+        conn = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params=None):
+                conn.queries.append(sql)
+                if "game_archives" in sql:
+                    path = conn.archives.get(params[0])
+                    self.rows = [(path,)] if path else []
+                else:
+                    self.rows = list(conn.hot_rows)
+
+            def fetchone(self):
+                return self.rows[0] if self.rows else None
+
+            def fetchall(self):
+                return self.rows
+
+            def __iter__(self):
+                return iter(self.rows)
+
+        return Cursor()
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_archived_branch_is_replayed_from_archive_while_parent_is_live(tmp_path, monkeypatch):
+    import json
+    from src.db import game_db
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    inherited = {"id": 1, "game_id": "parent", "sender": "GM", "message": "Once upon a time",
+                 "timestamp": start}
+    own = {"id": 5, "game_id": "child", "sender": "Hero", "message": "We split up.",
+           "timestamp": start + timedelta(minutes=5)}
+    path = tmp_path / "child.irpga"
+    game_archive.write_archive(path, {"id": "child"}, [inherited, own], [], [], [], codec="zlib")
+
+    # The parent still has hot rows, so the lineage query for the child is not empty.
+    hot_doc = json.dumps({"id": 1, "game_id": "child", "sender": "GM", "message": "Once upon a time",
+                          "timestamp": "2024-01-01T00:00:00.000000Z"})
+    conn = FakeConnection({"child": str(path)}, [inherited])
+    monkeypatch.setattr(game_db, "get_db_connection", conn)
+    monkeypatch.setattr(game_archive, "get_db_connection", conn)
+
+    assert [m["id"] for m in game_db.list_chat_messages("child")] == [1, 5]
+    assert [m["id"] for m in game_db.list_chat_messages("child", include_inherited=False)] == [5]
+    assert [json.loads(d)["id"] for d in game_db.list_chat_message_docs("child")] == [1, 5]
+    assert [json.loads(d)["id"] for d in game_db.iter_chat_message_docs("child")] == [1, 5]
+    page = json.loads(game_db.get_chat_page_json("child", limit=1))
+    assert [m["id"] for m in page["messages"]] == [5]
+    assert (page["prev_before_id"], page["next_after_id"]) == (5, 5)
+    assert all("game_lineage" not in q for q in conn.queries)
+
+    conn.hot_rows = [(hot_doc,)]
+    assert game_db.list_chat_message_docs("parent") == [hot_doc]
+
+
+class ArchiveCursor:
+    """Answers archive_game's queries for one closed game; records statements."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.conn.queries.append(sql)
+        for marker, result in self.conn.answers:
+            if marker in sql:
+                self.result = result
+                return
+        self.result = []
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return list(self.result)
+
+
+class ArchiveConnection:
+    def __init__(self, answers):
+        self.answers = answers
+        self.queries = []
+        self.committed = False
+
+    def __call__(self):
+        return self
+
+    def cursor(self, cursor_factory=None):
+        return ArchiveCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_archiving_keeps_universe_events_for_the_timeline(tmp_path, monkeypatch):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    event = {"id": 3, "universe_id": "u1", "event_type": "gm_summary",
+             "event_payload": {"summary": "They met."}, "event_time": start}
+    conn = ArchiveConnection([
+        ("FOR UPDATE", [{"id": "g1", "name": "Old", "status": "closed", "created_at": start,
+                         "parent_game_id": None, "parent_message_watermark": None}]),
+        ("pending", [{"pending": 0}]),
+        ("FROM game_archives", []),
+        ("FROM universe_events", [event]),
+        ("game_lineage", [{"id": 1, "game_id": "g1", "sender": "GM", "message": "Hello",
+                           "timestamp": start}]),
+    ])
+    monkeypatch.setattr(game_archive, "get_db_connection", conn)
+
+    result = game_archive.archive_game("g1", archive_dir=tmp_path)
+
+    assert conn.committed and result["messages"] == 1
+    assert game_archive.read_section(tmp_path / "g1.irpga", "events")[0]["id"] == 3
+    deletes = [q for q in conn.queries if q.startswith("DELETE")]
+    assert "DELETE FROM chat_messages WHERE game_id = %s" in deletes
+    assert not [q for q in deletes if "universe_events" in q]
@@ -0,0 +1,125 @@
+import json
+from fastapi.testclient import TestClient
+
+from src.server.main import app
+
+
+def _patch_game(monkeypatch, game_chat, saved):
+    monkeypatch.setattr(game_chat.game_db, "list_chat_message_docs", lambda gid, **k: [])
+    monkeypatch.setattr(game_chat.game_db, "get_game", lambda gid: {"id": gid, "name": "Base", "status": "active"})
+    monkeypatch.setattr(game_chat.game_db, "save_chat_message", lambda gid, sender, msg: saved.append((sender, msg)))
+    monkeypatch.setattr(game_chat.game_db, "list_players_in_game", lambda gid: ["c1"])
+    monkeypatch.setattr(game_chat.universe_db, "list_universes_for_game", lambda gid: [])
+    monkeypatch.setattr(game_chat, "get_character_by_id", lambda cid: {"id": cid, "name": "Char", "owner": "u"})
+
+
+def test_failed_lore_lookup_ends_the_turn(monkeypatch):
+    from src.server import game_chat
+
+    saved = []
+    _patch_game(monkeypatch, game_chat, saved)
+    calls = []
+
+    async def fake_gm_output(*a, **k):
+        calls.append(a)
+        return "Let me check the rules.", {"lore": {"query": "grappling"}}
+
+    class BrokenLore:
+        def __init__(self, ruleset_id):
+            pass
+
+        def prefetch(self, query, top_k=None):
+            pass
+
+        async def get(self, query, top_k=None):
+            raise ConnectionError("database is down")
+
+    monkeypatch.setattr(game_chat, "agenerate_gm_output", fake_gm_output)
+    monkeypatch.setattr(game_chat, "LorePrefetcher", BrokenLore)
+
+    client = TestClient(app)
+    with client.websocket_connect("/ws/game/lore-down/chat?username=u&character_id=c1") as ws:
+        ws.send_text("/gm can I grapple?")
+        _thought = ws.receive_text()
+        failure = json.loads(ws.receive_text())
+        assert failure["sender"] == "System"
+        assert failure["message"] == "Lore lookup failed: database is down"
+        ws.send_text("hello")
+        assert "hello" in ws.receive_text()
+
+    assert len(calls) == 1                      # the GM was not asked again
+    assert ("System", "Lore lookup failed: database is down") in saved
+
+
+def test_tool_rounds_are_capped(monkeypatch):
+    from src.server import game_chat
+
+    saved = []
+    _patch_game(monkeypatch, game_chat, saved)
+    calls = []
+
+    async def fake_gm_output(*a, **k):
+        calls.append(a)
+        return "", {"dice": {"num_rolls": 1, "sides": 6}}
+
+    monkeypatch.setattr(game_chat, "agenerate_gm_output", fake_gm_output)
+
+    client = TestClient(app)
+    with client.websocket_connect("/ws/game/dice-loop/chat?username=u&character_id=c1") as ws:
+        ws.send_text("/gm roll forever")
+        for _ in range(2 * game_chat.MAX_TOOL_ROUNDS):
+            ws.receive_text()                   # chain-of-thought, then the roll
+        ws.send_text("hello")
+        assert "hello" in ws.receive_text()
+
+    assert len(calls) == game_chat.MAX_TOOL_ROUNDS
+    assert ("GM", "") not in saved
+
+
+def test_connect_replays_last_page_and_seeds_history_once(monkeypatch):
+    from src.server import game_chat
+
+    saved = []
+    _patch_game(monkeypatch, game_chat, saved)
+    docs = [json.dumps({"id": i, "game_id": "replay", "sender": "GM", "message": f"line {i}",
+                        "timestamp": "2026-01-01T00:00:00.000000Z"}) for i in range(1, 151)]
+    limits = []
+
+    def list_docs(gid, limit=None, **k):
+        limits.append(limit)
+        return docs[-limit:]
+
+    monkeypatch.setattr(game_chat.game_db, "list_chat_message_docs", list_docs)
+    game_chat.conversation_histories.pop("replay", None)
+
+    client = TestClient(app)
+    with client.websocket_connect("/ws/game/replay/chat?username=u&character_id=c1") as first:
+        replayed = [first.receive_text() for _ in range(game_chat.REPLAY_PAGE_SIZE)]
+        assert replayed == docs[-game_chat.REPLAY_PAGE_SIZE:]
+        with client.websocket_connect("/ws/game/replay/chat?username=v&character_id=c1") as second:
+            assert second.receive_text() == docs[-game_chat.REPLAY_PAGE_SIZE]
+
+    assert limits == [game_chat.GM_HISTORY_SEED_MESSAGES, game_chat.REPLAY_PAGE_SIZE]
+    history = game_chat.conversation_histories["replay"]
+    assert history.count("GM: line 1") == 1 and history.count("GM: line 150") == 1
+
+
+def test_gm_prompt_is_planned_for_the_routed_model(monkeypatch):
+    from types import SimpleNamespace
+    from src.server import game_chat
+
+    planned = []
+    real_plan = game_chat.plan_prompt
+
+    def spy(sections, budget, model, counter=None):
+        planned.append((budget, model))
+        return real_plan(sections, budget, model, counter)
+
+    session = SimpleNamespace(gm_prefix=SimpleNamespace(text="You are the GM."), entity_json="[]")
+    monkeypatch.setattr(game_chat, "get_session", lambda gid: session)
+    monkeypatch.setattr(game_chat, "plan_prompt", spy)
+    game_chat.conversation_histories["routed"] = ["Hero: hi"]
+
+    game_chat.plan_gm_context("routed", "Go on", [], [], [], 32000, "gpt-4")
+
+    assert planned == [(8192, "gpt-4")]         # capped at the model's context window
@@ -0,0 +1,49 @@
+import json
+from fastapi.testclient import TestClient
+
+from src.server.main import app
+
+
+def _login(monkeypatch) -> TestClient:
+    monkeypatch.setattr("src.auth.auth.authenticate_user", lambda u, p: {"username": u, "role": "player"})
+    client = TestClient(app)
+    client.post("/login", json={"username": "u", "password": "p"})
+    return client
+
+
+def test_messages_page_is_passed_through(monkeypatch):
+    from src.server import game as game_router
+
+    calls = []
+    body = b'{"messages": [{"id": 7, "sender": "GM", "message": "Hi", "timestamp": "2024-01-01T00:00:00.000000Z"}], "next_after_id": 7, "prev_before_id": 7}'
+
+    def fake_page(game_id, after_id=None, before_id=None, limit=None):
+        calls.append((game_id, after_id, before_id, limit))
+        return body
+
+    monkeypatch.setattr(game_router.game_db, "get_chat_page_json", fake_page)
+    client = _login(monkeypatch)
+
+    resp = client.get("/api/game/g1/messages?before_id=20&limit=50")
+    assert resp.status_code == 200
+    assert resp.content == body
+    assert calls == [("g1", None, 20, 50)]
+
+    client.get("/api/game/g1/messages")
+    assert calls[-1] == ("g1", None, None, game_router.DEFAULT_MESSAGES_PAGE)
+
+    assert client.get("/api/game/g1/messages?limit=0").status_code == 422
+
+
+def test_messages_stream_is_ndjson(monkeypatch):
+    from src.server import game as game_router
+
+    docs = [json.dumps({"id": i, "sender": "GM", "message": f"m{i}"}) for i in (1, 2, 3)]
+    monkeypatch.setattr(game_router.game_db, "iter_chat_message_docs",
+                        lambda gid, after_id=None: iter(docs))
+    client = _login(monkeypatch)
+
+    resp = client.get("/api/game/g1/messages/stream")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["id"] for line in resp.text.splitlines()] == [1, 2, 3]
@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+from src.llm.json_stream import JsonStreamParser, parse_json_text
+
+REPLY = (
+    'Here is my answer:\n```json\n'
+    '{"tool_calls": {"dice": {"num_rolls": 2, "sides": 6}}, '
+    '"narrative": "The door \\"creaks\\"\\nopen. Caf\\u00e9 \\ud83d\\ude00", "round": 3}\n```'
+)
+
+
+def test_parser_streams_fields_across_any_chunking():
+    expected = json.loads(REPLY[REPLY.index("{"):REPLY.rindex("}") + 1])
+    for size in (1, 2, 3, 5, 8, 13, len(REPLY)):
+        parser = JsonStreamParser(stream_fields=("narrative",))
+        events = []
+        for i in range(0, len(REPLY), size):
+            events += parser.feed(REPLY[i:i + size])
+        assert "".join(e[2] for e in events if e[0] == "text") == expected["narrative"]
+        assert [e[1] for e in events if e[0] == "field"] == ["tool_calls", "narrative", "round"]
+        assert parser.close() == expected
+
+
+def test_tool_calls_arrive_before_the_narrative_ends():
+    parser = JsonStreamParser(stream_fields=("narrative",))
+    head = '{"tool_calls": {"lore": {"query": "stealth"}}, "narrative": "You crouch'
+    events = parser.feed(head)
+    assert ("field", "tool_calls", {"lore": {"query": "stealth"}}) in events
+    assert events[-1] == ("text", "narrative", "You crouch")
+    assert parser.feed(' low."}')[-1] == ("done", {"tool_calls": {"lore": {"query": "stealth"}},
+                                                   "narrative": "You crouch low."})
+
+
+def test_parse_json_text_arrays_and_failures():
+    assert parse_json_text("```\n[{\"a\": 1}, 2,]\n```") == [{"a": 1}, 2]
+    for bad in ("no json here", '{"a": 1', "{'a': 1}"):
+        try:
+            parse_json_text(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(bad)
+
+
+def test_gm_output_dispatches_tools_while_streaming(monkeypatch):
+    from src.llm import gm_llm, llm_client
+    from src.llm.providers import LocalProvider
+
+    reply = json.dumps({"tool_calls": {"lore": {"query": "doors"}}, "narrative": "x" * 200})
+    seen = []
+
+    class StreamingProvider(LocalProvider):
+        async def astream(self, prompt, model, **kwargs):
+            for i in range(0, len(reply), 16):
+                seen.append(("chunk", i))
+                yield reply[i:i + 16]
+
+    monkeypatch.setattr(llm_client, "_config", {"LLM_CACHE_ENABLED": False})
+    monkeypatch.setattr(llm_client, "_provider", StreamingProvider(latency_median_ms=0))
+
+    async def on_narrative(delta):
+        seen.append(("text", delta))
+
+    async def on_tool_calls(plan):
+        seen.append(("tools", plan))
+
+    text, tools = asyncio.run(gm_llm.agenerate_gm_output(
+        "history", on_narrative=on_narrative, on_tool_calls=on_tool_calls
+    ))
+    assert text == "x" * 200 and tools == {"lore": {"query": "doors"}}
+    assert seen.index(("tools", tools)) < len(seen) - 1
+    assert "".join(d for kind, d in seen if kind == "text") == text
+
+
+def test_cut_off_stream_falls_through_to_the_next_step(monkeypatch):
+    from src.llm import gm_llm, llm_client, metrics
+    from src.llm.providers import LocalProvider
+
+    full = json.dumps({"tool_calls": {}, "narrative": "The bridge holds."})
+
+    class BrokenStreamProvider(LocalProvider):
+        async def astream(self, prompt, model, **kwargs):
+            yield '{"tool_calls": {}, "narrative": "The bri'
+            raise ConnectionError("stream reset")
+
+        async def agenerate(self, prompt, model, **kwargs):
+            return full
+
+    metrics.reset()
+    monkeypatch.setattr(llm_client, "_config", {"LLM_CACHE_ENABLED": False})
+    monkeypatch.setattr(llm_client, "_provider", BrokenStreamProvider(latency_median_ms=0))
+
+    async def on_narrative(delta):
+        pass
+
+    text, tools = asyncio.run(gm_llm.agenerate_gm_output(
+        "history", compressed_context=lambda: "short", on_narrative=on_narrative
+    ))
+    assert (text, tools) == ("The bridge holds.", {})
+    assert metrics.count("gm_degraded", "cut_off") == 1
+    assert metrics.count("gm_degraded", "compressed_prompt") == 1
+
+
+def test_gm_output_parsing_is_lenient_but_never_shows_raw_json():
+    from src.llm.gm_llm import _parse_gm_output
+
+    # YAML-style replies that are not strict JSON still parse.
+    assert _parse_gm_output("{'narrative': 'Rain falls.', 'tool_calls': {'dice': {'sides': 6}}}") == (
+        "Rain falls.", {"dice": {"sides": 6}})
+    assert _parse_gm_output("```\n{narrative: Rain falls.}\n```") == ("Rain falls.", {})
+    # A reply cut off mid-object keeps only its narrative so far.
+    assert _parse_gm_output('{"tool_calls": {}, "narrative": "The door op') == ("The door op", {})
+    assert _parse_gm_output('{"tool_calls": {"lore": {"query": "do') == ("", {})
+    # Prose is still narrative, even with a stray brace.
+    assert _parse_gm_output("A { rune glows.") == ("A { rune glows.", {})
@@ -0,0 +1,216 @@
+import time
+
+from src.llm import llm_client
+from src.llm.providers import LocalProvider
+
+
+def test_local_provider_is_deterministic(monkeypatch):
+    slept = []
+    monkeypatch.setattr("src.llm.providers.time.sleep", slept.append)
+
+    a = LocalProvider(latency_median_ms=200, latency_sigma=0.5, seed=7)
+    b = LocalProvider(latency_median_ms=200, latency_sigma=0.5, seed=7)
+    assert [a.sample_latency() for _ in range(5)] == [b.sample_latency() for _ in range(5)]
+    assert a.generate("hello", "m") == b.generate("hello", "m")
+    assert slept and all(s > 0 for s in slept)
+
+
+def test_config_and_provider_are_cached(monkeypatch):
+    reads = []
+    monkeypatch.setattr(llm_client, "_config", None)
+    monkeypatch.setattr(llm_client, "_provider", None)
+    monkeypatch.setattr(llm_client.json, "load",
+                        lambda f: reads.append(1) or {"LLM_PROVIDER": "local",
+                                                      "LOCAL_LATENCY_MEDIAN_MS": 0})
+
+    first = llm_client.generate_completion("ping")
+    assert llm_client.generate_completion("ping") == first
+    assert "ping" in first
+    assert len(reads) == 1
+    provider = llm_client.get_provider()
+    assert isinstance(provider, LocalProvider)
+
+    llm_client.reload_llm_config()
+    assert len(reads) == 2
+    assert llm_client.get_provider() is not provider
+
+
+def test_rate_limited_calls_back_off_and_retry(monkeypatch):
+    class FlakyProvider(LocalProvider):
+        calls = 0
+
+        async def agenerate(self, prompt, model, **kwargs):
+            FlakyProvider.calls += 1
+            if FlakyProvider.calls < 3:
+                raise RuntimeError("429 RESOURCE_EXHAUSTED {'retryDelay': '0.01s'}")
+            return "ok"
+
+    monkeypatch.setattr(llm_client, "_provider", FlakyProvider(latency_median_ms=0))
+    assert llm_client.generate_completion("hi", max_retries=3) == "ok"
+    assert FlakyProvider.calls == 3
+
+    FlakyProvider.calls = 0
+    assert llm_client.generate_completion("hi", max_retries=2) == ""
+
+
+def test_response_cache_hits_evicts_and_respects_policy(tmp_path, monkeypatch):
+    from src.llm import metrics
+    from src.llm.response_cache import ResponseCache
+
+    now = [1000.0]
+    monkeypatch.setattr("src.llm.response_cache.time.time", lambda: now[0])
+    metrics.reset()
+    cache = ResponseCache(tmp_path / "c.sqlite3", max_entries=2, policies={"news": 60, "gm_narrative": 0})
+
+    cache.put("k1", "news", "one")
+    cache.put("skip", "gm_narrative", "never stored")
+    assert cache.get("k1", "news") == "one"
+    assert cache.get("skip", "gm_narrative") is None
+
+    now[0] += 1
+    cache.put("k2", "news", "two")
+    now[0] += 1
+    cache.get("k1", "news")            # k1 is now more recent than k2
+    cache.put("k3", "news", "three")   # evicts k2
+    assert cache.get("k2", "news") is None
+    assert cache.get("k3", "news") == "three"
+
+    now[0] += 120
+    assert cache.get("k1", "news") is None   # expired
+    assert cache.stats()["news"]["hits"] == 3
+
+
+def test_response_cache_key_includes_generation_parameters():
+    from types import SimpleNamespace
+    from src.llm import llm_client
+    from src.llm.routing import Tier
+
+    provider = SimpleNamespace(name="fake")
+    small = Tier("small", "m", max_output_tokens=1024)
+    key = llm_client._cache_key(provider, small, None, "prompt")
+    assert key == llm_client._cache_key(provider, small, None, "prompt")
+    assert key != llm_client._cache_key(provider, small._replace(max_output_tokens=4096), None, "prompt")
+    assert key != llm_client._cache_key(provider, small._replace(name="large"), None, "prompt")
+
+
+def test_static_prefix_is_cached_after_first_use(monkeypatch):
+    from src.llm import metrics
+    from src.llm.prefix_cache import make_prefix
+
+    metrics.reset()
+    provider = LocalProvider(latency_median_ms=0, prefill_ms_per_1k_tokens=10)
+    monkeypatch.setattr(llm_client, "_provider", provider)
+    prefix = make_prefix("gm", "Static rules. " * 400, tpl="t1", ruleset=1)
+
+    first = llm_client.generate_completion("turn 1", call_site="gm_narrative", prefix=prefix)
+    assert first == provider.respond(prefix.text + "turn 1")
+    assert metrics.count("cached_input_tokens", "gm_narrative") == 0
+    billed_first = metrics.count("billed_input_tokens", "gm_narrative")
+
+    llm_client.generate_completion("turn 2", call_site="gm_narrative", prefix=prefix)
+    cached = metrics.count("cached_input_tokens", "gm_narrative")
+    assert cached > 0
+    assert metrics.count("billed_input_tokens", "gm_narrative") - billed_first < billed_first / 2
+
+    # A new template version gets a new key and is not served from the cache.
+    assert make_prefix("gm", prefix.text, tpl="t2", ruleset=1).key != prefix.key
+
+
+def test_slow_calls_are_hedged(monkeypatch):
+    import asyncio
+    from src.llm import metrics
+
+    class SlowFirstProvider(LocalProvider):
+        calls = 0
+
+        async def agenerate(self, prompt, model, **kwargs):
+            SlowFirstProvider.calls += 1
+            if SlowFirstProvider.calls == 1:
+                await asyncio.sleep(5)
+                return "slow"
+            return "fast"
+
+    metrics.reset()
+    for _ in range(20):
+        metrics.observe("llm_latency", 0.01, "news")
+    monkeypatch.setattr(llm_client, "_config", {"LLM_CACHE_ENABLED": False})
+    monkeypatch.setattr(llm_client, "_provider", SlowFirstProvider(latency_median_ms=0))
+
+    assert llm_client.generate_completion("hi", call_site="news", hedge=True) == "fast"
+    assert metrics.count("llm_hedged", "news") == 1
+    assert metrics.count("llm_hedge_won", "news") == 1
+
+
+def test_gm_turn_degrades_past_deadline(monkeypatch):
+    import asyncio
+    import json
+    from src.llm import metrics
+    from src.llm.gm_llm import agenerate_gm_output
+
+    class StalledProvider(LocalProvider):
+        prompts = []
+
+        async def agenerate(self, prompt, model, **kwargs):
+            StalledProvider.prompts.append((model, prompt))
+            if model == "big":
+                await asyncio.sleep(5)
+            return json.dumps({"tool_calls": {}, "narrative": "The torches gutter."})
+
+    metrics.reset()
+    monkeypatch.setattr(llm_client, "_config", {
+        "DEFAULT_MODEL": "big", "LLM_FALLBACK_MODEL": "small",
+        "GM_DEADLINE_SECONDS": 0.5, "LLM_CACHE_ENABLED": False,
+    })
+    monkeypatch.setattr(llm_client, "_router", None)
+    monkeypatch.setattr(llm_client, "_provider", StalledProvider(latency_median_ms=0))
+
+    start = time.monotonic()
+    text, tools = asyncio.run(agenerate_gm_output(
+        "long history", compressed_context=lambda: "short history"
+    ))
+    # The whole chain, not each step, is bounded by GM_DEADLINE_SECONDS.
+    assert time.monotonic() - start < 0.5
+    assert text == "The torches gutter." and tools == {}
+    assert [m for m, _ in StalledProvider.prompts] == ["big", "big", "small"]
+    assert "short history" in StalledProvider.prompts[1][1]
+    assert metrics.count("llm_deadline_exceeded", "gm_narrative") == 2
+    assert metrics.count("gm_degraded", "compressed_prompt") == 1
+    assert metrics.count("gm_degraded", "fallback_model") == 1
+
+
+def test_call_sites_are_routed_to_tiers(monkeypatch):
+    from src.llm.routing import Router
+
+    seen = []
+
+    class RecordingProvider(LocalProvider):
+        async def agenerate(self, prompt, model, **kwargs):
+            seen.append((model, kwargs.get("max_output_tokens")))
+            return "ok"
+
+    router = Router({
+        "default_tier": "large",
+        "tiers": {
+            "large": {"model": None, "max_output_tokens": 2048, "timeout_seconds": 30,
+                      "fallback": "small"},
+            "small": {"model": "lite", "max_input_tokens": 10, "max_output_tokens": 256},
+        },
+        "routes": {"entity_extraction": "small"},
+    }, default_model="big")
+    monkeypatch.setattr(llm_client, "_config", {"LLM_CACHE_ENABLED": False})
+    monkeypatch.setattr(llm_client, "_router", router)
+    monkeypatch.setattr(llm_client, "_provider", RecordingProvider(latency_median_ms=0))
+
+    llm_client.generate_completion("short", call_site="entity_extraction")
+    llm_client.generate_completion("short", call_site="gm_narrative")
+    llm_client.generate_completion("x" * 200, call_site="entity_extraction")   # too big for small
+    llm_client.generate_completion("short", call_site="gm_narrative", model="lite")
+    assert seen == [("lite", 256), ("big", 2048), ("big", 2048), ("lite", 2048)]
+    assert router.fallback_model("gm_narrative") == "lite"
+    # Escalating a call without a deadline does not add one.
+    assert router.route("entity_extraction", 100).timeout_seconds is None
+    assert router.route("gm_narrative", 100).timeout_seconds == 30
+
+    stats = llm_client.routing_stats()
+    assert stats["small"]["calls"] >= 1 and stats["large"]["calls"] >= 2
+    assert stats["small"]["call_sites"] == ["entity_extraction"]
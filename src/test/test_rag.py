@@ -0,0 +1,136 @@
+import uuid
+import pytest
+
+from src.db.character_db import get_db_connection
+from src.db.ruleset_db import chunk_index_name, chunk_index_sql
+from src.game import rag
+
+
+@pytest.fixture
+def db_conn():
+    try:
+        conn = get_db_connection()
+    except Exception as e:
+        pytest.skip(f"database not available: {e}")
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('ruleset_chunks')")
+        if cur.fetchone()[0] is None:
+            conn.close()
+            pytest.skip("ruleset_chunks table not set up")
+    yield conn
+    conn.rollback()
+    conn.close()
+
+
+def test_to_vector_param_is_compact():
+    assert rag.to_vector_param([0.1, -2.0, 1 / 3]) == "[0.1,-2,0.3333333]"
+
+
+def test_retrieve_uses_partial_vector_index(db_conn):
+    rs_id = str(uuid.uuid4())
+    vec = rag.to_vector_param([0.01 * i for i in range(384)])
+    with db_conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO rulesets (id, name, description, full_text) VALUES (%s, %s, '', '')",
+            (rs_id, f"test-{rs_id}"),
+        )
+        for idx in range(50):
+            cur.execute(
+                "INSERT INTO ruleset_chunks (ruleset_id, chunk_index, chunk_text, embedding) "
+                "VALUES (%s, %s, %s, %s::vector)",
+                (rs_id, idx, f"chunk {idx}", vec),
+            )
+        cur.execute(chunk_index_sql(rs_id))
+        # The table is tiny, so make the planner prefer any usable index path;
+        # with a mismatched operator no index could satisfy the ORDER BY at all.
+        cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute("SET LOCAL enable_sort = off")
+        cur.execute("EXPLAIN " + rag.RETRIEVE_SQL, (rs_id, vec, 5))
+        plan = "\n".join(row[0] for row in cur.fetchall())
+
+    assert f"Index Scan using {chunk_index_name(rs_id)}" in plan
+
+
+def test_lore_prefetch_is_shared_by_query(monkeypatch):
+    import asyncio
+    from src.game import tools
+
+    calls = []
+
+    def fake_query(ruleset_id, query, top_k):
+        calls.append(query)
+        return [f"{query} chunk"]
+
+    monkeypatch.setattr(tools, "query_ruleset_chunks", fake_query)
+
+    async def turn():
+        lore = tools.LorePrefetcher("rs1")
+        lore.prefetch("Sneak past  the guards")          # speculative, from the trigger
+        found = await lore.get("sneak past the guards")  # the GM asks for the same thing
+        assert lore.ready("Sneak past the guards") == found
+        assert await tools.LorePrefetcher(None).get("anything") == []
+        return found
+
+    assert asyncio.run(turn()) == ["Sneak past  the guards chunk"]
+    assert calls == ["Sneak past  the guards"]
+
+
+def test_embedding_service_loads_offline_first_and_once(monkeypatch):
+    from src.llm import embeddings
+
+    opened = []
+
+    class FakeModel:
+        def __init__(self, name, local_files_only=False, **kwargs):
+            opened.append(local_files_only)
+            if local_files_only:
+                raise OSError("not cached")
+
+        def encode(self, texts, **kwargs):
+            return [[1.0, 0.0] for _ in texts]
+
+    monkeypatch.setattr(embeddings, "SentenceTransformer", FakeModel)
+    monkeypatch.setattr(embeddings, "SENTENCE_TRANSFORMERS_AVAILABLE", True)
+
+    service = embeddings.EmbeddingService(dimensions=2)
+    assert service.status()["state"] == "cold"
+    service.warmup().join()
+    assert service.ready and service.status()["source"] == "download"
+    assert service.embed("query") == [1.0, 0.0]
+    assert service.encode(["a", "b"]).shape == (2, 2)
+    assert opened == [True, False]          # local cache tried first, loaded once
+
+    offline = embeddings.EmbeddingService(dimensions=2, allow_download=False)
+    assert offline.embed("query") == [0.0, 0.0]
+    assert offline.status()["state"] == "fallback"
+    assert opened == [True, False, True]
+
+    # Stored vectors must be real: the zero stand-in is refused, not written.
+    with pytest.raises(embeddings.EmbeddingUnavailable, match="not cached"):
+        offline.encode(["chunk"], require_model=True)
+    with pytest.raises(embeddings.EmbeddingUnavailable):
+        offline.embed("summary", require_model=True)
+    assert service.encode(["chunk"], require_model=True).shape == (1, 2)
+
+
+def test_embedding_batcher_runs_one_encode_for_concurrent_texts():
+    import numpy as np
+    from src.llm.embeddings import EmbeddingBatcher
+
+    batches = []
+
+    def encode(texts):
+        batches.append(list(texts))
+        return np.array([[float(len(t))] for t in texts])
+
+    batcher = EmbeddingBatcher(encode, max_batch=8, max_wait_ms=200)
+    futures = [batcher.submit(t) for t in ["a", "bb", "a", "ccc", "dddd"]]
+    assert [f.result(timeout=5) for f in futures] == [[1.0], [2.0], [1.0], [3.0], [4.0]]
+    assert batches == [["a", "bb", "ccc", "dddd"]]     # one pass, duplicates encoded once
+
+    def failing(texts):
+        raise RuntimeError("model gone")
+
+    broken = EmbeddingBatcher(failing, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        broken.submit("x").result(timeout=5)
@@ -0,0 +1,70 @@
+from src.utils.token_counter import TokenCounter
+
+
+class FakeEncoding:
+    def __init__(self):
+        self.batches = []
+
+    def encode_ordinary_batch(self, texts):
+        self.batches.append(list(texts))
+        return [t.split() for t in texts]
+
+
+def test_counts_are_memoized_and_batched():
+    counter = TokenCounter()
+    enc = FakeEncoding()
+    counter._encodings["m"] = enc
+
+    assert counter.count_batch(["a b", "c", "a b", ""], "m") == [2, 1, 2, 0]
+    assert enc.batches == [["a b", "c"]]
+
+    assert counter.count_segments(["a b", "c", "d e f"], "m") == 6
+    assert enc.batches[-1] == ["d e f"]
+    assert counter.stats()["entries"] == 3
+
+    assert counter.count("x" * 40, "m", approximate=True) == 10
+    assert len(enc.batches) == 2
+
+
+def test_fitted_estimator_recovers_coefficients_and_is_used_without_tokenizer(monkeypatch):
+    from src.utils import token_estimator
+    from src.utils.token_estimator import TokenEstimator, evaluate, features, fit
+
+    # Synthetic "provider" counts: 0.2 tokens per char plus one per symbol.
+    texts = [("word " * n) + ("!?" * (n % 7)) + ("é" * (n % 3)) for n in range(1, 60)]
+    samples = [(t, round(0.2 * len(t) + features(t)["symbols"])) for t in texts]
+
+    coef = fit(samples)
+    est = TokenEstimator("gemini-test", coef, len(samples))
+    assert evaluate(est.estimate, samples)["mape"] < 5
+    assert evaluate(TokenEstimator("gemini-test").estimate, samples)["mape"] > 5
+
+    monkeypatch.setattr(token_estimator, "_estimators", {"gemini-test": est})
+    counter = TokenCounter()
+    counter._encodings["gemini-test"] = None          # tiktoken has no encoding
+    assert counter.count(texts[10], "gemini-test") == est.estimate(texts[10])
+
+
+def test_planner_reserves_shares_and_keeps_newest_history():
+    from src.game.prompt_budget import Section, plan_prompt
+
+    counter = TokenCounter()
+    counter._encodings["m"] = FakeEncoding()     # one token per word
+    history = [f"msg{i} " + "w " * 9 for i in range(10)]   # 10 tokens each
+    lore = ["l " * 30, "l " * 30, "l " * 30]                # 30 tokens each
+    sections = [
+        Section("fixed", ["f " * 10], required=True),
+        Section("history", history, priority=0, share=0.5, newest_last=True),
+        Section("lore", lore, priority=1, share=0.3),
+    ]
+
+    plan = plan_prompt(sections, 100, "m", counter)
+    # 90 left after the fixed part: history gets its 50-token share, lore one
+    # chunk of its 30, and the leftover 10 goes back to history.
+    assert plan.items["history"] == history[-6:]
+    assert plan.items["lore"] == lore[:1]
+    assert plan.used == 100
+    assert plan.truncated("history") and plan.dropped["lore"] == 2
+
+    roomy = plan_prompt(sections, 1000, "m", counter)
+    assert roomy.items["history"] == history and not roomy.truncated("lore")
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+calibrate_tokens.py
+
+Fit the per-model token estimators in config/token_estimators.json.
+
+Usage:
+  python -m src.utils.calibrate_tokens record --model gemini-2.0-flash [PATH ...]
+                  # Count tokens of text samples with the provider's
+                  # count_tokens API; appends to config/token_counts/<model>.jsonl
+  python -m src.utils.calibrate_tokens fit [--model MODEL ...]
+                  # Fit coefficients from the recorded counts
+  python -m src.utils.calibrate_tokens bench [--model MODEL ...]
+                  # Error and throughput of the estimators vs. the alternatives
+
+``record`` is the only step that needs network access and an API key; it
+samples prompt templates, rules and design docs (or the given files) in
+pieces of one, four and sixteen paragraphs. Each fixture line is
+``{"text": ..., "tokens": ...}``.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from src.utils.token_estimator import (
+    DEFAULT_COEFFICIENTS,
+    ESTIMATORS_PATH,
+    PROJECT_ROOT,
+    TokenEstimator,
+    evaluate,
+    fit,
+    load_estimators,
+)
+
+FIXTURES_DIR = PROJECT_ROOT / "config" / "token_counts"
+DEFAULT_CORPUS = [
+    PROJECT_ROOT / "src" / "prompt_templates",
+    PROJECT_ROOT / "rules",
+    PROJECT_ROOT / "design",
+    PROJECT_ROOT / "reference",
+]
+TEXT_SUFFIXES = {".txt", ".md", ".json"}
+WINDOWS = (1, 4, 16)
+BENCH_ROUNDS = 5
+
+
+def fixture_path(model: str) -> Path:
+    return FIXTURES_DIR / f"{model}.jsonl"
+
+
+def load_samples(model: str) -> List[Tuple[str, int]]:
+    path = fixture_path(model)
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(r["text"], int(r["tokens"])) for r in rows]
+
+
+def corpus_samples(paths: List[Path], limit: int) -> Iterator[str]:
+    """Paragraph windows of the text files under *paths*, at most *limit* of them."""
+    files = []
+    for p in paths:
+        if p.is_dir():
+            files.extend(sorted(f for f in p.rglob("*") if f.suffix in TEXT_SUFFIXES))
+        elif p.is_file():
+            files.append(p)
+    produced = 0
+    for f in files:
+        paragraphs = [p for p in f.read_text(encoding="utf-8", errors="ignore").split("\n\n") if p.strip()]
+        for size in WINDOWS:
+            for start in range(0, len(paragraphs), size):
+                if produced >= limit:
+                    return
+                yield "\n\n".join(paragraphs[start:start + size])
+                produced += 1
+
+
+def record(model: str, paths: List[Path], limit: int) -> int:
+    from google import genai
+    from src.llm.llm_client import load_llm_config
+
+    client = genai.Client(api_key=load_llm_config().get("GEMINI_API_KEY", ""))
+    seen = {text for text, _ in load_samples(model)}
+    path = fixture_path(model)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    added = 0
+    with open(path, "a", encoding="utf-8") as out:
+        for text in corpus_samples(paths, limit):
+            if text in seen:
+                continue
+            tokens = client.models.count_tokens(model=model, contents=text).total_tokens
+            out.write(json.dumps({"text": text, "tokens": tokens}, ensure_ascii=False) + "\n")
+            seen.add(text)
+            added += 1
+    print(f"Recorded {added} samples for {model} in {path}")
+    return added
+
+
+def fixture_models() -> List[str]:
+    return sorted(p.stem for p in FIXTURES_DIR.glob("*.jsonl"))
+
+
+def fit_models(models: List[str]) -> Dict[str, TokenEstimator]:
+    estimators = load_estimators()
+    fitted = 0
+    for model in models:
+        samples = load_samples(model)
+        if not samples:
+            print(f"{model}: no recorded samples in {fixture_path(model)}, skipped")
+            continue
+        # Hold out every fifth sample to report the error on unseen text.
+        train = [s for i, s in enumerate(samples) if i % 5]
+        held_out = samples[::5]
+        if train and held_out:
+            check = TokenEstimator(model, fit(train), len(train))
+            print(f"{model}: held-out {_format(evaluate(check.estimate, held_out))}")
+        estimators[model] = TokenEstimator(model, fit(samples), len(samples))
+        fitted += 1
+        print(f"{model}: {estimators[model].coefficients} from {len(samples)} samples")
+    if not fitted:
+        return estimators
+    ESTIMATORS_PATH.write_text(
+        json.dumps({m: e.to_dict() for m, e in sorted(estimators.items())}, indent=2) + "\n",
+        encoding="utf-8",
+    )
+    return estimators
+
+
+def _throughput(estimate: Callable[[str], int], texts: List[str]) -> Tuple[float, float]:
+    """(segments per second, MB of text per second)."""
+    start = time.perf_counter()
+    for _ in range(BENCH_ROUNDS):
+        for text in texts:
+            estimate(text)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    chars = sum(len(t) for t in texts) * BENCH_ROUNDS
+    return len(texts) * BENCH_ROUNDS / elapsed, chars / elapsed / 1e6
+
+
+def _format(stats: dict) -> str:
+    return (f"n={stats['samples']} mae={stats['mae']:.1f} mape={stats['mape']:.1f}% "
+            f"p95={stats['p95_ape']:.1f}% bias={stats['total_bias_pct']:+.1f}%")
+
+
+def candidates(model: str) -> Dict[str, Callable[[str], int]]:
+    found = {"chars/4": TokenEstimator(model, DEFAULT_COEFFICIENTS).estimate}
+    calibrated = load_estimators().get(model)
+    if calibrated and calibrated.calibrated:
+        found["calibrated"] = calibrated.estimate
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding("cl100k_base")
+        found["tiktoken cl100k"] = lambda text: len(enc.encode_ordinary(text))
+    except Exception:
+        pass
+    return found
+
+
+def bench(models: List[str]) -> None:
+    for model in models:
+        samples = load_samples(model)
+        if not samples:
+            print(f"{model}: no recorded samples in {fixture_path(model)}, skipped")
+            continue
+        texts = [t for t, _ in samples]
+        print(f"{model} ({len(samples)} samples)")
+        for name, estimate in candidates(model).items():
+            per_s, mb_s = _throughput(estimate, texts)
+            print(f"  {name:<16} {_format(evaluate(estimate, samples))}  "
+                  f"{per_s:,.0f} segments/s  {mb_s:.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate per-model token estimators")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="record provider token counts")
+    rec.add_argument("--model", required=True)
+    rec.add_argument("--limit", type=int, default=500, help="maximum number of samples")
+    rec.add_argument("paths", nargs="*", type=Path)
+
+    for name in ("fit", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--model", action="append", help="default: every recorded model")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.model, args.paths or DEFAULT_CORPUS, args.limit)
+    elif args.command == "fit":
+        fit_models(args.model or fixture_models())
+    else:
+        bench(args.model or fixture_models())
+
+
+if __name__ == "__main__":
+    main()
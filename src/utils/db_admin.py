@@ -8,14 +8,47 @@ Usage:
   python -m src.utils.db_admin rebuild      # Drop and recreate the DB
   python -m src.utils.db_admin migrate      # Create any new tables only
   python -m src.utils.db_admin clear-data   # Remove games/characters/universes
+  python -m src.utils.db_admin reindex-vectors [--method hnsw]
+                                            # Rebuild & benchmark vector indexes
+  python -m src.utils.db_admin ensure-partitions   # Create upcoming monthly partitions
+  python -m src.utils.db_admin archive-partitions [--keep-months 6]
+                                            # Detach finished months to .copy.gz files
+  python -m src.utils.db_admin restore-partition chat_messages_p202401
+  python -m src.utils.db_admin archive-games [GAME_ID ...]
+                                            # Move finished games to archive files
 """
 
 import argparse
+import datetime
+import gzip
+import math
+import os
+import re
+import statistics
+import time
 from pathlib import Path
 import psycopg2
+from src.db import game_archive
 from src.db.game_db import get_db_config
+from src.db.ruleset_db import chunk_index_name, chunk_index_sql
 
 SQL_DIR = Path(__file__).resolve().parents[1] / "sql"
+ARCHIVE_DIR = Path(__file__).resolve().parents[2] / "archive" / "partitions"
+
+# Monthly range-partitioned tables and their partition key column.
+PARTITIONED_TABLES = {
+    "chat_messages": "timestamp",
+    "universe_events": "event_time",
+}
+# Only partitions whose games are all in one of these states may be archived.
+FINISHED_GAME_STATUSES = ("closed", "merged", "branched")
+
+# Vector columns with an approximate-NN index, keyed by table name.
+VECTOR_INDEXES = {
+    "ruleset_chunks": "idx_ruleset_chunks_embedding",
+    "game_history": "idx_game_history_embedding",
+    "document_embeddings": "idx_document_embeddings_embedding",
+}
 
 
 def connect(db_name: str | None = None):
@@ -58,6 +91,7 @@ def rebuild():
         execute_sql_file(conn, SQL_DIR / "db_setup.sql")
         execute_sql_file(conn, SQL_DIR / "rulesets.sql")
         execute_sql_file(conn, SQL_DIR / "universes_setup.sql")
+        execute_sql_file(conn, SQL_DIR / "partitioning.sql")
     finally:
         conn.close()
 
@@ -69,6 +103,7 @@ def migrate():
         execute_sql_file(conn, SQL_DIR / "db_setup.sql")
         execute_sql_file(conn, SQL_DIR / "rulesets.sql")
         execute_sql_file(conn, SQL_DIR / "universes_setup.sql")
+        execute_sql_file(conn, SQL_DIR / "partitioning.sql")
     finally:
         conn.close()
 
@@ -82,12 +117,346 @@ def clear_data():
         conn.close()
 
 
+def ivfflat_lists_for(row_count: int) -> int:
+    """Return the pgvector-recommended ``lists`` value for *row_count* rows.
+
+    ``rows / 1000`` up to one million rows, ``sqrt(rows)`` beyond that.
+    """
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def vector_index_sql(table: str, index: str, method: str, lists: int,
+                     m: int, ef_construction: int) -> str:
+    """Return the CREATE INDEX CONCURRENTLY statement for a vector index."""
+    if method == "hnsw":
+        params = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    else:
+        params = f"lists = {int(lists)}"
+    return (
+        f"CREATE INDEX CONCURRENTLY {index} ON {table} "
+        f"USING {method} (embedding vector_cosine_ops) WITH ({params})"
+    )
+
+
+def rebuild_vector_index(conn, table: str, index: str, method: str, lists: int,
+                         m: int, ef_construction: int):
+    """Build a new vector index under a temporary name, then swap it in for *index*.
+
+    The build runs concurrently so reads and writes continue meanwhile; only
+    the final drop/rename takes a short exclusive lock.
+    """
+    tmp = f"{index}_rebuild"
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {tmp}")
+        cur.execute(vector_index_sql(table, tmp, method, lists, m, ef_construction))
+        cur.execute(
+            f"BEGIN; DROP INDEX IF EXISTS {index}; "
+            f"ALTER INDEX {tmp} RENAME TO {index}; COMMIT;"
+        )
+        cur.execute(f"ANALYZE {table}")
+
+
+def ensure_ruleset_chunk_indexes(conn):
+    """Create the per-ruleset partial vector index for every ruleset with chunks."""
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT DISTINCT ruleset_id FROM ruleset_chunks")
+        for (rs_id,) in cur.fetchall():
+            cur.execute(chunk_index_sql(rs_id))
+            print(f"[ruleset_chunks] ensured {chunk_index_name(rs_id)}")
+
+
+def benchmark_vector_index(conn, table: str, method: str, sample: int, top_k: int,
+                           probes: int, ef_search: int) -> dict:
+    """Compare index search against exact search on sampled stored vectors.
+
+    Returns mean recall@k and median latencies (ms) for both paths.
+    """
+    conn.autocommit = False
+    with conn.cursor() as cur:
+        cur.execute(
+            f"SELECT embedding::text FROM {table} ORDER BY random() LIMIT %s",
+            (sample,)
+        )
+        queries = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+
+    search_sql = (
+        f"SELECT id FROM {table} ORDER BY embedding <=> %s::vector LIMIT %s"
+    )
+    recalls, exact_ms, ann_ms = [], [], []
+    for q in queries:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_indexscan = off")
+            start = time.perf_counter()
+            cur.execute(search_sql, (q, top_k))
+            exact = {row[0] for row in cur.fetchall()}
+            exact_ms.append((time.perf_counter() - start) * 1000)
+        conn.rollback()
+
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_seqscan = off")
+            if method == "hnsw":
+                cur.execute("SET LOCAL hnsw.ef_search = %s", (ef_search,))
+            else:
+                cur.execute("SET LOCAL ivfflat.probes = %s", (probes,))
+            start = time.perf_counter()
+            cur.execute(search_sql, (q, top_k))
+            approx = {row[0] for row in cur.fetchall()}
+            ann_ms.append((time.perf_counter() - start) * 1000)
+        conn.rollback()
+
+        if exact:
+            recalls.append(len(exact & approx) / len(exact))
+
+    return {
+        "queries": len(queries),
+        "recall": statistics.mean(recalls) if recalls else 0.0,
+        "exact_ms": statistics.median(exact_ms) if exact_ms else 0.0,
+        "index_ms": statistics.median(ann_ms) if ann_ms else 0.0,
+    }
+
+
+def reindex_vectors(method: str = "ivfflat", lists: int | None = None, m: int = 16,
+                    ef_construction: int = 64, tables: list[str] | None = None,
+                    sample: int = 20, top_k: int = 10, probes: int | None = None,
+                    ef_search: int = 40):
+    """Rebuild the vector indexes sized to current data and report recall/latency."""
+    conn = connect()
+    try:
+        for table in tables or list(VECTOR_INDEXES):
+            index = VECTOR_INDEXES[table]
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass(%s)", (table,))
+                if cur.fetchone()[0] is None:
+                    print(f"[{table}] table does not exist, skipping.")
+                    continue
+                cur.execute(f"SELECT count(*) FROM {table}")
+                rows = cur.fetchone()[0]
+
+            table_lists = lists or ivfflat_lists_for(rows)
+            if method == "ivfflat" and rows == 0:
+                # IVFFlat centroids come from existing rows; building on an
+                # empty table leaves every vector in one arbitrary list.
+                print(f"[{table}] empty, skipping IVFFlat build (rerun after loading data).")
+                continue
+
+            params = f"m={m}, ef_construction={ef_construction}" if method == "hnsw" else f"lists={table_lists}"
+            print(f"[{table}] {rows} rows → rebuilding {index} as {method} ({params})")
+            start = time.perf_counter()
+            rebuild_vector_index(conn, table, index, method, table_lists, m, ef_construction)
+            print(f"[{table}] rebuilt in {time.perf_counter() - start:.1f}s")
+            if table == "ruleset_chunks":
+                ensure_ruleset_chunk_indexes(conn)
+
+            if rows == 0 or sample <= 0:
+                continue
+            table_probes = probes or max(1, int(math.sqrt(table_lists)))
+            stats = benchmark_vector_index(
+                conn, table, method, sample, top_k, table_probes, ef_search
+            )
+            print(
+                f"[{table}] recall@{top_k}={stats['recall']:.3f} over {stats['queries']} queries; "
+                f"median exact={stats['exact_ms']:.2f}ms index={stats['index_ms']:.2f}ms"
+            )
+    finally:
+        conn.close()
+
+
+def partition_range(name: str) -> tuple[datetime.date, datetime.date] | None:
+    """Return the [from, to) month covered by a ``<table>_pYYYYMM`` partition."""
+    match = re.search(r"_p(\d{4})(\d{2})$", name)
+    if not match:
+        return None
+    start = datetime.date(int(match.group(1)), int(match.group(2)), 1)
+    end = datetime.date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, end
+
+
+def ensure_partitions(months_ahead: int = 3):
+    """Create monthly partitions up to *months_ahead* months from now."""
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            for table, column in PARTITIONED_TABLES.items():
+                cur.execute("SELECT ensure_monthly_partitions(%s, %s, %s)",
+                            (table, column, months_ahead))
+                print(f"[{table}] created {cur.fetchone()[0]} partition(s)")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def archive_partitions(keep_months: int = 6, tables: list[str] | None = None,
+                       archive_dir: Path = ARCHIVE_DIR, dry_run: bool = False):
+    """Detach monthly partitions older than *keep_months* into compressed files.
+
+    A partition is archived only when every game with rows in it is finished
+    and is not an ancestor of a live branch (live games still read inherited
+    transcript rows). Each partition is written with binary COPY to
+    ``<archive_dir>/<partition>.copy.gz``, then detached, dropped and recorded
+    in ``archived_partitions`` in one transaction.
+    """
+    today = datetime.date.today()
+    months = today.year * 12 + today.month - 1 - keep_months
+    cutoff = datetime.date(months // 12, months % 12 + 1, 1)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+
+    conn = connect()
+    try:
+        for table in tables or list(PARTITIONED_TABLES):
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+                    (table,)
+                )
+                partitions = [row[0] for row in cur.fetchall()]
+
+            for part in partitions:
+                bounds = partition_range(part)
+                if bounds is None or bounds[1] > cutoff:
+                    continue
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"""
+                        WITH live_lineage AS (
+                            SELECT l.lineage_game_id
+                              FROM games g CROSS JOIN LATERAL game_lineage(g.id) l
+                             WHERE g.status NOT IN %s
+                        )
+                        SELECT count(DISTINCT p.game_id)
+                          FROM {part} p
+                         WHERE p.game_id IN (SELECT lineage_game_id FROM live_lineage)
+                        """,
+                        (FINISHED_GAME_STATUSES,)
+                    )
+                    live = cur.fetchone()[0]
+                    if live:
+                        print(f"[{part}] {live} game(s) still live, skipping.")
+                        conn.rollback()
+                        continue
+                    if dry_run:
+                        print(f"[{part}] would archive.")
+                        conn.rollback()
+                        continue
+
+                    path = archive_dir / f"{part}.copy.gz"
+                    tmp = path.with_suffix(".tmp")
+                    with gzip.open(tmp, "wb") as f:
+                        cur.copy_expert(f"COPY {part} TO STDOUT (FORMAT binary)", f)
+                    cur.execute(f"SELECT count(*) FROM {part}")
+                    rows = cur.fetchone()[0]
+                    cur.execute(f"ALTER TABLE {table} DETACH PARTITION {part}")
+                    cur.execute(f"DROP TABLE {part}")
+                    cur.execute(
+                        "INSERT INTO archived_partitions "
+                        "(partition_name, parent_table, range_from, range_to, row_count, file_path) "
+                        "VALUES (%s, %s, %s, %s, %s, %s)",
+                        (part, table, bounds[0], bounds[1], rows, str(path))
+                    )
+                    os.replace(tmp, path)
+                conn.commit()
+                print(f"[{part}] archived {rows} rows → {path}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def restore_partition(name: str):
+    """Reload an archived partition from its file and attach it again."""
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT parent_table, range_from, range_to, file_path "
+                "FROM archived_partitions WHERE partition_name = %s",
+                (name,)
+            )
+            row = cur.fetchone()
+            if row is None:
+                raise SystemExit(f"No archived partition named {name}")
+            table, range_from, range_to, file_path = row
+            column = PARTITIONED_TABLES[table]
+
+            cur.execute(
+                f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+            with gzip.open(file_path, "rb") as f:
+                cur.copy_expert(f"COPY {name} FROM STDIN (FORMAT binary)", f)
+            # Rows written for this month after archival landed in DEFAULT.
+            cur.execute(
+                f"WITH moved AS (DELETE FROM {table}_default "
+                f"WHERE {column} >= %s AND {column} < %s RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved",
+                (range_from, range_to)
+            )
+            cur.execute(
+                f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+                (range_from, range_to)
+            )
+            cur.execute("DELETE FROM archived_partitions WHERE partition_name = %s", (name,))
+        conn.commit()
+        print(f"[{name}] restored from {file_path}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def archive_games(game_ids: list[str] | None = None):
+    """Archive the given finished games, or every archivable one."""
+    for game_id in game_ids or game_archive.list_archivable_games():
+        try:
+            result = game_archive.archive_game(game_id)
+        except ValueError as e:
+            print(f"[{game_id}] skipped: {e}")
+            continue
+        print(f"[{game_id}] archived {result['messages']} messages "
+              f"({result['bytes']} bytes) → {result['path']}")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Influence RPG DB admin")
     sub = parser.add_subparsers(dest="cmd", required=True)
     sub.add_parser("rebuild", help="Drop and recreate the entire database")
     sub.add_parser("migrate", help="Create new tables without modifying existing ones")
     sub.add_parser("clear-data", help="Delete games, characters and universes")
+    rv = sub.add_parser("reindex-vectors", help="Rebuild vector indexes sized to current data")
+    rv.add_argument("--method", choices=["ivfflat", "hnsw"], default="ivfflat")
+    rv.add_argument("--lists", type=int, default=None,
+                    help="IVFFlat lists (default: derived from row count)")
+    rv.add_argument("--m", type=int, default=16, help="HNSW max connections per layer")
+    rv.add_argument("--ef-construction", type=int, default=64, help="HNSW build candidate list size")
+    rv.add_argument("--table", action="append", choices=list(VECTOR_INDEXES), dest="tables",
+                    help="Only rebuild this table (repeatable)")
+    rv.add_argument("--sample", type=int, default=20, help="Sampled queries for the recall check")
+    rv.add_argument("--top-k", type=int, default=10)
+    rv.add_argument("--probes", type=int, default=None,
+                    help="IVFFlat probes for the check (default: sqrt(lists))")
+    rv.add_argument("--ef-search", type=int, default=40, help="HNSW ef_search for the check")
+
+    ep = sub.add_parser("ensure-partitions", help="Create upcoming monthly partitions")
+    ep.add_argument("--months-ahead", type=int, default=3)
+    ap = sub.add_parser("archive-partitions",
+                        help="Detach old partitions of finished games to compressed files")
+    ap.add_argument("--keep-months", type=int, default=6,
+                    help="Keep this many whole months before the current one online")
+    ap.add_argument("--table", action="append", choices=list(PARTITIONED_TABLES), dest="tables")
+    ap.add_argument("--dir", type=Path, default=ARCHIVE_DIR, help="Archive directory")
+    ap.add_argument("--dry-run", action="store_true")
+    rp = sub.add_parser("restore-partition", help="Reattach an archived partition")
+    rp.add_argument("name", help="Partition name, e.g. chat_messages_p202401")
+    ag = sub.add_parser("archive-games",
+                        help="Move finished games into compressed archive files")
+    ag.add_argument("game_ids", nargs="*", help="Games to archive (default: all finished)")
 
     args = parser.parse_args()
 
@@ -97,6 +466,26 @@ def main() -> None:
         migrate()
     elif args.cmd == "clear-data":
         clear_data()
+    elif args.cmd == "reindex-vectors":
+        reindex_vectors(
+            method=args.method,
+            lists=args.lists,
+            m=args.m,
+            ef_construction=args.ef_construction,
+            tables=args.tables,
+            sample=args.sample,
+            top_k=args.top_k,
+            probes=args.probes,
+            ef_search=args.ef_search,
+        )
+    elif args.cmd == "ensure-partitions":
+        ensure_partitions(args.months_ahead)
+    elif args.cmd == "archive-partitions":
+        archive_partitions(args.keep_months, args.tables, args.dir, args.dry_run)
+    elif args.cmd == "restore-partition":
+        restore_partition(args.name)
+    elif args.cmd == "archive-games":
+        archive_games(args.game_ids)
 
 
 if __name__ == "__main__":
@@ -15,9 +15,10 @@ Installs needed:
 import argparse, sys, uuid
 from pathlib import Path
 from pdfminer.high_level import extract_text
-from sentence_transformers import SentenceTransformer
 from psycopg2.extras import execute_values
 from src.db.character_db import get_db_connection  # re-uses your DB config
+from src.db.ruleset_db import create_chunk_index
+from src.llm.embeddings import EmbeddingUnavailable, get_embedding_service
 
 def chunk_text(text: str, size: int = 4000):
     return [text[i : i + size] for i in range(0, len(text), size)]
@@ -34,6 +35,14 @@ def main():
         print(f"Error: {pdf_path} does not exist", file=sys.stderr)
         sys.exit(1)
 
+    # Zero-vector stand-ins would make the ruleset unsearchable; fail before writing anything.
+    embedder = get_embedding_service()
+    try:
+        embedder.require_model()
+    except EmbeddingUnavailable as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
     print("Extracting text from PDF…")
     full_text = extract_text(str(pdf_path))
 
@@ -56,8 +65,7 @@ def main():
         print("Chunking text…")
         chunks = chunk_text(full_text, size=4000)
         print(f"{len(chunks)} chunks created. Generating embeddings…")
-        model = SentenceTransformer("all-MiniLM-L6-v2")
-        embeddings = model.encode(chunks)
+        embeddings = embedder.encode(chunks, require_model=True)
 
         # 3) Bulk insert into ruleset_chunks
         print("Inserting chunks…")
@@ -76,6 +84,10 @@ def main():
                 records
             )
         conn.commit()
+
+        # 4) Partial vector index so lore lookups for this ruleset use ANN
+        print("Indexing chunks…")
+        create_chunk_index(rs_id)
         print("Done! Ruleset ID =", rs_id)
 
     finally:
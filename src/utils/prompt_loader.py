@@ -1,3 +1,4 @@
+import hashlib
 from pathlib import Path
 
 # Templates now live under the src package
@@ -6,3 +7,7 @@ TEMPLATE_DIR = Path(__file__).resolve().parents[1] / "prompt_templates"
 def load_prompt_template(name: str) -> str:
     path = TEMPLATE_DIR / name
     return path.read_text(encoding="utf-8")
+
+def template_version(name: str) -> str:
+    """Short content hash of a template, used in provider cache keys."""
+    return hashlib.sha256(load_prompt_template(name).encode("utf-8")).hexdigest()[:12]
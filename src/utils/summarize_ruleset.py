@@ -42,7 +42,7 @@ def summarize_text_locally(text: str, max_length: int):
     return text[: max_length * 4]  # fallback
 
 def summarize_ruleset(ruleset_id: str):
-    chunks = list_chunks(ruleset_id)
+    chunks = list_chunks(ruleset_id, include_embeddings=False)
     if not chunks:
         print(f"No chunks found for ruleset {ruleset_id}")
         return
@@ -57,7 +57,7 @@ def summarize_ruleset(ruleset_id: str):
         if GEMINI_AVAILABLE:
             template = load_prompt_template("ruleset_summarization.txt")
             prompt = template.format(max_tokens=max_tokens, text=text)
-            summary = generate_completion(prompt).strip()
+            summary = generate_completion(prompt, call_site="summarize_ruleset").strip()
         else:
             max_chars = max_tokens * 4
             summary = summarize_text_locally(text, max_length=max_chars).strip()
@@ -1,45 +1,173 @@
+"""
+token_counter.py - Token counting for prompt sizing
+
+TokenCounter keeps one tiktoken encoding per model and memoizes the count
+of every text it has seen, so immutable prompt segments (chat messages,
+templates, entity blobs, lore chunks) are encoded once however many turns
+include them. ``count_batch`` encodes all uncached segments of a prompt in
+one ``encode_ordinary_batch`` call, and ``approximate=True`` (or
+``TOKEN_COUNT_MODE: "approximate"`` in config/llm_config.json) skips the
+tokenizer altogether.
+
+tiktoken only knows OpenAI vocabularies. Models it has no encoding for
+(Gemini) are counted with their calibrated estimator from
+src.utils.token_estimator instead of a borrowed OpenAI tokenizer.
+
+Counting a prompt segment by segment gives a count within a token or two
+per segment of encoding the joined text, which is plenty for sizing
+decisions.
+"""
+
+import json
 import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.utils.token_estimator import get_estimator
 
 try:
     import tiktoken
 except ImportError:
     tiktoken = None
 
-# Map model names to their max context window (in tokens)
+# Map model names to their max context window (input tokens)
 _MODEL_CONTEXT_SIZES = {
-    "gemini-2.0-flash": 131072,  # example: 128K-token window
-    "gpt-3.5-turbo": 4096,
-    "gpt-4": 8192,
+    "gemini-2.0-flash": 1_048_576,
+    "gemini-2.0-flash-lite": 1_048_576,
+    "gemini-1.5-flash": 1_048_576,
+    "gemini-1.5-pro": 2_097_152,
+    "gpt-3.5-turbo": 16_385,
+    "gpt-4": 8_192,
     # add other models & windows as needed
 }
 
+DEFAULT_CACHE_ENTRIES = 20000
+
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 
-def get_encoding(model_name: str):
-    """
-    Return the tiktoken encoding for the given model, or a fallback.
-    """
-    if tiktoken:
+def _load_config() -> dict:
+    config_path = Path(__file__).resolve().parents[2] / "config" / "llm_config.json"
+    try:
+        return json.loads(config_path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+class TokenCounter:
+    """Per-model cached encodings plus an LRU memo of (model, text) -> token count."""
+
+    def __init__(self, approximate: bool = False, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.approximate = approximate
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._encodings: Dict[str, object] = {}
+        self._counts: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encoding(self, model_name: str):
+        """The tiktoken encoding for *model_name*, loaded once; None if tiktoken has none."""
+        if model_name not in self._encodings:
+            enc = None
+            if tiktoken is not None:
+                try:
+                    enc = tiktoken.encoding_for_model(model_name)
+                except Exception as e:
+                    logger.debug(f"[TokenCounter] no tiktoken encoding for '{model_name}': {e}")
+            self._encodings[model_name] = enc
+        return self._encodings[model_name]
+
+    def estimate(self, text: str, model_name: Optional[str] = None) -> int:
+        """Fast approximate count from the model's calibrated estimator."""
+        return get_estimator(model_name).estimate(text)
+
+    def count(self, text: str, model_name: str, approximate: Optional[bool] = None) -> int:
+        return self.count_batch([text], model_name, approximate)[0]
+
+    def count_batch(self, texts: List[str], model_name: str,
+                    approximate: Optional[bool] = None) -> List[int]:
+        """Token counts of *texts*; uncached ones are encoded together."""
+        if self.approximate if approximate is None else approximate:
+            return [self.estimate(t, model_name) for t in texts]
+
+        counts: List[Optional[int]] = []
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                n = self._counts.get((model_name, text))
+                if n is None and text:
+                    missing.setdefault(text, []).append(i)
+                elif n is not None:
+                    self._counts.move_to_end((model_name, text))
+                counts.append(n if text else 0)
+            self.hits += len(texts) - sum(len(v) for v in missing.values())
+            self.misses += sum(len(v) for v in missing.values())
+        if not missing:
+            return counts
+
+        pending = list(missing)
+        enc = self.encoding(model_name)
         try:
-            return tiktoken.encoding_for_model(model_name)
+            fresh = [len(tokens) for tokens in enc.encode_ordinary_batch(pending)]
         except Exception:
-            return tiktoken.get_encoding("cl100k_base")
-    raise RuntimeError("tiktoken is not installed")
+            # No tokenizer for this model (Gemini) or it failed: use the estimator.
+            fresh = [self.estimate(t, model_name) for t in pending]
+        logger.debug(f"[TokenCounter] encoded {len(pending)} new segments for '{model_name}'")
+
+        with self._lock:
+            for text, n in zip(pending, fresh):
+                self._counts[(model_name, text)] = n
+                for i in missing[text]:
+                    counts[i] = n
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return counts
+
+    def count_segments(self, segments: Iterable[str], model_name: str,
+                       approximate: Optional[bool] = None) -> int:
+        """Total tokens of a prompt given as its segments."""
+        return sum(self.count_batch(list(segments), model_name, approximate))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._counts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "approximate": self.approximate,
+        }
+
+
+_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    """The process-wide TokenCounter, configured from config/llm_config.json."""
+    global _counter
+    if _counter is None:
+        config = _load_config()
+        _counter = TokenCounter(
+            approximate=config.get("TOKEN_COUNT_MODE", "exact") == "approximate",
+            max_entries=int(config.get("TOKEN_COUNT_CACHE_ENTRIES", DEFAULT_CACHE_ENTRIES)),
+        )
+    return _counter
 
 
 def count_tokens(text: str, model_name: str) -> int:
     """
     Estimate tokens in `text` for `model_name`.
-    Logs the count.
     """
-    try:
-        encoding = get_encoding(model_name)
-        tokens = len(encoding.encode(text))
-    except Exception:
-        # fallback heuristic: 1 token ≈ 4 characters
-        tokens = max(1, len(text) // 4)
-    logging.info(f"[TokenCounter] count_tokens → {tokens} tokens for model '{model_name}'")
+    tokens = get_token_counter().count(text, model_name)
+    logger.debug(f"[TokenCounter] count_tokens → {tokens} tokens for model '{model_name}'")
     return tokens
 
 
@@ -53,19 +181,19 @@ def get_model_max_tokens(model_name: str) -> int | None:
 def compute_usage_percentage(token_count: int, model_name: str) -> float:
     """
     Compute what percentage of the model's context window `token_count` uses.
-    Logs the percentage.
     """
     max_tokens = get_model_max_tokens(model_name)
     if not max_tokens:
-        logging.warning(f"[TokenCounter] Unknown max context size for model '{model_name}'")
+        logger.warning(f"[TokenCounter] Unknown max context size for model '{model_name}'")
         return 0.0
     pct = (token_count / max_tokens) * 100
-    logging.info(f"[TokenCounter] context usage → {pct:.2f}% of {model_name} window")
+    logger.debug(f"[TokenCounter] context usage → {pct:.2f}% of {model_name} window")
     return pct
 
 
 if __name__ == "__main__":
     # Quick test when run as a script
+    logger.setLevel(logging.DEBUG)
     sample_text = "Hello, this is a test message to count tokens."
     model = "gemini-2.0-flash"
     tok_count = count_tokens(sample_text, model)
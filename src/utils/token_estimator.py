@@ -0,0 +1,139 @@
+"""
+token_estimator.py - Fast per-model token estimates
+
+Gemini's tokenizer is not available offline, and tiktoken's cl100k_base
+(an OpenAI vocabulary) is a poor stand-in for it. TokenEstimator predicts a
+model's token count as a linear function of cheap text features:
+
+    tokens ~ sum(coefficient[f] * feature[f])    for f in FEATURES
+
+Coefficients per model are fitted by ``python -m src.utils.calibrate_tokens``
+against token counts recorded from the provider (fixtures in
+config/token_counts/) and stored in config/token_estimators.json. Models
+without fitted coefficients use DEFAULT_COEFFICIENTS, the usual "four
+characters per token" rule.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+ESTIMATORS_PATH = PROJECT_ROOT / "config" / "token_estimators.json"
+
+FEATURES = ("chars", "spaces", "non_ascii_bytes", "symbols", "digits")
+DEFAULT_COEFFICIENTS = {"chars": 0.25}
+
+_SYMBOL_RE = re.compile(r"[^\w\s]")
+
+
+def features(text: str) -> Dict[str, int]:
+    """The feature vector of *text*; each feature is a C-level scan."""
+    return {
+        "chars": len(text),
+        "spaces": text.count(" ") + text.count("\n"),
+        "non_ascii_bytes": len(text.encode("utf-8")) - len(text),
+        "symbols": len(_SYMBOL_RE.findall(text)),
+        "digits": sum(map(text.count, "0123456789")),
+    }
+
+
+class TokenEstimator:
+    def __init__(self, model: str, coefficients: Optional[Dict[str, float]] = None,
+                 samples: int = 0):
+        self.model = model
+        self.coefficients = dict(coefficients or DEFAULT_COEFFICIENTS)
+        self.samples = samples        # recorded counts the coefficients were fitted on
+        # Only compute the features that carry weight.
+        self._used = [f for f in FEATURES if self.coefficients.get(f)]
+
+    @property
+    def calibrated(self) -> bool:
+        return self.samples > 0
+
+    def estimate(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._used == ["chars"]:
+            total = self.coefficients["chars"] * len(text)
+        else:
+            feats = features(text)
+            total = sum(self.coefficients[f] * feats[f] for f in self._used)
+        return max(1, int(total + 0.5))
+
+    def to_dict(self) -> dict:
+        return {"coefficients": self.coefficients, "samples": self.samples}
+
+
+def fit(samples: Iterable[Tuple[str, int]]) -> Dict[str, float]:
+    """
+    Least-squares coefficients (non-negative, no intercept, so estimates of
+    prompt segments add up) for (text, recorded token count) samples.
+    """
+    import numpy as np
+
+    samples = list(samples)
+    if not samples:
+        raise ValueError("no samples to fit")
+    x = np.array([[features(t)[f] for f in FEATURES] for t, _ in samples], dtype=float)
+    y = np.array([n for _, n in samples], dtype=float)
+    active = list(range(len(FEATURES)))
+    # Drop features whose best weight is negative and refit (a tiny NNLS).
+    while True:
+        coef, *_ = np.linalg.lstsq(x[:, active], y, rcond=None)
+        negative = [a for a, c in zip(active, coef) if c < 0]
+        if not negative:
+            break
+        active = [a for a in active if a not in negative]
+        if not active:
+            return dict(DEFAULT_COEFFICIENTS)
+    return {FEATURES[a]: round(float(c), 6) for a, c in zip(active, coef) if c > 0}
+
+
+def evaluate(estimate, samples: Iterable[Tuple[str, int]]) -> dict:
+    """Error of *estimate* (text -> tokens) over recorded samples."""
+    errors: List[float] = []
+    pct: List[float] = []
+    total_true = total_est = 0
+    for text, true in samples:
+        est = estimate(text)
+        errors.append(abs(est - true))
+        pct.append(abs(est - true) / true * 100 if true else 0.0)
+        total_true += true
+        total_est += est
+    if not errors:
+        return {"samples": 0}
+    pct_sorted = sorted(pct)
+    return {
+        "samples": len(errors),
+        "mae": sum(errors) / len(errors),
+        "mape": sum(pct) / len(pct),
+        "p95_ape": pct_sorted[min(len(pct_sorted) - 1, int(0.95 * len(pct_sorted)))],
+        "total_bias_pct": (total_est - total_true) / total_true * 100 if total_true else 0.0,
+    }
+
+
+def load_estimators(path: Path = ESTIMATORS_PATH) -> Dict[str, TokenEstimator]:
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return {
+        model: TokenEstimator(model, spec.get("coefficients"), int(spec.get("samples", 0)))
+        for model, spec in data.items()
+    }
+
+
+_estimators: Optional[Dict[str, TokenEstimator]] = None
+
+
+def get_estimator(model: Optional[str]) -> TokenEstimator:
+    """The calibrated estimator for *model*, or the default one."""
+    global _estimators
+    if _estimators is None:
+        _estimators = load_estimators()
+    key = model or ""
+    if key not in _estimators:
+        _estimators[key] = TokenEstimator(key)
+    return _estimators[key]
@@ -11,6 +11,8 @@ import argparse
 import uuid
 from pathlib import Path
 from src.db.character_db import get_db_connection
+from src.db.cache import invalidate
+from src.db import context_db
 
 FIELDS = ["full_text", "summary", "long_summary", "char_creation"]
 
@@ -73,6 +75,9 @@ def upsert_ruleset(name: str, base_dir: Path) -> None:
                         data["char_creation"],
                     ),
                 )
+            context_db.refresh_ruleset(cur, rs_id)
+            # Tell running servers to drop their cached copy of this ruleset
+            invalidate("ruleset", rs_id, cur)
             conn.commit()
         print(f"Ruleset '{name}' updated (id={rs_id}).")
     finally: